@@ -0,0 +1,92 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from time import perf_counter
+from typing import List, Optional
+
+from locks.vm.jit import MAX_TRACE_LENGTH
+
+
+#
+# Execution limits check
+#  Runs locks-interpreter.py on a program that never stops, with the limits
+#  of each case listed under "limits" in benchmarks.json. The loop of the
+#  program is hot, so it runs compiled by the tracing JIT, and the limits
+#  have to be enforced inside the trace. A case fails if the program isn't
+#  stopped with the expected error within its time budget, which is too
+#  short for the interpreter to get there without the JIT, or if it runs
+#  more than one trace past --maxInstructions. Run it from the root of the
+#  repository:
+#
+#    python -m benchmarks.limits
+#
+
+BENCHMARK_DIR: str = os.path.dirname(os.path.abspath(__file__))
+
+INTERPRETER: str = os.path.join(BENCHMARK_DIR, "..", "locks-interpreter.py")
+
+
+# returns the reason the case failed, or None if it passed
+def runCase(case: dict, program: str) -> Optional[str]:
+    budget: float = case["budget"]
+    args: List[str] = case.get("args", [])
+
+    t0: float = perf_counter()
+    try:
+        p = subprocess.run(
+            [sys.executable, INTERPRETER, program] + args,
+            capture_output=True,
+            timeout=budget
+        )
+    except subprocess.TimeoutExpired:
+        return f"still running after {budget} seconds"
+    elapsed: float = perf_counter() - t0
+
+    output: str = p.stdout.decode("utf-8", errors="replace")
+    if case["expect"] not in output:
+        return f"expected '{case['expect']}', got '{output.strip()}'"
+
+    if "--maxInstructions" in args:
+        limit: int = int(args[args.index("--maxInstructions") + 1])
+        m = re.search(r"executed (\d+) instructions", output)
+        if m == None or not 0 <= int(m.group(1)) - limit < MAX_TRACE_LENGTH:
+            return f"stopped at the wrong instruction count: '{output.strip()}'"
+
+    print(f"{case['name']}: stopped after {elapsed*1000:.1f} ms (budget {budget*1000:.1f} ms)")
+    return None
+
+
+def main():
+    argParser = argparse.ArgumentParser(
+        description="Check that execution limits stop compiled loops"
+    )
+
+    argParser.add_argument(
+        '-c',
+        '--config',
+        metavar="<config-file>",
+        default=os.path.join(BENCHMARK_DIR, "benchmarks.json"),
+        help='Benchmark list and default settings.',
+    )
+
+    args = argParser.parse_args()
+
+    config: dict = json.load(open(args.config))["limits"]
+    program: str = os.path.join(BENCHMARK_DIR, config["program"])
+
+    status: int = 0
+
+    for case in config["cases"]:
+        error: Optional[str] = runCase(case, program)
+        if error != None:
+            print(f"{case['name']}: {error}")
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+import io
+import os
+import sys
+import json
+import argparse
+import platform
+from time import perf_counter
+from typing import List, Dict, Callable, Any
+
+from locks.lexer.lexer import Lexer
+from locks.parser.parser import Parser
+from locks.analyzer.analyzer import SemanticAnalyzer
+from locks.interpreter.interpreter import Interpeter
+
+from locks.compiler.compiler import Compiler
+from locks.compiler.inliner import Inliner
+from locks.assembler.asm import Assembler
+from locks.vm.vm import VirtualMachine
+
+from locks.regvm.compiler import RegisterCompiler
+from locks.regvm.vm import RegisterVM
+
+from locks.transpiler.transpiler import Transpiler
+from locks.transpiler import support
+
+from locks.output import stdout
+from locks.input import stdin
+
+
+#
+# Benchmark runner
+#  Runs every benchmark listed in benchmarks.json on the VM, the VM with small
+#  functions inlined, the register VM, the program translated to Python and
+#  the tree walk interpreter, and times
+#  each phase of the pipeline. Run it from the root of the repository:
+#
+#    python -m benchmarks.run -o results.json
+#    python -m benchmarks.run --baseline results.json
+#
+#  With --baseline, the run fails if the total time of any benchmark is more
+#  than 'threshold' times its time in the baseline.
+#
+
+BENCHMARK_DIR: str = os.path.dirname(os.path.abspath(__file__))
+
+BACKENDS: List[str] = ["vm", "vm-inline", "regvm", "python", "interpreter"]
+
+
+class Timer:
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = dict()
+
+    def time(self, phase: str, fn: Callable[[], Any]) -> Any:
+        t0: float = perf_counter()
+        r = fn()
+        self.phases[phase] = perf_counter() - t0
+        return r
+
+
+def _frontEnd(t: Timer, program: str):
+    l = Lexer(program)
+    tokl = t.time("lex", l.getTokens)
+
+    p = Parser(tokl)
+    ast = t.time("parse", p.getAST)
+
+    s = SemanticAnalyzer()
+    t.time("analyze", lambda: s.visit(ast))
+
+    if l.hadError or p.hadError or s.hadError:
+        raise Exception("program has errors")
+
+    return ast
+
+
+# with 'inline', small functions are inlined before compiling, which is
+#  timed as 'inline'
+def runVM(program: str, inline: bool = False) -> Dict[str, float]:
+    t = Timer()
+    ast = _frontEnd(t, program)
+
+    if inline:
+        t.time("inline", lambda: Inliner().visit(ast))
+
+    c = Compiler()
+    t.time("compile", lambda: c.visit(ast))
+    code: str = c.getCode()
+
+    a = Assembler(code)
+    b: List[int] = t.time("assemble", a.getBytecodeList)
+
+    v: VirtualMachine = t.time("load", lambda: VirtualMachine(b))
+    t.time("execute", v.run)
+
+    return t.phases
+
+
+def runRegisterVM(program: str) -> Dict[str, float]:
+    t = Timer()
+    ast = _frontEnd(t, program)
+
+    c = RegisterCompiler()
+    t.time("compile", lambda: c.visit(ast))
+    p = t.time("assemble", c.getProgram)
+
+    v = RegisterVM(p)
+    t.time("execute", v.run)
+
+    return t.phases
+
+
+# 'compile' generates the Python source, 'assemble' compiles it to Python
+#  bytecode
+def runTranspiled(program: str) -> Dict[str, float]:
+    t = Timer()
+    ast = _frontEnd(t, program)
+
+    tr = Transpiler()
+    t.time("compile", lambda: tr.visit(ast))
+    code: str = tr.getCode()
+
+    pyCode = t.time("assemble", lambda: compile(code, support.FILENAME, "exec"))
+    t.time("execute", lambda: support.run(pyCode, tr.getLines()))
+
+    return t.phases
+
+
+def runInterpreter(program: str) -> Dict[str, float]:
+    t = Timer()
+    ast = _frontEnd(t, program)
+
+    i = Interpeter()
+    t.time("execute", lambda: i.visit(ast))
+
+    return t.phases
+
+
+#
+# Runs a benchmark 'repeat' times and keeps the fastest time of each phase.
+#  Program output is captured, input is read from the benchmark's input file.
+#
+def runBenchmark(bench: dict, backend: str, repeat: int) -> Dict[str, Any]:
+    program: str = open(os.path.join(BENCHMARK_DIR, bench["path"]), 'r', encoding='unicode_escape').read()
+
+    inp: bytes = b''
+    if "input" in bench:
+        inp = open(os.path.join(BENCHMARK_DIR, bench["input"]), 'rb').read()
+
+    run: Callable = {
+        "vm": runVM,
+        "vm-inline": lambda p: runVM(p, True),
+        "regvm": runRegisterVM,
+        "python": runTranspiled,
+        "interpreter": runInterpreter
+    }[backend]
+    best: Dict[str, float] = None
+    output: str = ""
+
+    for _ in range(repeat):
+        out = io.StringIO()
+        stdout.setStream(out)
+        stdin.setStream(io.BytesIO(inp))
+
+        try:
+            phases: Dict[str, float] = run(program)
+        finally:
+            stdout.setStream(None)
+            stdin.setStream(None)
+
+        output = out.getvalue()
+        if best == None:
+            best = phases
+        else:
+            best = {p: min(best[p], phases[p]) for p in phases}
+
+    best["total"] = sum(best.values())
+    return {"phases": best, "output": output}
+
+
+def compareResults(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions: List[str] = []
+
+    for name in results["benchmarks"]:
+        for backend in results["benchmarks"][name]:
+            base = baseline.get("benchmarks", {}).get(name, {}).get(backend)
+            if base == None:
+                continue
+
+            new: float = results["benchmarks"][name][backend]["total"]
+            old: float = base["total"]
+
+            if old > 0 and new / old > threshold:
+                regressions.append(f"{name} ({backend}): {old:.4f}s -> {new:.4f}s ({new/old:.2f}x)")
+
+    return regressions
+
+
+def printResults(results: dict) -> None:
+    phases: List[str] = ["lex", "parse", "analyze", "inline", "compile", "assemble", "load", "execute", "total"]
+
+    print(f"{'Benchmark':<24}" + ''.join(f"{p:>10}" for p in phases))
+    for name in results["benchmarks"]:
+        for backend in results["benchmarks"][name]:
+            r: Dict[str, float] = results["benchmarks"][name][backend]
+            row: str = f"{name + ' (' + backend + ')':<24}"
+            for p in phases:
+                row += f"{r[p]:>10.4f}" if p in r else f"{'-':>10}"
+            print(row)
+
+
+def main():
+    argParser = argparse.ArgumentParser(
+        description="Run the locks-py benchmarks"
+    )
+
+    argParser.add_argument(
+        'names',
+        metavar='name',
+        nargs='*',
+        help='names of benchmarks to run. All benchmarks are run if none are specified.'
+    )
+
+    argParser.add_argument(
+        '-c',
+        '--config',
+        metavar="<config-file>",
+        default=os.path.join(BENCHMARK_DIR, "benchmarks.json"),
+        help='Benchmark list and default settings.',
+    )
+
+    argParser.add_argument(
+        '-b',
+        '--backend',
+        choices=BACKENDS,
+        action='append',
+        help='Backend to run. Can be given more than once, all backends are run by default.',
+    )
+
+    argParser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        help='Number of runs per benchmark, the fastest run is kept.',
+    )
+
+    argParser.add_argument(
+        '-o',
+        '--output',
+        metavar="<output-filename>",
+        help='Write results to specified file as JSON.',
+    )
+
+    argParser.add_argument(
+        '--baseline',
+        metavar="<results-file>",
+        help='Compare against results written earlier with -o, and fail on slowdowns.',
+    )
+
+    argParser.add_argument(
+        '-t',
+        '--threshold',
+        type=float,
+        help='Largest allowed ratio of total time to the baseline total time.',
+    )
+
+    args = argParser.parse_args()
+
+    config: dict = json.load(open(args.config))
+    repeat: int = args.repeat if args.repeat != None else config.get("repeat", 3)
+    threshold: float = args.threshold if args.threshold != None else config.get("threshold", 1.25)
+    backends: List[str] = args.backend if args.backend != None else BACKENDS
+
+    benchmarks: List[dict] = config["benchmarks"]
+    if len(args.names) > 0:
+        benchmarks = [b for b in benchmarks if b["name"] in args.names]
+
+    results: dict = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "benchmarks": dict()
+    }
+
+    mismatches: List[str] = []
+
+    for bench in benchmarks:
+        results["benchmarks"][bench["name"]] = dict()
+        outputs: Dict[str, str] = dict()
+
+        for backend in backends:
+            r = runBenchmark(bench, backend, repeat)
+            results["benchmarks"][bench["name"]][backend] = r["phases"]
+            outputs[backend] = r["output"]
+
+        # all backends must print the same thing
+        if len(set(outputs.values())) > 1:
+            mismatches.append(bench["name"])
+
+    printResults(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    status: int = 0
+
+    for name in mismatches:
+        print(f"\nOutput of '{name}' differs between backends")
+        status = 1
+
+    if args.baseline:
+        regressions: List[str] = compareResults(results, json.load(open(args.baseline)), threshold)
+        if len(regressions) > 0:
+            print(f"\nSlower than baseline by more than {threshold}x:")
+            for r in regressions:
+                print(f"  {r}")
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from time import perf_counter
+from typing import List, Dict, Tuple
+
+
+#
+# Startup benchmark
+#  Runs locks-interpreter.py on a small program in each mode listed under
+#  "startup" in benchmarks.json with 'python -X importtime', and reports the
+#  time spent importing modules on top of what a bare 'python -c pass'
+#  imports. Fails if a mode goes over its import time budget, or imports a
+#  module it doesn't need (listed in "forbidden"). Run it from the root of
+#  the repository:
+#
+#    python -m benchmarks.startup
+#
+#  Bytecode caching is enabled for the child processes, and every mode is
+#  run once before timing, so the numbers are for a warm .pyc cache.
+#
+
+BENCHMARK_DIR: str = os.path.dirname(os.path.abspath(__file__))
+
+INTERPRETER: str = os.path.join(BENCHMARK_DIR, "..", "locks-interpreter.py")
+
+
+def _childEnv() -> Dict[str, str]:
+    env: Dict[str, str] = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+#
+# Runs python with -X importtime and returns the wall time of the process
+#  and <module> : (<self time>, <cumulative time>) in seconds
+#
+def _importTimes(args: List[str], inp: bytes) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    t0: float = perf_counter()
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        input=inp,
+        capture_output=True,
+        env=_childEnv()
+    )
+    wall: float = perf_counter() - t0
+
+    times: Dict[str, Tuple[float, float]] = dict()
+    for line in p.stderr.decode("utf-8", errors="replace").splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split('|')
+        times[name.strip()] = (int(selfTime) / 1e6, int(cumulative) / 1e6)
+
+    return wall, times
+
+
+def measureMode(mode: dict, program: str, repeat: int, base: Dict[str, Tuple[float, float]]) -> dict:
+    args: List[str] = [INTERPRETER, program] + mode.get("args", [])
+
+    # the tree walk interpreter waits for enter when it is done
+    inp: bytes = b'\n'
+
+    _importTimes(args, inp)
+
+    best: dict = None
+    for _ in range(repeat):
+        wall, times = _importTimes(args, inp)
+        importTime: float = sum(t[0] for n, t in times.items() if n not in base)
+
+        if best == None or importTime < best["importTime"]:
+            best = {"importTime": importTime, "wall": wall, "modules": times}
+
+    best["forbidden"] = [m for m in mode.get("forbidden", []) if m in best["modules"]]
+    return best
+
+
+def main():
+    argParser = argparse.ArgumentParser(
+        description="Measure startup time of locks-interpreter.py"
+    )
+
+    argParser.add_argument(
+        '-c',
+        '--config',
+        metavar="<config-file>",
+        default=os.path.join(BENCHMARK_DIR, "benchmarks.json"),
+        help='Benchmark list and default settings.',
+    )
+
+    argParser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        help='Number of runs per mode, the fastest run is kept.',
+    )
+
+    argParser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Number of slowest modules to list per mode.',
+    )
+
+    argParser.add_argument(
+        '-o',
+        '--output',
+        metavar="<output-filename>",
+        help='Write results to specified file as JSON.',
+    )
+
+    args = argParser.parse_args()
+
+    config: dict = json.load(open(args.config))["startup"]
+    repeat: int = args.repeat if args.repeat != None else config.get("repeat", 5)
+    program: str = os.path.join(BENCHMARK_DIR, config["program"])
+
+    # modules that python imports by itself
+    _, base = _importTimes(["-c", "pass"], b'')
+
+    results: Dict[str, dict] = dict()
+    status: int = 0
+
+    for mode in config["modes"]:
+        r: dict = measureMode(mode, program, repeat, base)
+        results[mode["name"]] = r
+
+        budget: float = mode["budget"]
+        print(f"{mode['name']}: {r['importTime']*1000:.1f} ms importing (budget {budget*1000:.1f} ms), {r['wall']*1000:.1f} ms total")
+
+        slowest = sorted(
+            [(n, t) for n, t in r["modules"].items() if n not in base],
+            key=lambda e: e[1][0],
+            reverse=True
+        )
+        for name, t in slowest[:args.top]:
+            print(f"  {name:<40}{t[0]*1000:>8.2f} ms")
+
+        if r["importTime"] > budget:
+            print(f"  over budget by {(r['importTime'] - budget)*1000:.1f} ms")
+            status = 1
+
+        for name in r["forbidden"]:
+            print(f"  imports '{name}', which this mode doesn't need")
+            status = 1
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
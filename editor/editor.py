@@ -639,7 +639,9 @@ class Editor:
         if platform.system() == "Windows":
             subprocess.Popen(f'{self._preferences["pyinterp"]} "{os.getcwd().replace(os.sep, "/")}/locks-interpreter.py" "{self._curOpenFile}"', creationflags=subprocess.CREATE_NEW_CONSOLE)
         else:
-            subprocess.Popen(f'{self._preferences["pyinterp"]} "{os.getcwd().replace(os.sep, "/")}/locks-interpreter.py" "{self._curOpenFile}"', shell=True)
+            # locks-client.py runs the program on locks-daemon.py if it is
+            #  running, and falls back to locks-interpreter.py otherwise
+            subprocess.Popen(f'{self._preferences["pyinterp"]} "{os.getcwd().replace(os.sep, "/")}/locks-client.py" "{self._curOpenFile}"', shell=True)
 
     def _runDebug(self, e=None) -> None:
         if self._curOpenFile == "untitled":
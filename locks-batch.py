@@ -0,0 +1,108 @@
+import sys
+import os
+import glob
+import json
+import argparse
+from typing import List, Optional
+
+from locks.batch import runBatch
+from locks.vm.limits import Limits
+
+
+#
+# Input file of a script: <name>.input next to the script, or in the input
+#  directory if one was given. None if there is no such file.
+#
+def _findInput(path: str, inputDir: str) -> Optional[str]:
+    name: str = os.path.splitext(os.path.basename(path))[0] + ".input"
+    d: str = inputDir if inputDir != None else os.path.dirname(path)
+    inp: str = os.path.join(d, name)
+    return inp if os.path.isfile(inp) else None
+
+
+def main():
+    argParser = argparse.ArgumentParser(
+        description="locks-batch: run many locks programs in parallel"
+    )
+
+    argParser.add_argument(
+        'paths',
+        metavar='path',
+        nargs='+',
+        help='paths to locks(.lks) files, or glob patterns like "scripts/**/*.lks"'
+    )
+
+    argParser.add_argument(
+        '-i',
+        '--inputDir',
+        metavar="<directory>",
+        help='Directory with the input files of the scripts. The input of <name>.lks is <name>.input, which is looked for next to the script by default.',
+    )
+
+    argParser.add_argument(
+        '-j',
+        '--jobs',
+        metavar="<count>",
+        type=int,
+        help='Number of worker processes. Default is the number of CPUs.',
+    )
+
+    argParser.add_argument(
+        '-o',
+        '--output',
+        metavar="<output-filename>",
+        help='Write the JSON report to specified file instead of stdout.',
+    )
+
+    argParser.add_argument(
+        '--maxInstructions',
+        metavar="<count>",
+        type=int,
+        help='Stop a script with an error after it executes specified number of VM instructions.',
+    )
+
+    argParser.add_argument(
+        '--timeout',
+        metavar="<seconds>",
+        type=float,
+        help='Stop a script with an error after it runs for specified number of seconds.',
+    )
+
+    argParser.add_argument(
+        '--maxCallDepth',
+        metavar="<depth>",
+        type=int,
+        help='Stop a script with an error if function calls are nested deeper than specified depth.',
+    )
+
+    args = argParser.parse_args()
+
+    scripts: List[str] = []
+    for p in args.paths:
+        matches: List[str] = sorted(glob.glob(p, recursive=True))
+        if len(matches) == 0:
+            # not a pattern, missing files are reported in the report
+            matches = [p]
+        scripts += matches
+
+    inputs: List[Optional[str]] = [_findInput(s, args.inputDir) for s in scripts]
+
+    limits: Limits = None
+    if args.maxInstructions != None or args.timeout != None or args.maxCallDepth != None:
+        limits = Limits(args.maxInstructions, args.timeout, args.maxCallDepth)
+
+    report: dict = runBatch(scripts, inputs, args.jobs, limits)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        t = report["total"]
+        print(f"{t['passed']} passed, {t['failed']} failed in {t['elapsed']:.3f} seconds", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=4))
+
+    return 0 if report["total"]["failed"] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import sys
+import os
+
+from locks.cli import makeArgParser
+from locks.client import runRemote
+
+
+#
+# Runs a program on the execution daemon (locks-daemon.py). Accepts the same
+#  options as locks-interpreter.py. Options that the daemon doesn't handle, like
+#  -d or -g, and any run when the daemon isn't running are passed on to
+#  locks-interpreter.py.
+#
+def _runLocally() -> None:
+    interp: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locks-interpreter.py")
+    os.execv(sys.executable, [sys.executable, interp] + sys.argv[1:])
+
+
+def main():
+    args = makeArgParser().parse_args()
+
+    if (args.debug or args.registerVM or args.transpile or args.bytecode or args.viewBytecode or args.genASTdot
+        or args.inline or args.profile or args.profileJSON or args.sampleProfile):
+        _runLocally()
+
+    # open and read locks file
+    try:
+        program = open(args.path, 'r', encoding='unicode_escape').read()
+    except FileNotFoundError:
+        print(f"Error: file '{args.path}' not found")
+        return 1
+    except Exception as e:
+        print(f"Error opening file '{args.path}'")
+        print(f"Error: {e}")
+        return 1
+
+    limits: dict = dict()
+    if args.maxInstructions != None:
+        limits["maxInstructions"] = args.maxInstructions
+    if args.timeout != None:
+        limits["timeout"] = args.timeout
+    if args.maxCallDepth != None:
+        limits["maxCallDepth"] = args.maxCallDepth
+
+    request: dict = {
+        "source": program,
+        "path": os.path.abspath(args.path),
+        "cwd": os.getcwd(),
+        "limits": limits,
+        "unbuffered": args.unbuffered,
+        "lineBuffered": args.lineBuffered or sys.stdout.isatty(),
+    }
+
+    try:
+        returnCode, error = runRemote(request)
+    except OSError:
+        _runLocally()
+
+    if error != None:
+        print(error)
+
+    return returnCode
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import sys
+import asyncio
+import argparse
+
+from locks.daemon import Daemon
+
+
+def main():
+    argParser = argparse.ArgumentParser(
+        description="locks-daemon: keep warm locks interpreters running for locks-client.py"
+    )
+
+    argParser.add_argument(
+        '-s',
+        '--socket',
+        metavar="<path>",
+        help='Path of the Unix domain socket to listen on.',
+    )
+
+    argParser.add_argument(
+        '-j',
+        '--workers',
+        metavar="<count>",
+        type=int,
+        help='Number of worker processes, which is the number of programs that can run at once. Default is the number of CPUs.',
+    )
+
+    args = argParser.parse_args()
+
+    d = Daemon(args.socket, args.workers)
+    print(f"Listening on {d.socketPath} with {d.workerCount} workers", file=sys.stderr)
+
+    try:
+        asyncio.run(d.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    main()
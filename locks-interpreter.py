@@ -1,65 +1,107 @@
 import sys
-import argparse
 import os
-import tkinter as tk
 from time import time
 
+# only the modules needed by every mode are imported here, the rest are
+#  imported by the mode that uses them, see benchmarks/startup.py
 from locks.lexer.lexer import Lexer
 from locks.parser.parser import Parser
 from locks.analyzer.analyzer import SemanticAnalyzer
-from locks.interpreter.interpreter import Interpeter
-
-from locks.compiler.compiler import Compiler
-from locks.assembler.asm import Assembler
-from locks.vm.vm import VirtualMachine
 
 from locks.error import Error
+from locks.cli import makeArgParser
+from locks.output import stdout
 
-from locks.visualizeAST.gendot import VisualizeAST
 
+#
+# Compiles and runs the program on the register VM (locks/regvm). With -b
+#  or -v, outputs the register code instead.
+#
+def runRegisterVM(ast, args) -> int:
+    from locks.regvm.compiler import RegisterCompiler
+    from locks.regvm.vm import RegisterVM
 
-def main():
-    # setup CLI
-    argParser = argparse.ArgumentParser(
-        description="locks-py: the locks interpreter"
-    )
+    if (args.debug or args.inline or args.profile or args.profileJSON or args.sampleProfile
+        or args.maxInstructions != None or args.timeout != None or args.maxCallDepth != None):
+        print("Error: -r can't be combined with -d, -i, profiling or execution limits, which are only supported by the stack VM")
+        return 1
 
-    argParser.add_argument(
-        'path',
-        metavar='path',
-        type=str,
-        help='path to a locks(.lks) file'
-    )
+    try:
+        c = RegisterCompiler()
+        c.visit(ast)
+        program = c.getProgram()
+    except:
+        print("\n Compile Error. Exiting...")
+        return -1
 
-    argParser.add_argument(
-        '-d',
-        '--debug',
-        action='store_true',
-        help='Use the tree walk interpreter instead of the locks VM to execute code.',
-    )
+    if args.bytecode:
+        outputf = open(args.bytecode, "w")
+        outputf.write(c.getCode())
+        outputf.close()
+        return 0
 
-    argParser.add_argument(
-        '-b',
-        '--bytecode',
-        metavar="<output-filename>",
-        help='Store code generated by compiler in specified file.',
-    )
+    if args.viewBytecode:
+        print(c.getCode())
+        return 0
 
-    argParser.add_argument(
-        '-v',
-        '--viewBytecode',
-        action='store_true',
-        help='Output code generated by compiler to stdout.',
-    )
+    try:
+        RegisterVM(program).run()
+    except Error as e:
+        print(e)
+        return -1
 
-    argParser.add_argument(
-        '-g',
-        '--genASTdot',
-        metavar="<output-filename>",
-        help='Generate a graphviz dot file to visualize AST. Generated code will be stored in specified file.',
-    )
+    return 0
 
-    args = argParser.parse_args()
+
+#
+# Translates the program to Python source (locks/transpiler) and runs it.
+#  With -b or -v, outputs the Python source instead.
+#
+def runTranspiled(ast, args) -> int:
+    from locks.transpiler.transpiler import Transpiler
+    from locks.transpiler.support import run
+
+    if (args.debug or args.registerVM or args.inline or args.profile or args.profileJSON or args.sampleProfile
+        or args.maxInstructions != None or args.timeout != None or args.maxCallDepth != None):
+        print("Error: -t can't be combined with -d, -r, -i, profiling or execution limits, which are only supported by the stack VM")
+        return 1
+
+    try:
+        t = Transpiler()
+        t.visit(ast)
+        code = t.getCode()
+    except:
+        print("\n Compile Error. Exiting...")
+        return -1
+
+    if args.bytecode:
+        outputf = open(args.bytecode, "w")
+        outputf.write(code)
+        outputf.close()
+        return 0
+
+    if args.viewBytecode:
+        print(code)
+        return 0
+
+    try:
+        run(code, t.getLines())
+    except Error as e:
+        print(e)
+        return -1
+
+    return 0
+
+
+def main():
+    # setup CLI, the options are defined in locks/cli.py
+    args = makeArgParser().parse_args()
+
+    # output buffer for print and println
+    stdout.configure(
+        buffered=not args.unbuffered,
+        flushOnNewline=args.lineBuffered or sys.stdout.isatty()
+    )
 
     # open and read locks file
     try:
@@ -97,6 +139,9 @@ def main():
 
     # visualize AST
     if args.genASTdot:
+        import tkinter as tk
+        from locks.visualizeAST.gendot import VisualizeAST
+
         vis = VisualizeAST()
         vis.visit(ast)
         dot = vis.getDot()
@@ -205,7 +250,24 @@ def main():
             input("\nPress Enter to continue...")
         return -1
 
+    # -t specified, run the program translated to Python
+    if args.transpile:
+        return runTranspiled(ast, args)
+
+    # -r specified, use the register VM
+    if args.registerVM:
+        return runRegisterVM(ast, args)
+
+    # -i specified, inline small functions before the program is compiled
+    #  for the stack VM. The tree walk interpreter runs the AST as it is
+    if args.inline and (args.bytecode or args.viewBytecode or not args.debug):
+        from locks.compiler.inliner import Inliner
+        Inliner(args.maxInlineSize).visit(ast)
+
     # -b specified, output generated code
+    if args.bytecode or args.viewBytecode or not args.debug:
+        from locks.compiler.compiler import Compiler
+
     if args.bytecode:
         c = Compiler()
         c.visit(ast)
@@ -224,6 +286,12 @@ def main():
 
     # -d specified, use tree walk interpreter
     if args.debug:
+        from locks.interpreter.interpreter import Interpeter
+
+        if args.maxInstructions != None or args.timeout != None or args.maxCallDepth != None:
+            print("Error: -d can't be combined with execution limits, which are only supported by the stack VM")
+            return 1
+
         try:
             t0 = time()
 
@@ -252,6 +320,11 @@ def main():
 
     # run VM
     else:
+        from locks.assembler.asm import Assembler
+        from locks.vm.vm import VirtualMachine
+        from locks.vm.profiler import Profiler
+        from locks.vm.limits import Limits
+
         try:
             c = Compiler()
             c.visit(ast)
@@ -260,16 +333,42 @@ def main():
             print("\n Compile Error. Exiting...")
             return -1
         
+        profiler: Profiler = None
+        sampler: SamplingProfiler = None
+
+        limits: Limits = None
+        if args.maxInstructions != None or args.timeout != None or args.maxCallDepth != None:
+            limits = Limits(args.maxInstructions, args.timeout, args.maxCallDepth)
+
         try:
             a = Assembler(code)
             b = a.getBytecodeList()
             #for i in b:
             #    print(hex(i), end=' ')
-            v  = VirtualMachine(b)
-            v.run()
+            if args.profile or args.profileJSON:
+                profiler = Profiler(a.getFunctionNames())
+
+            # compiled loops would hide the lines they run from the sampler
+            v  = VirtualMachine(b, jit=args.sampleProfile == None)
+
+            if args.sampleProfile:
+                from locks.vm.sampler import SamplingProfiler
+                sampler = SamplingProfiler(v, a.getFunctionNames(), args.sampleInterval/1000)
+                sampler.start()
+
+            v.run(profiler, limits)
         except Error as e:
             print(e)
             return -1
+        finally:
+            if sampler != None:
+                sampler.stop()
+                sampler.writeCollapsed(args.sampleProfile)
+            # profile report goes to stderr, so it doesn't mix with program output
+            if profiler != None and args.profile:
+                print(profiler.getReport(), file=sys.stderr)
+            if profiler != None and args.profileJSON:
+                profiler.writeJSON(args.profileJSON)
 
     return 0
 
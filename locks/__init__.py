@@ -0,0 +1,10 @@
+#
+# The embedding API (locks/runtime.py) is imported on first use, so importing
+#  a single part of the pipeline, like locks.lexer.lexer, doesn't import all
+#  of it.
+#
+def __getattr__(name: str):
+    if name in ["Runtime", "Program", "RunResult"]:
+        from . import runtime
+        return getattr(runtime, name)
+    raise AttributeError(f"module 'locks' has no attribute '{name}'")
@@ -4,8 +4,18 @@ from ..nodevisitor import NodeVisitor
 from ..error import NameErr, TypeErr, SyntaxErr
 from ..lexer.token import Token, TokenType
 
+from ..stdlib import builtinFunctionInfo
+
 from .symboltable import SymbolTable
-from .symboltable import TypeSymbol, VariableSymbol, FunctionSymbol
+from .symboltable import Symbol, TypeSymbol, VariableSymbol, FunctionSymbol
+
+
+# symbols of builtin functions, built once and shared by every analyzer
+#  builtinFunctionInfo is defined in locks/stdlib.py
+_builtinSymbols: List[FunctionSymbol] = [
+    FunctionSymbol(f, None, [VariableSymbol("s")]*builtinFunctionInfo[f][1])
+    for f in builtinFunctionInfo
+]
 
 
 #
@@ -59,15 +69,8 @@ class SemanticAnalyzer(NodeVisitor):
         self._mainST.add(TypeSymbol("double"))
         self._mainST.add(TypeSymbol("string"))
 
-        builtinFunctions: List[str] = [
-            "print", "println", "input",
-            "len",
-            "int", "str",
-            "isinteger"
-        ]
-
-        for f in builtinFunctions:
-            self._mainST.add(FunctionSymbol(f, None, [VariableSymbol("s")]))
+        for f in _builtinSymbols:
+            self._mainST.add(f)
 
 
     def visit_ProgramNode(self, node) -> None:
@@ -79,8 +82,16 @@ class SemanticAnalyzer(NodeVisitor):
             self.visit(d)
 
 
+    #
+    # builtin functions may be shadowed by user declarations
+    #
+    def _isBuiltin(self, s: Symbol) -> bool:
+        return s.type == "function" and s.block == None
+
+
     def visit_VarDeclNode(self, node) -> None:
-        if self._currentST.get(node.id.token.value, True) != None:
+        sym: Symbol = self._currentST.get(node.id.token.value, True)
+        if sym != None and not self._isBuiltin(sym):
             self._error('n', f"duplicate definition of name '{node.id.token.value}'", node.id.token)
             return 
 
@@ -316,7 +327,8 @@ class SemanticAnalyzer(NodeVisitor):
 
 
     def visit_FunDeclNode(self, node) -> None:
-        if self._currentST.get(node.id.token.value) != None:
+        sym: Symbol = self._currentST.get(node.id.token.value)
+        if sym != None and not self._isBuiltin(sym):
             self._error('n', f"duplicate definition of name '{node.id.token.value}'", node.id.token)
             return
 
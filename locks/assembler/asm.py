@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
 from ..instruction import opcodeSizeDict, opcodeNameDict
 
 
@@ -7,23 +7,17 @@ class Assembler:
         self._inpCodeList: List[str] = []
 
         # split inpstr by newline character, except in strings (marked by double quotes)
-        i = 0
-        s = ''
-        while i < len(inpstr):
-            if inpstr[i] == '"':
-                i += 1
-                s += '"'
-                while inpstr[i] != '"':
-                    s += inpstr[i]
-                    i += 1
-            
-            s += inpstr[i]
-            
-            if inpstr[i] == '\n':
-                self._inpCodeList.append(s)
-                s = ""
+        line: str = None
+        for piece in inpstr.split('\n'):
+            line = piece if line == None else line + '\n' + piece
 
-            i += 1
+            # an odd number of quotes means a string continues on the next line
+            if line.count('"') % 2 == 0:
+                self._inpCodeList.append(line + '\n')
+                line = None
+
+        # index of the next line of _inpCodeList to assemble
+        self._pos: int = 0
 
         self._outputCodeList: List[int] = []
 
@@ -32,6 +26,12 @@ class Assembler:
 
         self._labelsDict: Dict[str, int] = dict()
 
+        # <global variable name> : <index in the locals of main>
+        self._globalVarDict: Dict[str, int] = None
+
+        # position of the number of locals of main in the output
+        self._mainLocalsPos: int = 0
+
 
     def getBytecodeList(self) -> List[int]:
         self._initCode()
@@ -42,6 +42,15 @@ class Assembler:
         return self._outputCodeList
 
 
+    # function names indexed by their position in the function pool.
+    #  only available after getBytecodeList has been called
+    def getFunctionNames(self) -> List[str]:
+        names: List[str] = [""]*self._fnCount
+        for n in self._fnDict:
+            names[self._fnDict[n]] = n
+        return names
+
+
     def _emit(self, *args) -> None:
         for i in args:
             self._outputCodeList.append(i)
@@ -53,66 +62,62 @@ class Assembler:
             self._inpCodeList[i] = v.strip()
 
         # remove blank lines
-        while '' in self._inpCodeList:
-            self._inpCodeList.remove('')
+        self._inpCodeList = [l for l in self._inpCodeList if l != '']
 
         # add magic number for Locks VM
         self._emit(0x4d, 0x69, 0x68, 0x6f)
 
 
     #
-    # Converts identifiers to indices and lables to memory locations
-    # Also counts the number of functions and the code size for each one
+    # Counts the functions and numbers them in order
+    # Note that this will remove all lines marked by 'fn'
+    # Labels are resolved per function, see _layoutFunction
     #
     def _resolveLabels(self) -> None:
-        # count functions
-        # note that this will remove all lines marked by 'fn'
-        i = 0
-        while i < len(self._inpCodeList):
-            l = self._inpCodeList[i].split(' ')
-            if l[0] == "fn":
-                self._fnDict[l[1]] = self._fnCount
-                self._inpCodeList.pop(i)
+        lines: List[str] = []
+        for l in self._inpCodeList:
+            ins: List[str] = l.split(' ')
+            if ins[0] == "fn":
+                self._fnDict[ins[1]] = self._fnCount
                 self._fnCount += 1
+            else:
+                lines.append(l)
 
-            i += 1
+        self._inpCodeList = lines
 
-        i = 0
-        totalInsSize = 0
-        while i < len(self._inpCodeList):
-            l = self._inpCodeList[i].split(' ')
 
-            # argc marks the beginning of a function
-            if l[0] == "argc":
-                totalInsSize = 0
-            
-            elif l[0][0] == '.':
-                self._labelsDict[l[0][1:]] = totalInsSize
-                self._inpCodeList.pop(i)
-                continue
+    def _removeFromFront(self, n: int) -> None:
+        self._pos += n
 
-            else:
-                if l[0] in opcodeSizeDict:
-                    totalInsSize += opcodeSizeDict[l[0]]
 
-            i += 1
-                
+    def _curLine(self) -> str:
+        return self._inpCodeList[self._pos]
 
-    def _removeFromFront(self, n: int) -> None:
-        self._inpCodeList = self._inpCodeList[n:]
+
+    def _emitU16(self, n: int) -> None:
+        self._emit(
+            (n >> 8) & 0xff,
+            n & 0xff
+        )
 
 
-    def _makeConstantPool(self) -> None:
-        # cpc - constants pool size
-        size: int = int(self._inpCodeList[0].split(' ')[1])
+    def _emitU32(self, n: int) -> None:
         self._emit(
-            (size & 0xff00) >> 8,
-            (size & 0xff)
+            (n >> 24) & 0xff,
+            (n >> 16) & 0xff,
+            (n >> 8) & 0xff,
+            n & 0xff
         )
 
+
+    def _makeConstantPool(self) -> None:
+        # cpc - constants pool size
+        size: int = int(self._curLine().split(' ')[1])
+        self._emitU32(size)
+
         self._removeFromFront(1)
 
-        for i in range(size):
+        for i in range(self._pos, self._pos + size):
             typ: str = self._inpCodeList[i][0]
             ins: List[str] = self._inpCodeList[i][1:].strip()
             
@@ -188,73 +193,208 @@ class Assembler:
 
     def _makeCode(self) -> None:
         # number of functions
-        self._emit(
-            self._fnCount >> 8,
-            self._fnCount & 0xff
-        )
+        self._emitU16(self._fnCount)
 
         for _ in range(self._fnCount):
             self._makeFunction()
 
+        # functions may use globals that main doesn't, the number of locals
+        #  of main is only known now
+        nlocals: int = len(self._globalVarDict)
+        for i in range(4):
+            self._outputCodeList[self._mainLocalsPos + i] = (nlocals >> (8*(3-i))) & 0xff
+
+
+    # index of a variable, new variables get the next free index
+    def _getVarIndex(self, varDict: Dict[str, int], name: str) -> int:
+        if name not in varDict:
+            varDict[name] = len(varDict)
+        return varDict[name]
+
+
+    #
+    # Number of EXTENDED_ARG prefixes needed for 'arg' to fit in an operand
+    #  of 'width' bytes. Every prefix adds one byte to the operand, most
+    #  significant byte first.
+    #
+    def _getExtendedArgCount(self, arg: int, width: int) -> int:
+        n: int = 0
+        arg >>= 8*width
+        while arg > 0:
+            n += 1
+            arg >>= 8
+        return n
+
 
     def _makeFunction(self) -> None:
         localVarDict: Dict[str, int] = dict()
-        localVarCount: int = 0
 
-        argc: int = int(self._inpCodeList[0].split(' ')[1])
-        self._emit(
-            argc >> 8,
-            argc & 0xff
-        )
+        # main is the first function, its locals are the globals
+        isMain: bool = self._globalVarDict == None
+        if isMain:
+            self._globalVarDict = localVarDict
+
+        argc: int = int(self._curLine().split(' ')[1])
+        self._emitU16(argc)
         self._removeFromFront(1)
 
-        # calculate total function size in bytes
-        # opcodeSizeDict is defined in locks/instruction.py
-        size: int = 0
-        for l in self._inpCodeList:
-            l = l.split(' ')[0]
-            if l == "argc":
-                break
-            size += opcodeSizeDict[l]
+        # (<opcode name>, <operand>) for instructions, ("line", <line>) for
+        #  'line' directives and (".", <label>) for labels
+        body: List[Tuple[str, Union[int, str]]] = []
 
-        self._emit(
-            size >> 8,
-            size & 0xff
-        )
-
-        while len(self._inpCodeList) > 0:
-            ins = self._inpCodeList[0].split(' ')\
+        while self._pos < len(self._inpCodeList):
+            ins = self._curLine().split(' ')
 
             # argc marks beginnig of new function
             if ins[0] == "argc":
                 break
+            self._removeFromFront(1)
+
+            if ins[0] == "line":
+                body.append(("line", int(ins[1])))
+                continue
+
+            if ins[0][0] == '.':
+                body.append((".", ins[0][1:]))
+                continue
+
+            arg: Union[int, str] = None
+            if opcodeSizeDict[ins[0]] > 1:
+                arg = ins[1]
+
+                if ins[0] in ["STORE_LOCAL", "LOAD_LOCAL", "INC_LOCAL"]:
+                    arg = self._getVarIndex(localVarDict, arg)
+                elif ins[0] in ["STORE_GLOBAL", "LOAD_GLOBAL", "INC_GLOBAL"]:
+                    arg = self._getVarIndex(self._globalVarDict, arg)
+                elif arg in self._fnDict:
+                    arg = self._fnDict[arg]
+                elif arg.isnumeric():
+                    arg = int(arg)
+                # anything else is a label, resolved by _layoutFunction
+
+            body.append((ins[0], arg))
+
+        sizes: List[int] = self._layoutFunction(body)
+
+        # number of locals, patched later for main
+        if isMain:
+            self._mainLocalsPos = len(self._outputCodeList)
+        self._emitU32(len(localVarDict))
+
+        self._emitU32(sum(sizes))
+
+        # (<offset in function code>, <source line>) for each 'line' directive
+        lines: List[Tuple[int, int]] = []
+        pc: int = 0
+
+        for (name, arg), size in zip(body, sizes):
+            if name == "line":
+                # only the last line marked at an offset matters
+                if len(lines) > 0 and lines[-1][0] == pc:
+                    lines.pop()
+                lines.append((pc, arg))
+                continue
 
-            self._emit(opcodeNameDict[ins[0]])
-
-            argc = opcodeSizeDict[ins[0]] - 1
-
-            if argc > 0 and not ins[1].isnumeric():
-                if ins[1] in self._labelsDict:
-                    ins[1] = self._labelsDict[ins[1]]
-                elif ins[1] in self._fnDict:
-                    ins[1] = self._fnDict[ins[1]]
-
-            if ins[0] in ["STORE_LOCAL", "LOAD_LOCAL", "STORE_GLOBAL", "LOAD_GLOBAL"]:
-                if ins[1] not in localVarDict:
-                    localVarDict[ins[1]] = localVarCount
-                    ins[1] = localVarCount
-                    localVarCount += 1
-                else:
-                    ins[1] = localVarDict[ins[1]]
-                    
-            if argc == 1:
-                arg: int = int(ins[1])
-                self._emit(arg)
-            elif argc == 2:
-                arg: int = int(ins[1])
+            if name == ".":
+                continue
+
+            pc += size
+            width: int = opcodeSizeDict[name] - 1
+
+            if width == 0:
+                self._emit(opcodeNameDict[name])
+                continue
+
+            if type(arg).__name__ == "str":
+                arg = self._labelsDict[arg]
+
+            # EXTENDED_ARG prefixes for the bytes that don't fit in the operand
+            for i in range(self._getExtendedArgCount(arg, width), 0, -1):
                 self._emit(
-                    arg >> 8,
-                    arg & 0xff
+                    opcodeNameDict["EXTENDED_ARG"],
+                    (arg >> (8*(width + i - 1))) & 0xff
                 )
 
-            self._removeFromFront(1)
+            self._emit(opcodeNameDict[name])
+            if width == 1:
+                self._emit(arg & 0xff)
+            elif width == 2:
+                self._emitU16(arg)
+
+        self._makeLineTable(lines)
+
+
+    #
+    # Finds the offset of every label in the function, and the size of every
+    #  instruction including its EXTENDED_ARG prefixes. A jump may need
+    #  prefixes only because the instructions before its target got longer,
+    #  so this is repeated until no instruction grows.
+    #
+    def _layoutFunction(self, body: List[Tuple[str, Union[int, str]]]) -> List[int]:
+        sizes: List[int] = []
+        for name, arg in body:
+            if name in ["line", "."]:
+                sizes.append(0)
+            elif type(arg).__name__ == "int":
+                width: int = opcodeSizeDict[name] - 1
+                sizes.append(opcodeSizeDict[name] + 2*self._getExtendedArgCount(arg, width))
+            else:
+                sizes.append(opcodeSizeDict[name])
+
+        grew: bool = True
+        while grew:
+            pc: int = 0
+            for (name, arg), size in zip(body, sizes):
+                if name == ".":
+                    self._labelsDict[arg] = pc
+                pc += size
+
+            grew = False
+            for i, (name, arg) in enumerate(body):
+                if name in ["line", "."] or type(arg).__name__ != "str":
+                    continue
+
+                width: int = opcodeSizeDict[name] - 1
+                size: int = opcodeSizeDict[name] + 2*self._getExtendedArgCount(self._labelsDict[arg], width)
+                if size > sizes[i]:
+                    sizes[i] = size
+                    grew = True
+
+        return sizes
+
+
+    #
+    # Line table of a function: the table size (4 bytes) followed by pairs of
+    #  (offset delta, line delta) bytes, like the lnotab of CPython. Both start
+    #  at 0. Offset deltas are unsigned, line deltas are signed (two's
+    #  complement), and deltas that don't fit in a byte are split into
+    #  several pairs.
+    #
+    def _makeLineTable(self, lines: List[Tuple[int, int]]) -> None:
+        table: List[int] = []
+        lastPc: int = 0
+        lastLine: int = 0
+
+        for pc, line in lines:
+            dpc: int = pc - lastPc
+            dline: int = line - lastLine
+
+            while dpc > 0xff:
+                table += [0xff, 0]
+                dpc -= 0xff
+
+            while dline > 127:
+                table += [dpc, 127]
+                dpc = 0
+                dline -= 127
+
+            while dline < -128:
+                table += [dpc, (-128) & 0xff]
+                dpc = 0
+                dline += 128
+
+            table += [dpc, dline & 0xff]
+            lastPc, lastLine = pc, line
+
+        self._emitU32(len(table))
+        self._emit(*table)
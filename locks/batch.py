@@ -0,0 +1,128 @@
+import os
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from .runtime import Runtime, Program, RunResult
+from .vm.limits import Limits
+from .error import Error
+
+
+#
+# Parallel batch runner used by locks-batch.py
+#  Every distinct script is compiled once in the parent process. The bytecode
+#  of all of them is handed to each worker when it starts, and workers build
+#  their Code objects from it on first use, so a task only sends the index of
+#  a program and its input. Importing this module in the worker imports the
+#  whole pipeline, before the first task arrives.
+#
+
+# per worker process state, set by _initWorker
+_bytecodes: List[Tuple[List[int], List[str]]] = []
+_programs: Dict[int, Program] = dict()
+_runtime: Runtime = None
+
+
+def _initWorker(bytecodes: List[List[int]], functionNames: List[List[str]], limits: Limits) -> None:
+    global _bytecodes, _programs, _runtime
+    _bytecodes = list(zip(bytecodes, functionNames))
+    _programs = dict()
+    _runtime = Runtime(limits=limits)
+
+
+def _getProgram(idx: int) -> Program:
+    if idx not in _programs:
+        bytecode, names = _bytecodes[idx]
+        _programs[idx] = Program(bytecode, names, str(idx))
+    return _programs[idx]
+
+
+def _runTask(idx: int, inp: bytes) -> Dict[str, Any]:
+    t0: float = perf_counter()
+    p: Program = _getProgram(idx)
+    t1: float = perf_counter()
+
+    r: RunResult = _runtime.run(p, inp)
+
+    return {
+        "returnCode": r.returnCode,
+        "output": r.output,
+        "error": None if r.error == None else str(r.error),
+        "loadTime": t1 - t0,
+        "runTime": r.elapsed,
+        "pid": os.getpid(),
+    }
+
+
+#
+# Runs every script with its input file (None for no input) and returns the
+#  report: one entry per script, in the order given, and totals.
+#
+def runBatch(
+    scripts: List[str],
+    inputs: List[Optional[str]],
+    jobs: int = None,
+    limits: Limits = None
+) -> Dict[str, Any]:
+    t0: float = perf_counter()
+
+    rt = Runtime(cacheSize=len(scripts) + 1)
+    results: List[Dict[str, Any]] = []
+
+    # <program key> : <index in the list of programs sent to workers>
+    programIndex: Dict[str, int] = dict()
+    bytecodes: List[List[int]] = []
+    functionNames: List[List[str]] = []
+
+    # compile in the parent, scripts with the same source share a program
+    tasks: List[tuple] = []
+    for path, inpPath in zip(scripts, inputs):
+        entry: Dict[str, Any] = {"path": path, "input": inpPath}
+        results.append(entry)
+
+        c0: float = perf_counter()
+        try:
+            p: Program = rt.compileFile(path)
+            inp: bytes = b''
+            if inpPath != None:
+                with open(inpPath, 'rb') as f:
+                    inp = f.read()
+        except (Error, OSError) as e:
+            entry.update({"returnCode": -1, "output": None, "error": str(e), "compileTime": perf_counter() - c0})
+            continue
+        entry["compileTime"] = perf_counter() - c0
+
+        if p.key not in programIndex:
+            programIndex[p.key] = len(bytecodes)
+            bytecodes.append(p.bytecode)
+            functionNames.append(p.functionNames)
+
+        tasks.append((entry, programIndex[p.key], inp))
+
+    if len(tasks) > 0:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_initWorker,
+            initargs=(bytecodes, functionNames, limits)
+        ) as pool:
+            futures = [(entry, pool.submit(_runTask, idx, inp)) for entry, idx, inp in tasks]
+
+            for entry, fut in futures:
+                try:
+                    entry.update(fut.result())
+                except Exception as e:
+                    # the worker crashed or the program hit a bug in the VM
+                    entry.update({"returnCode": -1, "output": None, "error": f"{type(e).__name__}: {e}"})
+
+    failed: int = sum(1 for r in results if r["returnCode"] != 0)
+
+    return {
+        "scripts": results,
+        "total": {
+            "count": len(results),
+            "passed": len(results) - failed,
+            "failed": failed,
+            "compiled": len(bytecodes),
+            "elapsed": perf_counter() - t0,
+        }
+    }
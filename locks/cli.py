@@ -0,0 +1,138 @@
+import argparse
+
+
+#
+# Options of locks-interpreter.py, shared with locks-client.py so both
+#  accept the same command line
+#
+def makeArgParser() -> argparse.ArgumentParser:
+    argParser = argparse.ArgumentParser(
+        description="locks-py: the locks interpreter"
+    )
+
+    argParser.add_argument(
+        'path',
+        metavar='path',
+        type=str,
+        help='path to a locks(.lks) file'
+    )
+
+    argParser.add_argument(
+        '-d',
+        '--debug',
+        action='store_true',
+        help='Use the tree walk interpreter instead of the locks VM to execute code.',
+    )
+
+    argParser.add_argument(
+        '-r',
+        '--registerVM',
+        action='store_true',
+        help='Use the register based VM instead of the stack based locks VM to execute code.',
+    )
+
+    argParser.add_argument(
+        '-t',
+        '--transpile',
+        action='store_true',
+        help='Translate the program to Python source and run it with the Python interpreter instead of the locks VM.',
+    )
+
+    argParser.add_argument(
+        '-b',
+        '--bytecode',
+        metavar="<output-filename>",
+        help='Store code generated by compiler in specified file.',
+    )
+
+    argParser.add_argument(
+        '-v',
+        '--viewBytecode',
+        action='store_true',
+        help='Output code generated by compiler to stdout.',
+    )
+
+    argParser.add_argument(
+        '-g',
+        '--genASTdot',
+        metavar="<output-filename>",
+        help='Generate a graphviz dot file to visualize AST. Generated code will be stored in specified file.',
+    )
+
+    argParser.add_argument(
+        '-i',
+        '--inline',
+        action='store_true',
+        help='Inline calls to small functions when compiling for the locks VM.',
+    )
+
+    argParser.add_argument(
+        '--maxInlineSize',
+        metavar="<nodes>",
+        type=int,
+        default=40,
+        help='Largest function body, in AST nodes, inlined with -i. Default is 40.',
+    )
+
+    argParser.add_argument(
+        '-u',
+        '--unbuffered',
+        action='store_true',
+        help='Write output of print and println immediately instead of buffering it.',
+    )
+
+    argParser.add_argument(
+        '--lineBuffered',
+        action='store_true',
+        help='Flush output of print and println at the end of every line.',
+    )
+
+    argParser.add_argument(
+        '-p',
+        '--profile',
+        action='store_true',
+        help='Profile the VM and print time spent per opcode and per function to stderr.',
+    )
+
+    argParser.add_argument(
+        '--profileJSON',
+        metavar="<output-filename>",
+        help='Profile the VM and write time spent per opcode and per function to specified file as JSON.',
+    )
+
+    argParser.add_argument(
+        '--sampleProfile',
+        metavar="<output-filename>",
+        help='Sample the call stack of the VM periodically and write it to specified file in collapsed stack format, for flamegraph tools.',
+    )
+
+    argParser.add_argument(
+        '--sampleInterval',
+        metavar="<milliseconds>",
+        type=float,
+        default=5,
+        help='Interval between samples taken with --sampleProfile. Default is 5 milliseconds.',
+    )
+
+    argParser.add_argument(
+        '--maxInstructions',
+        metavar="<count>",
+        type=int,
+        help='Stop the program with an error after it executes specified number of VM instructions. Not supported with -d, -r or -t.',
+    )
+
+    argParser.add_argument(
+        '--timeout',
+        metavar="<seconds>",
+        type=float,
+        help='Stop the program with an error after it runs for specified number of seconds on the VM. Not supported with -d, -r or -t.',
+    )
+
+    argParser.add_argument(
+        '--maxCallDepth',
+        metavar="<depth>",
+        type=int,
+        help='Stop the program with an error if function calls are nested deeper than specified depth on the VM. Not supported with -d, -r or -t.',
+    )
+
+    return argParser
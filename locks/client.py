@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import socket
+import tempfile
+from typing import Optional, Tuple, BinaryIO, TextIO
+
+
+#
+# Client side of the execution daemon (locks/daemon.py)
+#  Only imports modules that are already loaded when python starts, or are
+#  cheap to import, so that running a program through the daemon costs
+#  little more than starting python.
+#
+#  The protocol is one JSON object per line. The client sends a request:
+#    {"source": ..., "path": ..., "cwd": ..., "limits": {...},
+#     "unbuffered": ..., "lineBuffered": ..., "stdin": ...}
+#  and the daemon answers with any number of
+#    {"type": "output", "data": ...}   output of print and println
+#    {"type": "read"}                  the program wants more input; the
+#                                      client answers {"type": "input",
+#                                      "data": ...}, with "" at EOF
+#  followed by
+#    {"type": "exit", "returnCode": ..., "error": ...}
+#  "path" is only read when there is no "source". "stdin" is optional, when
+#  it is given the daemon never asks for input.
+#
+
+
+# os.getuid only exists on Unix, like the sockets the daemon listens on
+def getSocketPath() -> str:
+    d: str = os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir())
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "")
+    return os.path.join(d, f"locks-daemon-{user}.sock")
+
+
+def _send(sock: socket.socket, msg: dict) -> None:
+    sock.sendall(json.dumps(msg).encode("utf-8") + b'\n')
+
+
+#
+# Sends a run request to the daemon and streams the output of the program to
+#  'output'. Input is read from 'input' one line at a time, only when the
+#  program asks for it. Returns the return code and the error message of the
+#  program. Raises OSError if the daemon isn't running, or can't be reached
+#  on this platform.
+#
+def runRemote(
+    request: dict,
+    socketPath: str = None,
+    input: BinaryIO = None,
+    output: TextIO = None
+) -> Tuple[int, Optional[str]]:
+    if input == None:
+        input = getattr(sys.stdin, "buffer", sys.stdin)
+    if output == None:
+        output = sys.stdout
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not supported on this platform")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socketPath if socketPath != None else getSocketPath())
+
+    try:
+        _send(sock, request)
+        reader = sock.makefile('rb')
+
+        for line in reader:
+            msg: dict = json.loads(line)
+
+            if msg["type"] == "output":
+                output.write(msg["data"])
+                output.flush()
+
+            elif msg["type"] == "read":
+                data = input.readline()
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8", errors="replace")
+                _send(sock, {"type": "input", "data": data})
+
+            elif msg["type"] == "exit":
+                return msg["returnCode"], msg["error"]
+
+        return -1, "The daemon closed the connection"
+    finally:
+        sock.close()
@@ -1,52 +1,134 @@
-from typing import List, Union, Dict
+from typing import List, Union, Dict, Tuple
 
-from ..parser.ast import ASTNode
+from ..parser.ast import ASTNode, PrimaryNode, BinOpNode, UnaryOpNode, ConditionalNode, BlockNode
 from ..nodevisitor import NodeVisitor
 from ..stdlib import builtinFunctionInfo
+from .loops import getCountedLoop
+
+
+#
+# Returns the source line a node starts at, or 0 if it is not known. Shared
+#  with the register compiler (locks/regvm/compiler.py)
+#
+def getNodeLine(node) -> int:
+    typ: str = type(node).__name__
+
+    if isinstance(node, PrimaryNode):
+        return node.token.line
+    if isinstance(node, BinOpNode):
+        return getNodeLine(node.left)
+    if isinstance(node, UnaryOpNode):
+        return getNodeLine(node.node)
+    if isinstance(node, ConditionalNode):
+        return getNodeLine(node.condition)
+
+    if typ == "ReturnNode":
+        return node.line
+    if typ in ["VarDeclNode", "FunDeclNode"]:
+        return node.id.token.line
+    if typ == "AssignNode":
+        return getNodeLine(node.lvalue)
+    if typ == "FunctionCallNode":
+        return getNodeLine(node.nameNode)
+    if typ == "InlinedCallNode":
+        return getNodeLine(node.call)
+    if typ == "ArrayAccessNode":
+        return getNodeLine(node.base)
+    if typ in ["ContinueNode", "BreakNode"]:
+        return node.tok.line
+    if typ == "IfNode":
+        return getNodeLine(node.ifBlock)
+    if typ == "ArrayNode" and len(node.elements) > 0:
+        return getNodeLine(node.elements[0])
+
+    return 0
+
+
+# fewest branches an if needs to be compiled to a jump table, see
+#  Compiler._getSwitch
+MIN_SWITCH_CASES: int = 3
 
 
 class Compiler(NodeVisitor):
     def __init__(self) -> None:
         self._constantPool: List[str] = []
+        # <constant> : <index>, so each literal is in the pool once
+        self._constantIndex: Dict[str, int] = dict()
 
-        self._functions: Dict[str] = {
-            "main": ""
+        # lines of code of each function, joined by getCode
+        self._functions: Dict[str, List[str]] = {
+            "main": []
         }
         self._currentFn: str = "main"
 
         self._globalVars: List[str] = []
+
+        # user functions shadow builtin functions with the same name
+        self._userFunctions: List[str] = []
         self._labelCtr: int = -1
+
+        # labels after the inlined calls being compiled, innermost last, see
+        #  visit_InlinedCallNode
+        self._inlineEnds: List[str] = []
+
+        # last source line marked in each function, see _markLine
+        self._curLine: Dict[str, int] = {
+            "main": 0
+        }
         
         self._initCode()
 
 
     def getCode(self) -> str:
-        cpStr: str = f"cpc {len(self._constantPool)}\n"
+        output: List[str] = [f"cpc {len(self._constantPool)}\n"]
         for s in self._constantPool:
-            cpStr += s + '\n'
+            output.append(s + '\n')
 
-        output: str = cpStr + '\n'  
+        output.append('\n')
 
-        self._functions["main"] += "    END"
+        self._functions["main"].append("    END")
         for f in self._functions:
-            output += self._functions[f] + '\n\n'
+            output += self._functions[f]
+            output.append('\n\n')
 
-        return output
+        return ''.join(output)
 
 
     def _initCode(self) -> None:
-        self._functions[self._currentFn] += "fn main\nargc 0\n"
+        self._functions[self._currentFn].append("fn main\nargc 0\n")
 
 
     def _emit(self, c: str, fmt: bool = True) -> None:
         if fmt:
-            self._functions[self._currentFn] += f"    {c}\n"
+            self._functions[self._currentFn].append(f"    {c}\n")
         else:
-            self._functions[self._currentFn] += f"    {c}\n"
+            self._functions[self._currentFn].append(f"    {c}\n")
+
+
+    # returns the index of the constant in the pool
+    def _addConstant(self, c: str) -> int:
+        if c not in self._constantIndex:
+            self._constantIndex[c] = len(self._constantPool)
+            self._constantPool.append(c)
+        return self._constantIndex[c]
+
+
+    #
+    # Emits a 'line' directive when code for a new source line begins.
+    #  The assembler turns these into the line table of the function.
+    #
+    def _markLine(self, node) -> None:
+        line: int = getNodeLine(node)
+        if line > 0 and line != self._curLine[self._currentFn]:
+            self._curLine[self._currentFn] = line
+            self._emit(f"line {line}")
 
 
-    def _addConstant(self, c: str) -> None:
-        self._constantPool.append(c)
+    def visit(self, node):
+        # function code is emitted into the function itself, see visit_FunDeclNode
+        if type(node).__name__ != "FunDeclNode":
+            self._markLine(node)
+        return super().visit(node)
 
 
     def _generateLabel(self) -> str:
@@ -62,20 +144,20 @@ class Compiler(NodeVisitor):
     def visit_NumberNode(self, node) -> None:
         v: Union[int, float] = node.token.value
         if type(v).__name__ == "float":
-            self._addConstant(f"d {v}")
-            self._emit(f"LOAD_CONST {len(self._constantPool)-1}")
+            idx: int = self._addConstant(f"d {v}")
+            self._emit(f"LOAD_CONST {idx}")
             return
 
         if v < 256:
             self._emit(f"BIPUSH {v}")
         else:
-            self._addConstant(f"i {v}")
-            self._emit(f"LOAD_CONST {len(self._constantPool)-1}")
+            idx: int = self._addConstant(f"i {v}")
+            self._emit(f"LOAD_CONST {idx}")
 
 
     def visit_StringNode(self, node) -> None:
-        self._addConstant(f's "{node.token.value}"')
-        self._emit(f"LOAD_CONST {len(self._constantPool)-1}")
+        idx: int = self._addConstant(f's "{node.token.value}"')
+        self._emit(f"LOAD_CONST {idx}")
 
 
     def visit_NilNode(self, node) -> None:
@@ -117,10 +199,10 @@ class Compiler(NodeVisitor):
     def visit_NegationNode(self, node) -> None:
         if type(node.node).__name__ == "NumberNode":
             if type(node.node.token.value).__name__ == "float":
-                self._addConstant(f"d -{node.node.token.value}")
+                idx: int = self._addConstant(f"d -{node.node.token.value}")
             else:
-                self._addConstant(f"i -{node.node.token.value}")
-            self._emit(f"LOAD_CONST {len(self._constantPool)-1}")
+                idx: int = self._addConstant(f"i -{node.node.token.value}")
+            self._emit(f"LOAD_CONST {idx}")
         else:
             self.visit(node.node)
             self._emit("UNARY_NEGATIVE")
@@ -158,7 +240,8 @@ class Compiler(NodeVisitor):
         else:
             self._emit("LOAD_NIL")
 
-        if self._currentFn == "main":
+        # locals of inlined functions stay locals of main
+        if self._currentFn == "main" and len(self._inlineEnds) == 0:
             self._globalVars.append(node.id.token.value)
 
         self._emit(f"STORE_LOCAL {node.id.token.value}")
@@ -242,28 +325,36 @@ class Compiler(NodeVisitor):
         if not n:
             self._emit(f"POP_JMP_IF_FALSE {next}")
 
-        
-        if type(node.statement).__name__ == "ContinueNode":
+        self._branch(node.statement, startLabl, endLabl)
+
+        if n:
+            return n
+
+        return next
+
+
+    # code of the statement of an if, elsif or else
+    def _branch(self, stmt, startLabl: str, endLabl: str) -> None:
+        if type(stmt).__name__ == "ContinueNode":
             assert startLabl != None
             self._emit(f"GOTO {startLabl}")
 
-        elif type(node.statement).__name__ == "BreakNode":
+        elif type(stmt).__name__ == "BreakNode":
             assert endLabl != None
             self._emit(f"GOTO {endLabl}")
 
-        elif type(node.statement).__name__ == "BlockNode":
-            self.visit_BlockNode(node.statement, startLabl, endLabl)
+        elif type(stmt).__name__ == "BlockNode":
+            self.visit_BlockNode(stmt, startLabl, endLabl)
 
         else:
-            self.visit(node.statement)
-
-        if n:
-            return n
-
-        return next
+            self.visit(stmt)
 
 
     def visit_IfNode(self, node, startLabl: str = None, endLabl: str = None) -> None:
+        if self._getSwitch(node) != None:
+            self._switch(node, startLabl, endLabl)
+            return
+
         endifLabl: str = self._generateLabel()
 
         skipIfLabl: str = self.visit_ConditionalNode(node.ifBlock, startLabl, endLabl)
@@ -276,19 +367,94 @@ class Compiler(NodeVisitor):
             self._emit(f".{skipElsifLabl}")
 
         if node.elseBlock:
-            if type(node.elseBlock).__name__ == "ContinueNode":
-                assert startLabl != None
-                self._emit(f"GOTO {startLabl}")
+            self._branch(node.elseBlock, startLabl, endLabl)
 
-            elif type(node.elseBlock).__name__ == "BreakNode":
-                assert startLabl != None
-                self._emit(f"GOTO {endLabl}")
+        self._emit(f".{endifLabl}")
 
-            elif type(node.elseBlock).__name__ == "BlockNode":
-                self.visit_BlockNode(node.elseBlock, startLabl, endLabl)
 
-            else:
-                self.visit(node.elseBlock)
+    #
+    # An if with elsifs whose conditions all compare the same variable to a
+    #  literal, like
+    #    if(c == 1){...} elsif(c == 2){...} elsif(c == "q"){...}
+    #  is compiled to a jump table: SWITCH pops the value of the variable
+    #  and jumps to the branch for it, or to the else part if there is no
+    #  such branch. Returns (<variable>, <literals>) for such an if with at
+    #  least MIN_SWITCH_CASES branches, or None
+    #
+    def _getSwitch(self, node) -> Tuple[ASTNode, List[ASTNode]]:
+        conds: List[ASTNode] = [cs.condition for cs in [node.ifBlock] + node.elsifBlocks]
+        if len(conds) < MIN_SWITCH_CASES:
+            return None
+
+        var: ASTNode = None
+        literals: List[ASTNode] = []
+
+        for c in conds:
+            if type(c).__name__ != "EqualNode":
+                return None
+
+            # the literal may be on either side
+            v, k = c.left, c.right
+            if type(v).__name__ != "IdentifierNode":
+                v, k = k, v
+
+            if type(v).__name__ != "IdentifierNode" or self._getSwitchKey(k) == None:
+                return None
+            if var != None and v.token.value != var.token.value:
+                return None
+
+            var = v
+            literals.append(k)
+
+        return (var, literals)
+
+
+    # asm of the constant the value of a literal is looked up by, see
+    #  comparedValue in locks/vm/values.py, or None if it is not a literal
+    def _getSwitchKey(self, node) -> str:
+        typ: str = type(node).__name__
+
+        if typ == "NegationNode" and type(node.node).__name__ == "NumberNode":
+            v: Union[int, float] = -node.node.token.value
+        elif typ == "NumberNode":
+            v: Union[int, float] = node.token.value
+        elif typ == "StringNode":
+            return f's "{node.token.value}"'
+        elif typ == "TrueNode":
+            return 's "true"'
+        elif typ == "FalseNode":
+            return 's "false"'
+        elif typ == "NilNode":
+            return 's "nil"'
+        else:
+            return None
+
+        if type(v).__name__ == "float":
+            return f"d {v}"
+        return f"i {v}"
+
+
+    def _switch(self, node, startLabl: str, endLabl: str) -> None:
+        var, literals = self._getSwitch(node)
+        endifLabl: str = self._generateLabel()
+        caseLabls: List[str] = [self._generateLabel() for _ in literals]
+
+        self._markLine(node.ifBlock.condition)
+        self.visit(var)
+        self._emit(f"SWITCH {len(literals)}")
+        for k, labl in zip(literals, caseLabls):
+            self._emit(f"CASE {self._addConstant(self._getSwitchKey(k))}")
+            self._emit(f"GOTO {labl}")
+
+        # no branch matched
+        if node.elseBlock:
+            self._branch(node.elseBlock, startLabl, endLabl)
+        self._emit(f"GOTO {endifLabl}")
+
+        for cs, labl in zip([node.ifBlock] + node.elsifBlocks, caseLabls):
+            self._emit(f".{labl}")
+            self._branch(cs.statement, startLabl, endLabl)
+            self._emit(f"GOTO {endifLabl}")
 
         self._emit(f".{endifLabl}")
 
@@ -297,6 +463,10 @@ class Compiler(NodeVisitor):
         loop: str = self._generateLabel()
         endLoop: str = self._generateLabel()
 
+        if getCountedLoop(node) != None:
+            self._countedLoop(node, loop, endLoop)
+            return
+
         self._emit(f".{loop}")
         self.visit(node.condition)
         self._emit(f"POP_JMP_IF_FALSE {endLoop}")
@@ -311,34 +481,102 @@ class Compiler(NodeVisitor):
         self._emit(f".{endLoop}")
 
 
+    #
+    # Counted loops (see getCountedLoop) compare and branch with FOR_RANGE,
+    #  and increment the counter in its variable with INC_LOCAL/INC_GLOBAL,
+    #  instead of a CMPLT, POP_JMP_IF_FALSE and a load, push, add and store.
+    #  The counter stays in its variable, so the body may still use and
+    #  assign it, and 'continue' skips the increment like it does in any
+    #  desugared for loop.
+    #
+    def _countedLoop(self, node, loop: str, endLoop: str) -> None:
+        update = node.statement.stmtList[-1]
+        name: str = update.lvalue.token.value
+
+        self._emit(f".{loop}")
+        self._markLine(node.condition)
+        self.visit(node.condition.left)
+        self.visit(node.condition.right)
+        self._emit(f"FOR_RANGE {endLoop}")
+
+        self.visit_BlockNode(BlockNode(node.statement.stmtList[:-1]), loop, endLoop)
+
+        self._markLine(update)
+        if name in self._globalVars:
+            self._emit(f"INC_GLOBAL {name}")
+        else:
+            self._emit(f"INC_LOCAL {name}")
+        self._emit(f"GOTO {loop}")
+
+        self._emit(f".{endLoop}")
+
+
     def visit_ReturnNode(self, node) -> None:
         self.visit(node.expr)
-        self._emit("RETURN_VALUE")
+        if len(self._inlineEnds) > 0:
+            self._emit(f"GOTO {self._inlineEnds[-1]}")
+        else:
+            self._emit("RETURN_VALUE")
 
 
     def visit_FunDeclNode(self, node) -> None:
         oldFn: str = self._currentFn
         self._currentFn = node.id.token.value
+        self._userFunctions.append(self._currentFn)
 
-        self._functions[self._currentFn] = f"fn {self._currentFn}\nargc {len(node.paramList)}\n"
+        self._functions[self._currentFn] = [f"fn {self._currentFn}\nargc {len(node.paramList)}\n"]
+        self._curLine[self._currentFn] = 0
+        self._markLine(node)
 
         for a in node.paramList:
             self._emit(f"STORE_LOCAL {a.value}")
         self.visit(node.blockNode)
 
-        if "RETURN_VALUE" not in self._functions[self._currentFn]:
+        if "    RETURN_VALUE\n" not in self._functions[self._currentFn]:
             self._emit("LOAD_NIL")
             self._emit("RETURN_VALUE")
 
         self._currentFn = oldFn
 
 
+    #
+    # Call inlined by locks/compiler/inliner.py. The arguments are stored in
+    #  the renamed parameters, in the locals of the caller, and a return in
+    #  the body jumps past it with its value on the operand stack, where
+    #  RETURN_VALUE would have pushed it. A body without return gives nil.
+    #
+    def visit_InlinedCallNode(self, node) -> None:
+        for a in node.call.argList:
+            self.visit(a)
+        for p in reversed(node.params):
+            self._emit(f"STORE_LOCAL {p}")
+
+        endLabl: str = self._generateLabel()
+        self._inlineEnds.append(endLabl)
+
+        stmts: List[ASTNode] = node.blockNode.stmtList
+        if len(stmts) > 0 and type(stmts[-1]).__name__ == "ReturnNode":
+            # the last return doesn't need to jump
+            self.visit_BlockNode(BlockNode(stmts[:-1]))
+            self._markLine(stmts[-1])
+            self.visit(stmts[-1].expr)
+        else:
+            self.visit_BlockNode(node.blockNode)
+            self._emit("LOAD_NIL")
+
+        self._inlineEnds.pop()
+        self._emit(f".{endLabl}")
+
+        # the code after the call is on the line of the call
+        self._markLine(node)
+
+
     def visit_FunctionCallNode(self, node) -> None:
 
         for a in node.argList:
             self.visit(a)
 
-        if str(node.nameNode) in builtinFunctionInfo:
+        if str(node.nameNode) in builtinFunctionInfo and str(node.nameNode) not in self._userFunctions:
             self._emit(f"CALL_NATIVE {builtinFunctionInfo[node.nameNode.token.value][0]}")
             return
 
@@ -0,0 +1,268 @@
+import copy
+from typing import List, Dict, Tuple
+
+from ..parser.ast import ASTNode, BlockNode, InlinedCallNode
+from ..nodevisitor import NodeVisitor
+
+
+# largest body of a function that is inlined, in AST nodes, see _size
+MAX_INLINE_SIZE: int = 40
+
+
+# statements the compiler leaves the operand stack balanced after. Any other
+#  statement is an expression whose value stays on the stack, where the code
+#  after an inlined call would find it instead of the return value
+_STATEMENTS: List[str] = [
+    "VarDeclNode", "AssignNode", "IfNode", "WhileNode", "BlockNode",
+    "ReturnNode", "ContinueNode", "BreakNode"
+]
+
+
+# number of AST nodes in a tree
+def _size(node: ASTNode) -> int:
+    n: int = 1
+    for v in vars(node).values():
+        for c in (v if type(v) is list else [v]):
+            if isinstance(c, ASTNode):
+                n += _size(c)
+    return n
+
+
+# all nodes of type 'typ' in a tree, leaving out the bodies of inlined calls
+#  if 'own' is set
+def _find(node: ASTNode, typ: str, own: bool = False) -> List[ASTNode]:
+    found: List[ASTNode] = [node] if type(node).__name__ == typ else []
+    for k, v in vars(node).items():
+        if own and k == "blockNode" and type(node).__name__ == "InlinedCallNode":
+            continue
+        for c in (v if type(v) is list else [v]):
+            if isinstance(c, ASTNode):
+                found += _find(c, typ, own)
+    return found
+
+
+def _isBalanced(stmt: ASTNode) -> bool:
+    typ: str = type(stmt).__name__
+    if typ not in _STATEMENTS:
+        return False
+
+    if typ == "BlockNode":
+        return all(_isBalanced(s) for s in stmt.stmtList)
+    if typ == "IfNode":
+        branches: List[ASTNode] = [cs.statement for cs in [stmt.ifBlock] + stmt.elsifBlocks]
+        if stmt.elseBlock != None:
+            branches.append(stmt.elseBlock)
+        return all(_isBalanced(b) for b in branches)
+    if typ == "WhileNode":
+        return _isBalanced(stmt.statement)
+    return True
+
+
+#
+# Replaces calls to small functions with their bodies, before the AST is
+#  compiled for the stack VM (locks/compiler/compiler.py), which saves the
+#  frame and argument shuffling of CALL_FUNCTION and RETURN_VALUE. Runs
+#  after the semantic analyzer, so every name is declared before it is used
+#  and a function can only call itself or functions declared before it.
+#  A function is inlined at the calls after its declaration when
+#    - it doesn't call itself
+#    - its body has at most 'maxSize' nodes, after the calls in it were
+#      inlined
+#    - its body only has statements that leave the operand stack balanced,
+#      and no function declarations
+#    - its locals are declared at the top level of its body, so they are
+#      set on every call before they are read, like in a new frame
+#    - its last statement is a return, or it has none, so it can't run off
+#      the end after returning on some other path
+#  The parameters and locals of the function are renamed to <function>.<name>,
+#  which can't clash with the names of the caller since identifiers have no
+#  dots. Functions are not values in Locks, so every use of a function is a
+#  call by name, and all of them are found.
+#
+class Inliner(NodeVisitor):
+    def __init__(self, maxSize: int = MAX_INLINE_SIZE) -> None:
+        self._maxSize: int = maxSize
+
+        # globals declared so far, resolved like the compiler does it
+        self._globalVars: List[str] = []
+        self._currentFn: str = "main"
+
+        # <function> : (<renamed parameters>, <renamed body>)
+        self._inlinable: Dict[str, Tuple[List[str], BlockNode]] = dict()
+
+        # number of calls replaced
+        self.inlined: int = 0
+
+
+    def visit_ProgramNode(self, node) -> ASTNode:
+        node.declarationList = [self.visit(d) for d in node.declarationList]
+        return node
+
+
+    def visit_BlockNode(self, node) -> ASTNode:
+        node.stmtList = [self.visit(s) for s in node.stmtList]
+        return node
+
+
+    def visit_VarDeclNode(self, node) -> ASTNode:
+        if node.exprNode != None:
+            node.exprNode = self.visit(node.exprNode)
+
+        if self._currentFn == "main":
+            self._globalVars.append(node.id.token.value)
+        return node
+
+
+    def visit_AssignNode(self, node) -> ASTNode:
+        node.exprNode = self.visit(node.exprNode)
+        node.lvalue = self.visit(node.lvalue)
+        return node
+
+
+    def visit_ConditionalNode(self, node) -> ASTNode:
+        node.condition = self.visit(node.condition)
+        node.statement = self.visit(node.statement)
+        return node
+
+    visit_WhileNode = visit_ConditionalNode
+
+
+    def visit_IfNode(self, node) -> ASTNode:
+        node.ifBlock = self.visit(node.ifBlock)
+        node.elsifBlocks = [self.visit(b) for b in node.elsifBlocks]
+        if node.elseBlock != None:
+            node.elseBlock = self.visit(node.elseBlock)
+        return node
+
+
+    def visit_ReturnNode(self, node) -> ASTNode:
+        node.expr = self.visit(node.expr)
+        return node
+
+
+    def _binary(self, node) -> ASTNode:
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        return node
+
+    visit_AddNode = _binary
+    visit_SubNode = _binary
+    visit_MulNode = _binary
+    visit_DivNode = _binary
+    visit_ModNode = _binary
+    visit_EqualNode = _binary
+    visit_NotEqualNode = _binary
+    visit_LessThanNode = _binary
+    visit_LessThanEqualNode = _binary
+    visit_GreaterThanNode = _binary
+    visit_GreaterThanEqualNode = _binary
+    visit_AndNode = _binary
+    visit_OrNode = _binary
+
+
+    def _unary(self, node) -> ASTNode:
+        node.node = self.visit(node.node)
+        return node
+
+    visit_NotNode = _unary
+    visit_NegationNode = _unary
+
+
+    def _leaf(self, node) -> ASTNode:
+        return node
+
+    visit_NumberNode = _leaf
+    visit_StringNode = _leaf
+    visit_NilNode = _leaf
+    visit_TrueNode = _leaf
+    visit_FalseNode = _leaf
+    visit_IdentifierNode = _leaf
+    visit_ContinueNode = _leaf
+    visit_BreakNode = _leaf
+
+
+    def visit_ArrayNode(self, node) -> ASTNode:
+        node.elements = [self.visit(e) for e in node.elements]
+        return node
+
+
+    def visit_ArrayAccessNode(self, node) -> ASTNode:
+        node.base = self.visit(node.base)
+        node.index = self.visit(node.index)
+        return node
+
+
+    def visit_FunctionCallNode(self, node) -> ASTNode:
+        node.argList = [self.visit(a) for a in node.argList]
+
+        name: str = node.nameNode.token.value
+        if name not in self._inlinable:
+            return node
+
+        params, body = self._inlinable[name]
+        self.inlined += 1
+        return InlinedCallNode(node, params, body)
+
+
+    def visit_FunDeclNode(self, node) -> ASTNode:
+        oldFn: str = self._currentFn
+        self._currentFn = node.id.token.value
+        node.blockNode = self.visit(node.blockNode)
+        self._currentFn = oldFn
+
+        if self._canInline(node):
+            name: str = node.id.token.value
+
+            # the body is shared by all calls, the compiler doesn't change it
+            body: BlockNode = copy.deepcopy(node.blockNode)
+            self._rename(body, name)
+            self._inlinable[name] = ([f"{name}.{p.value}" for p in node.paramList], body)
+
+        return node
+
+
+    def _canInline(self, node) -> bool:
+        name: str = node.id.token.value
+        body: BlockNode = node.blockNode
+
+        if _size(body) > self._maxSize or not _isBalanced(body):
+            return False
+
+        if any(c.nameNode.token.value == name for c in _find(body, "FunctionCallNode")):
+            return False
+
+        # locals of functions inlined into the body have a dot
+        decls: List[ASTNode] = [d for d in _find(body, "VarDeclNode") if '.' not in d.id.token.value]
+        if any(d not in body.stmtList for d in decls):
+            return False
+
+        # the compiler treats a local named like a global as the global
+        #  when it is read, which a renamed local would not be
+        params: List[str] = [p.value for p in node.paramList]
+        names: List[str] = params + [d.id.token.value for d in decls]
+        if any(n in self._globalVars for n in names) or len(set(params)) != len(params):
+            return False
+
+        returns: List[ASTNode] = _find(body, "ReturnNode", True)
+        return len(returns) == 0 or (len(body.stmtList) > 0 and body.stmtList[-1] in returns)
+
+
+    #
+    # Renames the locals in a copy of the body of function 'fn'. Every name
+    #  that isn't a global is a parameter or local, except the names of
+    #  called functions and the locals of functions inlined into the body,
+    #  which already have a dot.
+    #
+    def _rename(self, node: ASTNode, fn: str) -> None:
+        if type(node).__name__ == "IdentifierNode":
+            name: str = node.token.value
+            if name not in self._globalVars and '.' not in name:
+                node.token.value = f"{fn}.{name}"
+            return
+
+        for k, v in vars(node).items():
+            if k == "nameNode":
+                continue
+            for c in (v if type(v) is list else [v]):
+                if isinstance(c, ASTNode):
+                    self._rename(c, fn)
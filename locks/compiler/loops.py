@@ -0,0 +1,35 @@
+#
+# Name of the counter if a while loop is a counted loop, as the parser
+#  desugars 'for(...; i < <bound>; i = i + 1)' into:
+#    while(i < <bound>){ <body>; i = i + 1; }
+#  otherwise None. The body may be empty. Used by the compiler and the
+#  tree-walk interpreter (locks/interpreter/interpreter.py), which doesn't
+#  import the compiler
+#
+def getCountedLoop(node) -> str:
+    cond = node.condition
+    if type(cond).__name__ != "LessThanNode" or type(cond.left).__name__ != "IdentifierNode":
+        return None
+
+    if type(node.statement).__name__ != "BlockNode" or len(node.statement.stmtList) == 0:
+        return None
+
+    name: str = cond.left.token.value
+    update = node.statement.stmtList[-1]
+    if type(update).__name__ != "AssignNode" or type(update.lvalue).__name__ != "IdentifierNode":
+        return None
+
+    expr = update.exprNode
+    if update.lvalue.token.value != name or type(expr).__name__ != "AddNode":
+        return None
+
+    if type(expr.left).__name__ != "IdentifierNode" or expr.left.token.value != name:
+        return None
+
+    # 'i = i + 1.0' would make the counter a float
+    if type(expr.right).__name__ != "NumberNode" or type(expr.right.token.value).__name__ != "int":
+        return None
+    if expr.right.token.value != 1:
+        return None
+
+    return name
@@ -0,0 +1,249 @@
+import os
+import json
+import signal
+import asyncio
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import List, Optional, Callable
+
+from .client import getSocketPath
+
+
+#
+# Execution daemon, started by locks-daemon.py
+#  Keeps a pool of worker processes that have already imported the whole
+#  pipeline, and runs programs sent by clients (locks/client.py, which
+#  describes the protocol) over a Unix domain socket. Each worker runs one
+#  program at a time and talks to the daemon over a pipe:
+#    daemon -> worker: <request dict>, ("in", <bytes>)
+#    worker -> daemon: ("out", <str>), ("read",), ("exit", <return code>, <error>)
+#  Output is forwarded to the client as it is flushed by the output buffer,
+#  and input is only asked from the client when the program reads it.
+#
+
+
+#
+# Output stream of a worker, sends every flush of the output buffer to the
+#  daemon
+#
+class _PipeOutput:
+    def __init__(self, conn: Connection) -> None:
+        self._conn: Connection = conn
+
+    def write(self, s: str) -> None:
+        if len(s) > 0:
+            self._conn.send(("out", s))
+
+    def flush(self) -> None:
+        pass
+
+
+#
+# Input stream of a worker, asks the daemon for more data when the program
+#  reads past what has been received. An empty chunk means EOF. The output
+#  of the program is flushed with 'flush' before asking, so the client sees
+#  any prompt before it sends input.
+#
+class _PipeInput:
+    def __init__(self, conn: Connection, flush: Callable[[], None]) -> None:
+        self._conn: Connection = conn
+        self._flush: Callable[[], None] = flush
+        self._buf: bytes = b''
+        self._eof: bool = False
+
+    def _fill(self) -> None:
+        self._flush()
+        self._conn.send(("read",))
+        _, data = self._conn.recv()
+        if len(data) == 0:
+            self._eof = True
+        self._buf += data
+
+    def readline(self) -> bytes:
+        while b'\n' not in self._buf and not self._eof:
+            self._fill()
+
+        i: int = self._buf.find(b'\n')
+        if i == -1:
+            line, self._buf = self._buf, b''
+        else:
+            line, self._buf = self._buf[:i+1], self._buf[i+1:]
+        return line
+
+    def read(self) -> bytes:
+        while not self._eof:
+            self._fill()
+
+        data, self._buf = self._buf, b''
+        return data
+
+
+def _workerMain(conn: Connection) -> None:
+    # imported here so the daemon process itself stays small
+    from .runtime import Runtime, RunResult
+    from .vm.limits import Limits
+    from .output import stdout
+    from .error import Error
+
+    rt = Runtime()
+
+    # warm up: compile and run a small program once
+    rt.run('var a = [1, 2]; a[0] = len(str(a));')
+
+    while True:
+        try:
+            req: dict = conn.recv()
+        except EOFError:
+            return
+
+        try:
+            os.chdir(req.get("cwd", os.getcwd()))
+
+            limits: Limits = None
+            if req.get("limits"):
+                limits = Limits(**req["limits"])
+
+            stdout.configure(
+                buffered=not req.get("unbuffered", False),
+                flushOnNewline=req.get("lineBuffered", False)
+            )
+
+            # programs are sent as source, or as a path the worker reads
+            source: str = req.get("source")
+            if source == None:
+                with open(req["path"], 'r', encoding='unicode_escape') as f:
+                    source = f.read()
+
+            r: RunResult = rt.run(source, _PipeInput(conn, stdout.flush), _PipeOutput(conn), limits)
+            conn.send(("exit", r.returnCode, None if r.error == None else str(r.error)))
+
+        except (Error, OSError) as e:
+            conn.send(("exit", -1, str(e)))
+        except Exception as e:
+            conn.send(("exit", -1, f"The interpreter crashed! {type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_workerMain, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    # waits for the next message without blocking the event loop
+    async def recv(self):
+        if not self.conn.poll():
+            loop = asyncio.get_running_loop()
+            ready: asyncio.Future = loop.create_future()
+
+            def onReadable():
+                if not ready.done():
+                    ready.set_result(None)
+
+            loop.add_reader(self.conn.fileno(), onReadable)
+            try:
+                await ready
+            finally:
+                loop.remove_reader(self.conn.fileno())
+
+        return self.conn.recv()
+
+
+class Daemon:
+    def __init__(self, socketPath: str = None, workers: int = None) -> None:
+        self.socketPath: str = socketPath if socketPath != None else getSocketPath()
+        self.workerCount: int = workers if workers != None else os.cpu_count() or 1
+
+        self._idle: asyncio.Queue = None
+        self._workers: List[_Worker] = []
+
+
+    async def _send(self, writer: asyncio.StreamWriter, msg: dict) -> None:
+        writer.write(json.dumps(msg).encode("utf-8") + b'\n')
+        await writer.drain()
+
+
+    def _replace(self, w: _Worker) -> _Worker:
+        w.kill()
+        self._workers.remove(w)
+        n = _Worker()
+        self._workers.append(n)
+        return n
+
+
+    async def _handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        w: _Worker = None
+        try:
+            req: dict = json.loads(await reader.readline())
+            stdinData: Optional[str] = req.pop("stdin", None)
+
+            w = await self._idle.get()
+            w.conn.send(req)
+
+            while True:
+                try:
+                    msg = await w.recv()
+                except EOFError:
+                    w = self._replace(w)
+                    await self._send(writer, {"type": "exit", "returnCode": -1, "error": "The worker running the program died"})
+                    break
+
+                if msg[0] == "out":
+                    await self._send(writer, {"type": "output", "data": msg[1]})
+
+                elif msg[0] == "read":
+                    if stdinData != None:
+                        data, stdinData = stdinData, ""
+                    else:
+                        await self._send(writer, {"type": "read"})
+                        line: bytes = await reader.readline()
+                        if len(line) == 0:
+                            raise ConnectionResetError()
+                        data = json.loads(line)["data"]
+                    w.conn.send(("in", data.encode("utf-8")))
+
+                elif msg[0] == "exit":
+                    await self._send(writer, {"type": "exit", "returnCode": msg[1], "error": msg[2]})
+                    break
+
+        except (ConnectionError, json.JSONDecodeError, KeyError):
+            # the client went away or sent garbage while a program was
+            #  running. The program can't be interrupted, so its worker is
+            #  replaced
+            if w != None:
+                w = self._replace(w)
+        finally:
+            if w != None:
+                self._idle.put_nowait(w)
+            writer.close()
+
+
+    async def serve(self) -> None:
+        self._idle = asyncio.Queue()
+        for _ in range(self.workerCount):
+            w = _Worker()
+            self._workers.append(w)
+            self._idle.put_nowait(w)
+
+        if os.path.exists(self.socketPath):
+            os.remove(self.socketPath)
+
+        server = await asyncio.start_unix_server(self._handleClient, path=self.socketPath)
+        os.chmod(self.socketPath, 0o600)
+
+        # stop cleanly when killed, so the socket file is removed
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for w in self._workers:
+                w.kill()
+            if os.path.exists(self.socketPath):
+                os.remove(self.socketPath)
@@ -1,3 +1,6 @@
+from typing import List
+
+
 class Error(Exception):
     def __init__(self, typ: str, msg: str, line: int, pos: int) -> None:
         self.type: str = typ
@@ -47,6 +50,31 @@ class IndexErr(Error):
     def __init__(self, line: int = None):
         super().__init__("Index Error", "Array index out of range", line, None)
 
+class IOErr(Error):
+    def __init__(self, msg: str, line: int = None):
+        super().__init__("IO Error", msg, line, None)
+
+class LimitExceeded(Error):
+    def __init__(self, msg: str, instructions: int, elapsed: float, depth: int, line: int = None):
+        super().__init__(
+            "Limit Exceeded Error",
+            f"{msg} (executed {instructions} instructions in {elapsed:.3f} seconds, call depth {depth})",
+            line,
+            None
+        )
+        self.instructions: int = instructions
+        self.elapsed: float = elapsed
+        self.depth: int = depth
+
+# all errors found by the lexer, parser and semantic analyzer in a program
+class CompileErr(Error):
+    def __init__(self, errors: List[Error]):
+        super().__init__("Compile Error", '\n'.join(str(e) for e in errors), None, None)
+        self.errors: List[Error] = errors
+
+    def __str__(self) -> str:
+        return self.msg
+
 class InvalidBytecodeError(Error):
     def __init__(self):
         super().__init__("Invalid Bytecode Error", "invalid bytecode", None, None)
@@ -0,0 +1,69 @@
+import sys
+from typing import Optional, Union, BinaryIO, TextIO
+
+
+#
+# Line reader used by the input, readline, readall and eof builtins.
+#  Reads from the binary buffer of stdin when there is one, so lines are split
+#  by the C implementation of BufferedReader.readline instead of input().
+#  One line of lookahead is kept so that eof() can tell whether another line
+#  is available without losing it.
+#
+class InputReader:
+    def __init__(self, stream: Union[BinaryIO, TextIO] = None) -> None:
+        self._stream: Union[BinaryIO, TextIO] = stream
+        self._pending: Optional[str] = None
+
+
+    # sys.stdin is looked up on every read so redirecting it still works
+    def getStream(self) -> Union[BinaryIO, TextIO]:
+        if self._stream != None:
+            return self._stream
+        return getattr(sys.stdin, "buffer", sys.stdin)
+
+
+    def setStream(self, stream: Union[BinaryIO, TextIO]) -> None:
+        self._stream = stream
+        self._pending = None
+
+
+    def _decode(self, data: Union[bytes, str]) -> str:
+        if isinstance(data, bytes):
+            return data.decode("utf-8", errors="replace")
+        return data
+
+
+    # returns the next line without the trailing "\n" or "\r\n", or None at EOF
+    def readline(self) -> Optional[str]:
+        if self._pending != None:
+            line, self._pending = self._pending, None
+        else:
+            line = self._decode(self.getStream().readline())
+
+        if len(line) == 0:
+            return None
+        if line[-1] == '\n':
+            line = line[:-1]
+        if len(line) > 0 and line[-1] == '\r':
+            line = line[:-1]
+        return line
+
+
+    # returns everything up to EOF
+    def readall(self) -> str:
+        rest: str = self._decode(self.getStream().read())
+
+        if self._pending != None:
+            rest = self._pending + rest
+            self._pending = None
+
+        return rest
+
+
+    def eof(self) -> bool:
+        if self._pending == None:
+            self._pending = self._decode(self.getStream().readline())
+        return len(self._pending) == 0
+
+
+stdin: InputReader = InputReader()
@@ -42,10 +42,38 @@ class opcode(Enum):
     POP_JMP_IF_FALSE = 0x6f
     GOTO = 0xa7
 
+    # counted loops, see Compiler._countedLoop
+    FOR_RANGE = 0xa8  #arg = u8 x2
+    INC_LOCAL = 0x85  #arg = u8
+    INC_GLOBAL = 0x86  #arg = u8
+
+    # jump table, see Compiler._switch. SWITCH is followed by as many CASE
+    #  and GOTO pairs as its argument, which are never executed
+    SWITCH = 0xab  #arg = u8 x2
+    CASE = 0xa9  #arg = u8 x2
+
     CALL_FUNCTION = 0x83  #arg= u8
     CALL_NATIVE = 0x84  #arg= u8
     RETURN_VALUE = 0x53
 
+    # arg = u8, prefixed to an instruction whose operand doesn't fit in its
+    #  operand bytes. Adds one more byte to the front of the operand
+    EXTENDED_ARG = 0x90
+
+    # specialized forms of the instructions above, for operands of the type
+    #  in their name. Never emitted by the assembler, the VM rewrites an
+    #  instruction into one of them in the running code after seeing its
+    #  operand types (quickening), see VirtualMachine._quicken
+    BINARY_ADD_NUM = 0xc0
+    BINARY_ADD_STR = 0xc1
+    BINARY_SUBTRACT_NUM = 0xc2
+    BINARY_MULTIPLY_NUM = 0xc3
+    CMPLT_NUM = 0xc4
+    CMPGT_NUM = 0xc5
+    CMPLE_NUM = 0xc6
+    CMPGE_NUM = 0xc7
+    BINARY_SUBSCR_ARRAY = 0xc8
+
 
 def makeOpcodeDict():
     d = {}
@@ -107,7 +135,26 @@ opcodeSizeDict = {
     "POP_JMP_IF_FALSE" : 3,
     "GOTO" : 3,
 
+    "FOR_RANGE" : 3,  #arg : u8 x2
+    "INC_LOCAL" : 2,  #arg : u8
+    "INC_GLOBAL" : 2,  #arg : u8
+
+    "SWITCH" : 3,  #arg : u8 x2
+    "CASE" : 3,  #arg : u8 x2
+
     "CALL_FUNCTION" : 2,  #arg: u8
     "CALL_NATIVE": 2,
     "RETURN_VALUE" : 1,
+
+    "EXTENDED_ARG" : 2,  #arg: u8
+
+    "BINARY_ADD_NUM" : 1,
+    "BINARY_ADD_STR" : 1,
+    "BINARY_SUBTRACT_NUM" : 1,
+    "BINARY_MULTIPLY_NUM" : 1,
+    "CMPLT_NUM" : 1,
+    "CMPGT_NUM" : 1,
+    "CMPLE_NUM" : 1,
+    "CMPGE_NUM" : 1,
+    "BINARY_SUBSCR_ARRAY" : 1,
 }
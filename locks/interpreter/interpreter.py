@@ -1,10 +1,13 @@
 from ..nodevisitor import NodeVisitor
+from ..parser.ast import BlockNode
+from ..compiler.loops import getCountedLoop
 
 from .memory import CallStack, ActivationRecord, ARType
 from ..types import LObject, Number, Nil, Array, Boolean, String, Function
 from ..stdlib import builtinFunctionTable
+from ..output import stdout
 
-from ..error import TypeErr, ZeroDivErr, SyntaxErr
+from ..error import TypeErr, ZeroDivErr, IndexErr, SyntaxErr
 
 class Interpeter(NodeVisitor):
     def __init__(self) -> None:
@@ -61,9 +64,12 @@ class Interpeter(NodeVisitor):
         self._callStack.push(mainFarame)
         self._curFrame = mainFarame
 
-        # execute the code
-        for d in node.declarationList:
-            self.visit(d)
+        # execute the code, flush buffered output even if an error is raised
+        try:
+            for d in node.declarationList:
+                self.visit(d)
+        finally:
+            stdout.flush()
 
         # done, pop main frame
         self._callStack.pop()
@@ -112,8 +118,12 @@ class Interpeter(NodeVisitor):
         if type(idx.value).__name__ == "float":
             raise TypeErr(f"Array indices must be integers, not float", node.base.token.line)
 
+        el = arrObj.getEL(idx.value)
+        if el == None:
+            raise IndexErr(node.base.token.line)
+
         # everything ok
-        return arrObj.getEL(idx.value)
+        return el
 
 
     def visit_IdentifierNode(self, node) -> LObject:
@@ -145,7 +155,7 @@ class Interpeter(NodeVisitor):
             arrObj.setEL(val, idx.value)
 
         elif type(node.lvalue).__name__ == "IdentifierNode":
-            self._curFrame[node.lvalue.token.value] = val
+            self._curFrame.assign(node.lvalue.token.value, val)
 
 
     # arithmetic nodes
@@ -431,6 +441,10 @@ class Interpeter(NodeVisitor):
 
     
     def visit_WhileNode(self, node) -> LObject:
+        name: str = getCountedLoop(node)
+        if name != None and not self._hasReturn(node.statement):
+            return self._countedLoop(node, name)
+
         cond: LObject = self.visit(node.condition)
         while self._isTruthy(cond):
             res: LObject = self.visit(node.statement)
@@ -440,6 +454,49 @@ class Interpeter(NodeVisitor):
                 return res
     
 
+    # a return directly in a block ends it with a value that may be nil,
+    #  see visit_BlockNode
+    def _hasReturn(self, node) -> bool:
+        return any(type(s).__name__ == "ReturnNode" for s in node.stmtList)
+
+
+    #
+    # Runs a counted loop (see getCountedLoop in locks/compiler/loops.py)
+    #  like visit_WhileNode does, but compares the counter and adds 1 to it
+    #  without going through the condition and update nodes, unless they
+    #  are not numbers. The update runs only if the body ran to its end.
+    #
+    def _countedLoop(self, node, name: str) -> LObject:
+        cond = node.condition
+        body: BlockNode = BlockNode(node.statement.stmtList[:-1])
+        update = node.statement.stmtList[-1]
+
+        while self._countedLoopTest(cond, name):
+            res: LObject = self.visit(body)
+
+            if str(res) == "nil":
+                v: LObject = self._curFrame.get(name)
+                if type(v) is Number:
+                    self._curFrame.assign(name, Number(v.value + 1))
+                else:
+                    self.visit(update)
+
+            if str(res) not in ["nil", "continue"] and bool(res):
+                # the condition is evaluated once more, like in visit_WhileNode
+                self._countedLoopTest(cond, name)
+                return res
+
+
+    def _countedLoopTest(self, cond, name: str) -> bool:
+        l: LObject = self._curFrame.get(name)
+        r: LObject = self.visit(cond.right)
+
+        if type(l) is not Number or type(r) is not Number:
+            raise TypeErr(f"Invalid operand type for less than operator: {self._getObjType(l)} and {self._getObjType(r)}", cond.left.token.line)
+
+        return l.value < r.value
+
+
     def visit_ReturnNode(self, node) -> LObject:
         if self._curFrame.type != ARType.FUNCTION:
             raise SyntaxErr("'return' outside function", node.line)
@@ -457,8 +514,9 @@ class Interpeter(NodeVisitor):
 
 
     def visit_FunctionCallNode(self, node) -> LObject:
-        # check builtin function
-        if str(node.nameNode) in builtinFunctionTable:
+        # check builtin function, unless it is shadowed by a user function
+        if str(node.nameNode) in builtinFunctionTable and \
+                self._getObjType(self._curFrame.get(str(node.nameNode))) != "Function":
             argList = []
             for a in node.argList:
                 argList.append(self.visit(a))
@@ -41,6 +41,13 @@ class Environment:
     def __setitem__(self, key, value):
         self._members[key] = value
 
+    # assign to the variable in the innermost environment that has it
+    def assign(self, name, value):
+        if name in self._members or self.enclosingEnv == None:
+            self._members[name] = value
+        else:
+            self.enclosingEnv.assign(name, value)
+
     def __str__(self) -> str:
         output = ''
         for v in self._members:
@@ -72,6 +79,9 @@ class ActivationRecord:
     def __setitem__(self, key, value):
         self.members[key] = value
 
+    def assign(self, name, value):
+        self.members.assign(name, value)
+
     def setEnclosingEnv(self, env: Environment) -> None:
         self.members.enclosingEnv = env
 
@@ -0,0 +1,80 @@
+import sys
+from typing import List, TextIO
+
+
+#
+# Output buffer used by the print and println builtins.
+#  Writes are collected and handed to the underlying stream in one call once
+#  'threshold' characters are buffered, on newline if 'flushOnNewline' is set,
+#  before input() reads from stdin, before readline, readall and eof read
+#  from it when the stream is a terminal, and when the program stops running.
+#  With 'buffered' set to False every write goes straight to the stream, like
+#  the builtin print function.
+#
+class OutputBuffer:
+    def __init__(self, stream: TextIO = None) -> None:
+        self._stream: TextIO = stream
+        self._parts: List[str] = []
+        self._size: int = 0
+
+        self.buffered: bool = True
+        self.threshold: int = 8192
+        self.flushOnNewline: bool = False
+
+        # stream isInteractive last looked at, and whether it is a terminal
+        self._ttyStream: TextIO = None
+        self._tty: bool = False
+
+
+    def configure(self, buffered: bool = True, threshold: int = 8192, flushOnNewline: bool = False) -> None:
+        self.flush()
+        self.buffered = buffered
+        self.threshold = threshold
+        self.flushOnNewline = flushOnNewline
+
+
+    # sys.stdout is looked up on every flush so redirecting it still works
+    def getStream(self) -> TextIO:
+        if self._stream == None:
+            return sys.stdout
+        return self._stream
+
+
+    def setStream(self, stream: TextIO) -> None:
+        self.flush()
+        self._stream = stream
+
+
+    # True if the stream is a terminal, checked once per stream
+    def isInteractive(self) -> bool:
+        stream: TextIO = self.getStream()
+        if stream is not self._ttyStream:
+            self._ttyStream = stream
+            self._tty = hasattr(stream, "isatty") and stream.isatty()
+        return self._tty
+
+
+    def write(self, s: str) -> None:
+        if not self.buffered:
+            self.getStream().write(s)
+            return
+
+        self._parts.append(s)
+        self._size += len(s)
+
+        if self._size >= self.threshold or (self.flushOnNewline and '\n' in s):
+            self.flush()
+
+
+    def flush(self) -> None:
+        if self._size == 0 and len(self._parts) == 0:
+            return
+
+        stream: TextIO = self.getStream()
+        stream.write(''.join(self._parts))
+        self._parts = []
+        self._size = 0
+        stream.flush()
+
+
+stdout: OutputBuffer = OutputBuffer()
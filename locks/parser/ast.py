@@ -234,6 +234,20 @@ class FunctionCallNode(ASTNode):
         return output
 
 
+# call whose function body is compiled in place of the call, made by the
+#  inliner (locks/compiler/inliner.py). 'params' are the renamed parameters
+#  the arguments of 'call' are stored in, and 'blockNode' is the renamed body
+
+class InlinedCallNode(ASTNode):
+    def __init__(self, call: FunctionCallNode, params: List[str], blk: BlockNode) -> None:
+        self.call: FunctionCallNode = call
+        self.params: List[str] = params
+        self.blockNode: BlockNode = blk
+
+    def __str__(self) -> str:
+        return f"inlined {str(self.call)}{str(self.blockNode)}"
+
+
 # Primary nodes
 
 class PrimaryNode(ASTNode):
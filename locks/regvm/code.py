@@ -0,0 +1,69 @@
+from typing import List, Tuple
+
+from .instruction import regop, regopOperands
+from ..types import LObject
+from ..stdlib import builtinFunctionIndex
+
+
+#
+# A function compiled for the register VM. 'nregs' is the number of
+#  registers of a call, locals and temporaries. 'lines' has the source line
+#  of every instruction in 'code'.
+#
+class RegFunction:
+    def __init__(self, name: str, argc: int) -> None:
+        self.name: str = name
+        self.argc: int = argc
+        self.nregs: int = 0
+        self.code: List[Tuple[int, int, int, int]] = []
+        self.lines: List[int] = []
+
+
+#
+# Output of the register compiler, the functions (main first) and the
+#  constants they use. Unlike the stack VM's bytecode, this is never written
+#  out as bytes; getListing is for reading it.
+#
+class RegProgram:
+    def __init__(self, functions: List[RegFunction], constants: List[LObject]) -> None:
+        self.functions: List[RegFunction] = functions
+        self.constants: List[LObject] = constants
+
+
+    def _formatOperand(self, kind: str, x: int) -> str:
+        if kind == 'r':
+            return f"r{x}"
+        if kind == 'k':
+            return f"k{x}"
+        if kind == 'g':
+            return f"g{x}"
+        if kind == 'l':
+            return f"@{x}"
+        if kind == 'f':
+            return self.functions[x].name
+        if kind == 'n':
+            return builtinFunctionIndex[x]
+        return str(x)
+
+
+    def getListing(self) -> str:
+        output: List[str] = [f"constants {len(self.constants)}\n"]
+        for i, k in enumerate(self.constants):
+            output.append(f"    k{i:<6}{type(k).__name__:<8}{k}\n")
+
+        for f in self.functions:
+            output.append(f"\nfn {f.name}  argc {f.argc}  registers {f.nregs}\n")
+
+            line: int = 0
+            for pc, (ins, lineNo) in enumerate(zip(f.code, f.lines)):
+                if lineNo != line:
+                    line = lineNo
+                    output.append(f"  line {line}\n")
+
+                name: str = regop(ins[0]).name
+                operands: List[str] = [
+                    self._formatOperand(kind, x) for kind, x in zip(regopOperands[name], ins[1:])
+                ]
+                output.append(f"    {pc:<6}{name:<10}{', '.join(operands)}\n")
+
+        return ''.join(output)
@@ -0,0 +1,504 @@
+from typing import List, Dict, Tuple
+
+from .code import RegFunction, RegProgram
+from .instruction import regop, regopOperands
+from ..parser.ast import ASTNode
+from ..nodevisitor import NodeVisitor
+from ..compiler.compiler import getNodeLine
+from ..stdlib import builtinFunctionInfo
+from ..types import LObject, Number, String
+
+
+# conditions that compile to a single compare and jump, see _jumpIfFalse
+_compareJumps: Dict[str, str] = {
+    "EqualNode": "JMPNEQ",
+    "NotEqualNode": "JMPNNE",
+    "LessThanNode": "JMPNLT",
+    "LessThanEqualNode": "JMPNLE",
+    "GreaterThanNode": "JMPNGT",
+    "GreaterThanEqualNode": "JMPNGE",
+}
+
+_binaryOps: Dict[str, str] = {
+    "AddNode": "ADD",
+    "SubNode": "SUB",
+    "MulNode": "MUL",
+    "DivNode": "DIV",
+    "ModNode": "MOD",
+    "AndNode": "AND",
+    "OrNode": "OR",
+    "EqualNode": "EQ",
+    "NotEqualNode": "NE",
+    "LessThanNode": "LT",
+    "LessThanEqualNode": "LE",
+    "GreaterThanNode": "GT",
+    "GreaterThanEqualNode": "GE",
+}
+
+
+#
+# State of the function being compiled. Instructions are kept as lists
+#  [<opcode name>, a, b, c] until the function is finished, because the
+#  number of locals, and so the first temporary register, is only known at
+#  the end. Until then temporary n is written as register -(n+1), and
+#  jumps hold label numbers.
+#
+class _FunctionState:
+    def __init__(self, fn: RegFunction) -> None:
+        self.fn: RegFunction = fn
+
+        # <variable name> : <register>
+        self.locals: Dict[str, int] = dict()
+
+        self.code: List[List] = []
+        self.lines: List[int] = []
+        self.line: int = 0
+
+        # temporaries in use, and the most used at once
+        self.temp: int = 0
+        self.maxTemp: int = 0
+
+        # <label> : <instruction index>
+        self.labels: List[int] = []
+
+        # (<continue label>, <break label>) of the enclosing loops
+        self.loops: List[Tuple[int, int]] = []
+
+
+#
+# Compiles the AST for the register VM (locks/regvm/vm.py). Variables are
+#  resolved like the stack compiler does it (locks/compiler/compiler.py),
+#  and expressions are evaluated in the same order, but each operation reads
+#  its operands from registers and writes its result to a register, so
+#  reading a local variable costs no instruction at all.
+#
+class RegisterCompiler(NodeVisitor):
+    def __init__(self) -> None:
+        self._functions: List[RegFunction] = [RegFunction("main", 0)]
+        self._fnIndex: Dict[str, int] = {"main": 0}
+
+        self._constants: List[LObject] = []
+        # (<type>, <repr of value>) : <index>
+        self._constIndex: Dict[Tuple[str, str], int] = dict()
+
+        self._globalVars: List[str] = []
+
+        # user functions shadow builtin functions with the same name
+        self._userFunctions: List[str] = []
+
+        self._main: _FunctionState = _FunctionState(self._functions[0])
+        self._fs: _FunctionState = self._main
+        self._states: List[_FunctionState] = [self._main]
+
+        self._program: RegProgram = None
+
+
+    def getProgram(self) -> RegProgram:
+        if self._program == None:
+            self._emit("HALT")
+            for fs in self._states:
+                self._finishFunction(fs)
+            self._program = RegProgram(self._functions, self._constants)
+        return self._program
+
+
+    def getCode(self) -> str:
+        return self.getProgram().getListing()
+
+
+    def _finishFunction(self, fs: _FunctionState) -> None:
+        nlocals: int = len(fs.locals)
+        fs.fn.nregs = nlocals + fs.maxTemp
+
+        for ins in fs.code:
+            for i, kind in enumerate(regopOperands[ins[0]]):
+                x = ins[i+1]
+                if kind == 'r' and x < 0:
+                    ins[i+1] = nlocals - x - 1
+                elif kind == 'l':
+                    ins[i+1] = fs.labels[x]
+                elif kind == 'f':
+                    ins[i+1] = self._fnIndex[x]
+
+            fs.fn.code.append((regop[ins[0]].value, ins[1], ins[2], ins[3]))
+
+        fs.fn.lines = fs.lines
+
+
+    def _emit(self, op: str, a: int = 0, b: int = 0, c: int = 0) -> None:
+        self._fs.code.append([op, a, b, c])
+        self._fs.lines.append(self._fs.line)
+
+
+    def _markLine(self, node) -> None:
+        line: int = getNodeLine(node)
+        if line > 0:
+            self._fs.line = line
+
+
+    def _newLabel(self) -> int:
+        self._fs.labels.append(-1)
+        return len(self._fs.labels) - 1
+
+
+    def _placeLabel(self, label: int) -> None:
+        self._fs.labels[label] = len(self._fs.code)
+
+
+    def _newTemp(self) -> int:
+        self._fs.temp += 1
+        self._fs.maxTemp = max(self._fs.maxTemp, self._fs.temp)
+        return -self._fs.temp
+
+
+    # register to write the result of an expression to
+    def _target(self, dest: int) -> int:
+        if dest != None:
+            return dest
+        return self._newTemp()
+
+
+    def _getLocal(self, name: str) -> int:
+        if name not in self._fs.locals:
+            self._fs.locals[name] = len(self._fs.locals)
+        return self._fs.locals[name]
+
+
+    def _isGlobal(self, name: str) -> bool:
+        # the locals of main are the globals
+        return self._fs != self._main and name in self._globalVars
+
+
+    def _getConstant(self, obj: LObject) -> int:
+        # repr keeps 0.0 and -0.0 apart
+        key = (type(obj.value).__name__, repr(obj.value))
+        if key not in self._constIndex:
+            self._constIndex[key] = len(self._constants)
+            self._constants.append(obj)
+        return self._constIndex[key]
+
+
+    def _hasCall(self, node: ASTNode) -> bool:
+        if type(node).__name__ == "FunctionCallNode":
+            return True
+
+        for v in vars(node).values():
+            if isinstance(v, ASTNode) and self._hasCall(v):
+                return True
+            if isinstance(v, list) and any(isinstance(e, ASTNode) and self._hasCall(e) for e in v):
+                return True
+
+        return False
+
+
+    #
+    # Evaluates an operand that is used after the expressions in 'later'.
+    #  A variable is used from its register directly, but in main a function
+    #  called by a later expression can assign to it, so there the value is
+    #  copied first, like the stack VM does by pushing it.
+    #
+    def _operand(self, node: ASTNode, later: List[ASTNode]) -> int:
+        r: int = self.visit(node)
+        if r >= 0 and self._fs == self._main and any(self._hasCall(n) for n in later):
+            t: int = self._newTemp()
+            self._emit("MOVE", t, r)
+            return t
+        return r
+
+
+    # evaluates 'nodes' into consecutive temporaries, returns the first one
+    def _consecutive(self, nodes: List[ASTNode]) -> int:
+        regs: List[int] = [self._newTemp() for _ in nodes]
+        for n, r in zip(nodes, regs):
+            self.visit(n, r)
+        return regs[0] if len(regs) > 0 else 0
+
+
+    def _jumpIfFalse(self, cond: ASTNode, label: int) -> None:
+        typ: str = type(cond).__name__
+        self._markLine(cond)
+
+        # the condition of 'for(;;)'
+        if typ == "TrueNode":
+            return
+
+        mark: int = self._fs.temp
+        if typ in _compareJumps:
+            l: int = self._operand(cond.left, [cond.right])
+            r: int = self.visit(cond.right)
+            self._emit(_compareJumps[typ], l, r, label)
+        else:
+            self._emit("JMPF", self.visit(cond), label)
+        self._fs.temp = mark
+
+
+    # temporaries used by a statement are free after it
+    def _statement(self, node: ASTNode) -> None:
+        fs: _FunctionState = self._fs
+        mark: int = fs.temp
+        self.visit(node)
+        fs.temp = mark
+
+
+    #
+    # Expressions are compiled into register 'dest' if it is given.
+    #  Otherwise they return the register holding their value, which is a
+    #  new temporary, or the register of a variable. An instruction always
+    #  writes its result after reading its operands, so 'dest' can also be
+    #  one of them.
+    #
+    def visit(self, node, dest: int = None):
+        # function code is compiled into the function itself
+        if type(node).__name__ != "FunDeclNode":
+            self._markLine(node)
+
+        fn = getattr(self, f"visit_{type(node).__name__}", None)
+        if fn == None:
+            return self.no_visit_method(node)
+        return fn(node, dest)
+
+
+    def visit_ProgramNode(self, node, dest: int = None) -> None:
+        for d in node.declarationList:
+            self._statement(d)
+
+
+    def visit_NumberNode(self, node, dest: int = None) -> int:
+        t: int = self._target(dest)
+        self._emit("LOADK", t, self._getConstant(Number(node.token.value)))
+        return t
+
+
+    def visit_StringNode(self, node, dest: int = None) -> int:
+        t: int = self._target(dest)
+        self._emit("LOADK", t, self._getConstant(String(node.token.value)))
+        return t
+
+
+    def visit_NilNode(self, node, dest: int = None) -> int:
+        t: int = self._target(dest)
+        self._emit("LOADNIL", t)
+        return t
+
+
+    def visit_TrueNode(self, node, dest: int = None) -> int:
+        t: int = self._target(dest)
+        self._emit("LOADTRUE", t)
+        return t
+
+
+    def visit_FalseNode(self, node, dest: int = None) -> int:
+        t: int = self._target(dest)
+        self._emit("LOADFALSE", t)
+        return t
+
+
+    def visit_ArrayNode(self, node, dest: int = None) -> int:
+        mark: int = self._fs.temp
+        first: int = self._consecutive(node.elements)
+        self._fs.temp = mark
+
+        t: int = self._target(dest)
+        self._emit("NEWLIST", t, first, len(node.elements))
+        return t
+
+
+    def visit_IdentifierNode(self, node, dest: int = None) -> int:
+        name: str = node.token.value
+
+        if self._isGlobal(name):
+            t: int = self._target(dest)
+            self._emit("GETGLOBAL", t, self._main.locals[name])
+            return t
+
+        r: int = self._getLocal(name)
+        if dest == None or dest == r:
+            return r
+
+        self._emit("MOVE", dest, r)
+        return dest
+
+
+    def visit_ArrayAccessNode(self, node, dest: int = None) -> int:
+        mark: int = self._fs.temp
+        b: int = self._operand(node.base, [node.index])
+        i: int = self.visit(node.index)
+        self._fs.temp = mark
+
+        t: int = self._target(dest)
+        self._emit("GETITEM", t, b, i)
+        return t
+
+
+    def _unary(self, op: str, node, dest: int) -> int:
+        mark: int = self._fs.temp
+        r: int = self.visit(node.node)
+        self._fs.temp = mark
+
+        t: int = self._target(dest)
+        self._emit(op, t, r)
+        return t
+
+
+    def visit_NotNode(self, node, dest: int = None) -> int:
+        return self._unary("NOT", node, dest)
+
+
+    def visit_NegationNode(self, node, dest: int = None) -> int:
+        # negative number literals are constants
+        if type(node.node).__name__ == "NumberNode":
+            t: int = self._target(dest)
+            self._emit("LOADK", t, self._getConstant(Number(-node.node.token.value)))
+            return t
+
+        return self._unary("NEG", node, dest)
+
+
+    def _binary(self, node, dest: int) -> int:
+        mark: int = self._fs.temp
+        l: int = self._operand(node.left, [node.right])
+        r: int = self.visit(node.right)
+        self._fs.temp = mark
+
+        t: int = self._target(dest)
+        self._emit(_binaryOps[type(node).__name__], t, l, r)
+        return t
+
+
+    visit_AddNode = _binary
+    visit_SubNode = _binary
+    visit_MulNode = _binary
+    visit_DivNode = _binary
+    visit_ModNode = _binary
+    visit_AndNode = _binary
+    visit_OrNode = _binary
+    visit_EqualNode = _binary
+    visit_NotEqualNode = _binary
+    visit_LessThanNode = _binary
+    visit_LessThanEqualNode = _binary
+    visit_GreaterThanNode = _binary
+    visit_GreaterThanEqualNode = _binary
+
+
+    def visit_VarDeclNode(self, node, dest: int = None) -> None:
+        r: int = self._getLocal(node.id.token.value)
+
+        if node.exprNode != None:
+            self.visit(node.exprNode, r)
+        else:
+            self._emit("LOADNIL", r)
+
+        if self._fs == self._main:
+            self._globalVars.append(node.id.token.value)
+
+
+    def visit_AssignNode(self, node, dest: int = None) -> None:
+        if type(node.lvalue).__name__ == "IdentifierNode":
+            name: str = node.lvalue.token.value
+            if self._isGlobal(name):
+                self._emit("SETGLOBAL", self._main.locals[name], self.visit(node.exprNode))
+            else:
+                self.visit(node.exprNode, self._getLocal(name))
+
+        elif type(node.lvalue).__name__ == "ArrayAccessNode":
+            v: int = self._operand(node.exprNode, [node.lvalue.base, node.lvalue.index])
+            b: int = self._operand(node.lvalue.base, [node.lvalue.index])
+            i: int = self.visit(node.lvalue.index)
+            self._emit("SETITEM", b, i, v)
+
+
+    def visit_BlockNode(self, node, dest: int = None) -> None:
+        for s in node.stmtList:
+            self._statement(s)
+
+
+    def visit_ContinueNode(self, node, dest: int = None) -> None:
+        assert len(self._fs.loops) > 0
+        self._emit("JMP", self._fs.loops[-1][0])
+
+
+    def visit_BreakNode(self, node, dest: int = None) -> None:
+        assert len(self._fs.loops) > 0
+        self._emit("JMP", self._fs.loops[-1][1])
+
+
+    def visit_IfNode(self, node, dest: int = None) -> None:
+        endifLabl: int = self._newLabel()
+        blocks: list = [node.ifBlock] + node.elsifBlocks
+
+        for n, cs in enumerate(blocks):
+            skipLabl: int = self._newLabel()
+            self._jumpIfFalse(cs.condition, skipLabl)
+            self._statement(cs.statement)
+
+            if n < len(blocks) - 1 or node.elseBlock:
+                self._emit("JMP", endifLabl)
+            self._placeLabel(skipLabl)
+
+        if node.elseBlock:
+            self._statement(node.elseBlock)
+
+        self._placeLabel(endifLabl)
+
+
+    def visit_WhileNode(self, node, dest: int = None) -> None:
+        loop: int = self._newLabel()
+        endLoop: int = self._newLabel()
+
+        self._placeLabel(loop)
+        self._jumpIfFalse(node.condition, endLoop)
+
+        self._fs.loops.append((loop, endLoop))
+        self._statement(node.statement)
+        self._fs.loops.pop()
+
+        self._emit("JMP", loop)
+        self._placeLabel(endLoop)
+
+
+    def visit_ReturnNode(self, node, dest: int = None) -> None:
+        r: int = self.visit(node.expr)
+
+        # the stack VM ignores a return outside a function
+        if self._fs != self._main:
+            self._emit("RETURN", r)
+
+
+    def visit_FunDeclNode(self, node, dest: int = None) -> None:
+        name: str = node.id.token.value
+        self._userFunctions.append(name)
+
+        fn = RegFunction(name, len(node.paramList))
+        self._fnIndex[name] = len(self._functions)
+        self._functions.append(fn)
+
+        oldFs: _FunctionState = self._fs
+        self._fs = _FunctionState(fn)
+        self._states.append(self._fs)
+        self._markLine(node)
+
+        # arguments are the first registers
+        for a in node.paramList:
+            self._getLocal(a.value)
+        self.visit(node.blockNode)
+
+        t: int = self._newTemp()
+        self._emit("LOADNIL", t)
+        self._emit("RETURN", t)
+
+        self._fs = oldFs
+
+
+    def visit_FunctionCallNode(self, node, dest: int = None) -> int:
+        name: str = node.nameNode.token.value
+
+        mark: int = self._fs.temp
+        first: int = self._consecutive(node.argList)
+        self._fs.temp = mark
+
+        t: int = self._target(dest)
+        if name in builtinFunctionInfo and name not in self._userFunctions:
+            self._emit("NATIVE", t, builtinFunctionInfo[name][0], first)
+        else:
+            self._emit("CALL", t, name, first)
+        return t
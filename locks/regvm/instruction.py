@@ -0,0 +1,112 @@
+from enum import Enum
+
+
+#
+# Instructions of the register VM (locks/regvm/vm.py)
+#  Every instruction is a tuple (<opcode>, a, b, c) of an opcode and up to
+#  three operands. Registers are indices into the register list of the
+#  running function, written r<n>. A function's locals are its first
+#  registers (the arguments come first), and the temporaries used while
+#  evaluating expressions follow them.
+#
+class regop(Enum):
+    MOVE = 0x01         # r[a] = r[b]
+    LOADK = 0x02        # r[a] = constant b
+    LOADNIL = 0x03      # r[a] = nil
+    LOADTRUE = 0x04     # r[a] = true
+    LOADFALSE = 0x05    # r[a] = false
+    GETGLOBAL = 0x06    # r[a] = global b
+    SETGLOBAL = 0x07    # global a = r[b]
+
+    ADD = 0x10          # r[a] = r[b] + r[c]
+    SUB = 0x11
+    MUL = 0x12
+    DIV = 0x13
+    MOD = 0x14
+    AND = 0x15
+    OR = 0x16
+    NOT = 0x17          # r[a] = !r[b]
+    NEG = 0x18          # r[a] = -r[b]
+
+    EQ = 0x20           # r[a] = r[b] == r[c]
+    NE = 0x21
+    LT = 0x22
+    LE = 0x23
+    GT = 0x24
+    GE = 0x25
+
+    NEWLIST = 0x30      # r[a] = [r[b], ..., r[b+c-1]]
+    GETITEM = 0x31      # r[a] = r[b][r[c]]
+    SETITEM = 0x32      # r[a][r[b]] = r[c]
+
+    JMP = 0x40          # jump to a
+    JMPF = 0x41         # jump to b if r[a] is not truthy
+    JMPT = 0x42         # jump to b if r[a] is truthy
+
+    # comparison and jump in one instruction, jump to c if the comparison of
+    #  r[a] and r[b] is false
+    JMPNEQ = 0x48
+    JMPNNE = 0x49
+    JMPNLT = 0x4a
+    JMPNLE = 0x4b
+    JMPNGT = 0x4c
+    JMPNGE = 0x4d
+
+    CALL = 0x50         # r[a] = function b(r[c], ..., r[c+argc-1])
+    NATIVE = 0x51       # r[a] = builtin b(r[c], ..., r[c+argc-1])
+    RETURN = 0x52       # return r[a]
+    HALT = 0xff
+
+
+#
+# Kinds of the operands of each instruction, used by the compiler to patch
+#  operands and by the listing:
+#    r: register, k: constant, g: global, l: label, f: function,
+#    n: builtin function, c: count
+#
+regopOperands = {
+    "MOVE": "rr",
+    "LOADK": "rk",
+    "LOADNIL": "r",
+    "LOADTRUE": "r",
+    "LOADFALSE": "r",
+    "GETGLOBAL": "rg",
+    "SETGLOBAL": "gr",
+
+    "ADD": "rrr",
+    "SUB": "rrr",
+    "MUL": "rrr",
+    "DIV": "rrr",
+    "MOD": "rrr",
+    "AND": "rrr",
+    "OR": "rrr",
+    "NOT": "rr",
+    "NEG": "rr",
+
+    "EQ": "rrr",
+    "NE": "rrr",
+    "LT": "rrr",
+    "LE": "rrr",
+    "GT": "rrr",
+    "GE": "rrr",
+
+    "NEWLIST": "rrc",
+    "GETITEM": "rrr",
+    "SETITEM": "rrr",
+
+    "JMP": "l",
+    "JMPF": "rl",
+    "JMPT": "rl",
+
+    "JMPNEQ": "rrl",
+    "JMPNNE": "rrl",
+    "JMPNLT": "rrl",
+    "JMPNLE": "rrl",
+    "JMPNGT": "rrl",
+    "JMPNGE": "rrl",
+
+    "CALL": "rfr",
+    "NATIVE": "rnr",
+    "RETURN": "r",
+    "HALT": "",
+}
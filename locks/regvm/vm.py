@@ -0,0 +1,348 @@
+from typing import List, Tuple
+
+from .code import RegFunction, RegProgram
+from .instruction import regop
+
+from ..types import LObject, Number, Nil, Array, Boolean, String
+from ..stdlib import builtinFunctionIndex, builtinFunctionTable, builtinFunctionInfo
+from ..error import Error, TypeErr, ZeroDivErr, IndexErr
+from ..output import OutputBuffer, stdout
+
+
+# opcodes as plain ints, the dispatch loop compares against these
+MOVE: int = regop.MOVE.value
+LOADK: int = regop.LOADK.value
+LOADNIL: int = regop.LOADNIL.value
+LOADTRUE: int = regop.LOADTRUE.value
+LOADFALSE: int = regop.LOADFALSE.value
+GETGLOBAL: int = regop.GETGLOBAL.value
+SETGLOBAL: int = regop.SETGLOBAL.value
+ADD: int = regop.ADD.value
+SUB: int = regop.SUB.value
+MUL: int = regop.MUL.value
+DIV: int = regop.DIV.value
+MOD: int = regop.MOD.value
+AND: int = regop.AND.value
+OR: int = regop.OR.value
+NOT: int = regop.NOT.value
+NEG: int = regop.NEG.value
+EQ: int = regop.EQ.value
+NE: int = regop.NE.value
+LT: int = regop.LT.value
+LE: int = regop.LE.value
+GT: int = regop.GT.value
+GE: int = regop.GE.value
+NEWLIST: int = regop.NEWLIST.value
+GETITEM: int = regop.GETITEM.value
+SETITEM: int = regop.SETITEM.value
+JMP: int = regop.JMP.value
+JMPF: int = regop.JMPF.value
+JMPT: int = regop.JMPT.value
+JMPNEQ: int = regop.JMPNEQ.value
+JMPNNE: int = regop.JMPNNE.value
+JMPNLT: int = regop.JMPNLT.value
+JMPNLE: int = regop.JMPNLE.value
+JMPNGT: int = regop.JMPNGT.value
+JMPNGE: int = regop.JMPNGE.value
+CALL: int = regop.CALL.value
+NATIVE: int = regop.NATIVE.value
+RETURN: int = regop.RETURN.value
+HALT: int = regop.HALT.value
+
+
+# values are never modified in place, so these are shared
+TRUE: Boolean = Boolean("true")
+FALSE: Boolean = Boolean("false")
+NIL: Nil = Nil()
+
+
+def _getObjType(el: LObject) -> str:
+    return type(el).__name__
+
+
+def _isTruthy(obj: LObject) -> bool:
+    if obj is TRUE:
+        return True
+    if obj is FALSE:
+        return False
+
+    typ: str = _getObjType(obj)
+
+    if typ == "Number":
+        return obj.value != 0
+    if typ == "String":
+        return len(obj.value) != 0
+    if typ == "Nil":
+        return False
+    if typ == "Boolean":
+        return obj.value != "false"
+    if typ == "Array":
+        return obj.getLen() != 0
+
+    return True
+
+
+#
+# Slow paths of the arithmetic instructions, for operands that are not both
+#  numbers. They raise the same errors as the stack VM.
+#
+def _add(l: LObject, r: LObject) -> LObject:
+    # string concat for '+'
+    if _getObjType(l) == "String":
+        if _getObjType(r) != "String":
+            raise TypeErr(f"Cannot add {_getObjType(r)} to String")
+        return String(l.value + r.value)
+
+    if _getObjType(l) == "Number":
+        raise TypeErr(f"Cannot add {_getObjType(r)} to Number")
+
+    raise TypeErr(f"Addition not defined for type '{_getObjType(l)}'")
+
+
+def _arithmeticError(op: int, l: LObject, r: LObject) -> TypeErr:
+    if op == SUB:
+        return TypeErr(f"Cannot subtract {_getObjType(r)} from {_getObjType(l)}")
+    if op == MUL:
+        return TypeErr(f"Cannot multiply {_getObjType(l)} by {_getObjType(r)}")
+    if op == DIV:
+        return TypeErr(f"Cannot divide {_getObjType(l)} by {_getObjType(r)}")
+    return TypeErr(f"Invalid operand type for modulo: {_getObjType(l)} and {_getObjType(r)}")
+
+
+_compareNames = {
+    LT: "less than", JMPNLT: "less than",
+    LE: "less than equals", JMPNLE: "less than equals",
+    GT: "greater than", JMPNGT: "greater than",
+    GE: "greater than equals", JMPNGE: "greater than equals",
+}
+
+def _compareError(op: int, l: LObject, r: LObject) -> TypeErr:
+    return TypeErr(f"Invalid operand type for {_compareNames[op]} operator: {_getObjType(l)} and {_getObjType(r)}")
+
+
+def _checkIndex(arr: LObject, idx: LObject) -> None:
+    if type(idx).__name__ != "Number":
+        raise TypeErr(f"Array indices must be integers, not '{type(idx).__name__}'")
+
+    if type(idx.value).__name__ == "float":
+        raise TypeErr(f"Array indices must be integers, not float")
+
+    if _getObjType(arr) != "Array":
+        raise TypeErr(f"Type '{type(arr).__name__}' is not subscriptable")
+
+    if arr.getEL(idx.value) == None:
+        raise IndexErr()
+
+
+#
+# Runs a program compiled by the register compiler (locks/regvm/compiler.py).
+#  The whole dispatch loop is one function, with the code, registers and
+#  program counter of the running function in local variables, and the most
+#  frequent instructions tested first. A call saves them on the call stack
+#  and gives the callee a fresh register list. The registers of main are the
+#  globals.
+#
+class RegisterVM:
+    def __init__(self, program: RegProgram) -> None:
+        self._program: RegProgram = program
+
+        # output buffer of print and println, defined in locks/output.py
+        self._stdout: OutputBuffer = stdout
+
+
+    def run(self) -> None:
+        functions: List[RegFunction] = self._program.functions
+        consts: List[LObject] = self._program.constants
+        natives: List[Tuple] = [
+            (builtinFunctionTable[builtinFunctionIndex[i]], builtinFunctionInfo[builtinFunctionIndex[i]][1])
+            for i in range(len(builtinFunctionIndex))
+        ]
+
+        main: RegFunction = functions[0]
+        glob: List[LObject] = [NIL]*main.nregs
+
+        # (<function>, <registers>, <pc>, <result register>) of the callers
+        frames: List[Tuple] = []
+
+        fn: RegFunction = main
+        code: List[Tuple] = main.code
+        regs: List[LObject] = glob
+        pc: int = 0
+
+        # flush buffered output even if the program raises an error
+        try:
+            while True:
+                op, a, b, c = code[pc]
+                pc += 1
+
+                if op == MOVE:
+                    regs[a] = regs[b]
+
+                elif op == LOADK:
+                    regs[a] = consts[b]
+
+                elif op == ADD:
+                    l = regs[b]
+                    r = regs[c]
+                    if type(l) is Number and type(r) is Number:
+                        regs[a] = Number(l.value + r.value)
+                    else:
+                        regs[a] = _add(l, r)
+
+                elif op == JMPNLT or op == JMPNLE or op == JMPNGT or op == JMPNGE:
+                    l = regs[a]
+                    r = regs[b]
+                    if type(l) is not Number or type(r) is not Number:
+                        raise _compareError(op, l, r)
+                    if op == JMPNLT:
+                        if not l.value < r.value:
+                            pc = c
+                    elif op == JMPNLE:
+                        if not l.value <= r.value:
+                            pc = c
+                    elif op == JMPNGT:
+                        if not l.value > r.value:
+                            pc = c
+                    elif not l.value >= r.value:
+                        pc = c
+
+                elif op == JMP:
+                    pc = a
+
+                elif op == GETITEM:
+                    arr = regs[b]
+                    idx = regs[c]
+                    _checkIndex(arr, idx)
+                    regs[a] = arr.getEL(idx.value)
+
+                elif op == SUB or op == MUL or op == DIV or op == MOD:
+                    l = regs[b]
+                    r = regs[c]
+                    if type(l) is not Number or type(r) is not Number:
+                        raise _arithmeticError(op, l, r)
+
+                    if op == SUB:
+                        regs[a] = Number(l.value - r.value)
+                    elif op == MUL:
+                        regs[a] = Number(l.value * r.value)
+                    elif r.value == 0:
+                        raise ZeroDivErr()
+                    elif op == DIV:
+                        regs[a] = Number(l.value / r.value)
+                    else:
+                        regs[a] = Number(l.value % r.value)
+
+                elif op == JMPNEQ:
+                    if regs[a].value != regs[b].value:
+                        pc = c
+
+                elif op == JMPNNE:
+                    if regs[a].value == regs[b].value:
+                        pc = c
+
+                elif op == JMPF:
+                    if not _isTruthy(regs[a]):
+                        pc = b
+
+                elif op == GETGLOBAL:
+                    regs[a] = glob[b]
+
+                elif op == SETGLOBAL:
+                    glob[a] = regs[b]
+
+                elif op == CALL:
+                    callee: RegFunction = functions[b]
+                    frames.append((fn, regs, pc, a))
+
+                    args: List[LObject] = regs[c:c+callee.argc]
+                    regs = [NIL]*callee.nregs
+                    regs[:callee.argc] = args
+
+                    fn = callee
+                    code = callee.code
+                    pc = 0
+
+                elif op == RETURN:
+                    v: LObject = regs[a]
+                    fn, regs, pc, a = frames.pop()
+                    code = fn.code
+                    regs[a] = v
+
+                elif op == NATIVE:
+                    native, argc = natives[b]
+                    regs[a] = native(regs[c:c+argc])
+
+                elif op == SETITEM:
+                    arr = regs[a]
+                    idx = regs[b]
+                    _checkIndex(arr, idx)
+                    arr.setEL(regs[c], idx.value)
+
+                elif op == LT or op == LE or op == GT or op == GE:
+                    l = regs[b]
+                    r = regs[c]
+                    if type(l) is not Number or type(r) is not Number:
+                        raise _compareError(op, l, r)
+
+                    if op == LT:
+                        regs[a] = TRUE if l.value < r.value else FALSE
+                    elif op == LE:
+                        regs[a] = TRUE if l.value <= r.value else FALSE
+                    elif op == GT:
+                        regs[a] = TRUE if l.value > r.value else FALSE
+                    else:
+                        regs[a] = TRUE if l.value >= r.value else FALSE
+
+                elif op == EQ:
+                    regs[a] = TRUE if regs[b].value == regs[c].value else FALSE
+
+                elif op == NE:
+                    regs[a] = TRUE if regs[b].value != regs[c].value else FALSE
+
+                elif op == JMPT:
+                    if _isTruthy(regs[a]):
+                        pc = b
+
+                elif op == AND:
+                    regs[a] = TRUE if _isTruthy(regs[b]) and _isTruthy(regs[c]) else FALSE
+
+                elif op == OR:
+                    regs[a] = TRUE if _isTruthy(regs[b]) or _isTruthy(regs[c]) else FALSE
+
+                elif op == NOT:
+                    regs[a] = FALSE if _isTruthy(regs[b]) else TRUE
+
+                elif op == NEG:
+                    v = regs[b]
+                    if type(v) is not Number:
+                        raise TypeErr(f"Cannot negate {_getObjType(v)}")
+                    regs[a] = Number(-v.value)
+
+                elif op == LOADNIL:
+                    regs[a] = NIL
+
+                elif op == LOADTRUE:
+                    regs[a] = TRUE
+
+                elif op == LOADFALSE:
+                    regs[a] = FALSE
+
+                elif op == NEWLIST:
+                    arrObj: Array = Array()
+                    for e in regs[b:b+c]:
+                        arrObj.addEl(e)
+                    regs[a] = arrObj
+
+                elif op == HALT:
+                    break
+
+                else:
+                    raise Exception(f"{regop(op).name} not implemented.")
+
+        except Error as e:
+            # errors raised by instructions don't know their source line
+            if e.line == None:
+                e.line = fn.lines[pc-1]
+            raise
+        finally:
+            self._stdout.flush()
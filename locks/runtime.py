@@ -0,0 +1,199 @@
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from typing import List, Dict, Union, Optional, TextIO, BinaryIO
+
+from .lexer.lexer import Lexer
+from .parser.parser import Parser
+from .analyzer.analyzer import SemanticAnalyzer
+from .compiler.compiler import Compiler
+from .compiler.inliner import Inliner, MAX_INLINE_SIZE
+from .assembler.asm import Assembler
+from .vm.vm import VirtualMachine
+from .vm.code.code import Code
+from .vm.code.codeBuilder import CodeBuilder
+from .vm.limits import Limits
+
+from .error import Error, CompileErr
+from .output import stdout
+from .input import stdin
+
+
+#
+# A compiled program. The Code object is built from the bytecode once and is
+#  shared by every run, so running a program only creates a VM and its
+#  frames.
+#
+class Program:
+    def __init__(self, bytecode: List[int], functionNames: List[str], key: str) -> None:
+        self.bytecode: List[int] = bytecode
+        self.functionNames: List[str] = functionNames
+
+        # sha256 of the source, the key of the program in the compile cache
+        self.key: str = key
+
+        self.code: Code = CodeBuilder(bytecode).getCodeObj()
+
+
+#
+# Result of running a program. 'output' is only set when the output was
+#  captured, and 'error' is the runtime error that stopped the program, if any.
+#
+class RunResult:
+    def __init__(self, output: Optional[str], error: Optional[Error], elapsed: float) -> None:
+        self.output: Optional[str] = output
+        self.error: Optional[Error] = error
+        self.elapsed: float = elapsed
+        self.returnCode: int = 0 if error == None else -1
+
+
+# print, println and the input builtins write to and read from the module
+#  level buffers in locks/output.py and locks/input.py, so only one program can
+#  run at a time in a process
+_ioLock: threading.Lock = threading.Lock()
+
+
+#
+# Embedding API
+#  Compiles Locks source to programs that can be run any number of times,
+#  with input and output redirected for each run. Compiled programs are kept
+#  in an LRU cache keyed by the hash of their source, so compiling the same
+#  source again is a dictionary lookup.
+#
+#    rt = Runtime()
+#    p = rt.compile('println(input());')
+#    rt.run(p, "hello\n").output   # "hello\n"
+#
+class Runtime:
+    def __init__(self, cacheSize: int = 128, limits: Limits = None, inline: bool = False, maxInlineSize: int = MAX_INLINE_SIZE) -> None:
+        self.cacheSize: int = cacheSize
+
+        # limits used by run when none are passed to it
+        self.limits: Limits = limits
+
+        # inline small functions when compiling, see locks/compiler/inliner.py
+        self.inline: bool = inline
+        self.maxInlineSize: int = maxInlineSize
+
+        # <sha256 of source> : <program>, least recently used first
+        self._cache: Dict[str, Program] = OrderedDict()
+        self._cacheLock: threading.Lock = threading.Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+
+    def compile(self, source: str) -> Program:
+        key: str = hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+        with self._cacheLock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+
+        p: Program = self._compile(source, key)
+
+        with self._cacheLock:
+            self.misses += 1
+            self._cache[key] = p
+            while len(self._cache) > self.cacheSize:
+                self._cache.popitem(last=False)
+
+        return p
+
+
+    def compileFile(self, path: str) -> Program:
+        # files are read the same way as by locks-interpreter.py
+        with open(path, 'r', encoding='unicode_escape') as f:
+            return self.compile(f.read())
+
+
+    def clearCache(self) -> None:
+        with self._cacheLock:
+            self._cache.clear()
+
+
+    # raises CompileErr with every error reported by the lexer, parser or
+    #  semantic analyzer
+    def _compile(self, source: str, key: str) -> Program:
+        l = Lexer(source)
+        tokl = l.getTokens()
+        if l.hadError:
+            raise CompileErr(l.getErrorList())
+
+        p = Parser(tokl)
+        ast = p.getAST()
+        if p.hadError:
+            raise CompileErr(p.getError())
+
+        s = SemanticAnalyzer()
+        s.visit(ast)
+        if s.hadError:
+            raise CompileErr(s.getErrorList())
+
+        if self.inline:
+            Inliner(self.maxInlineSize).visit(ast)
+
+        c = Compiler()
+        c.visit(ast)
+
+        a = Assembler(c.getCode())
+        b: List[int] = a.getBytecodeList()
+
+        return Program(b, a.getFunctionNames(), key)
+
+
+    #
+    # Runs a program, or compiles and runs source code.
+    #  'input' is read by the input builtins, either as a whole or as a
+    #  stream. Output goes to 'output' if a stream is given, otherwise it is
+    #  captured and returned in the result. Runtime errors are returned in the
+    #  result instead of being raised.
+    #
+    def run(
+        self,
+        program: Union[Program, str],
+        input: Union[str, bytes, BinaryIO, TextIO] = b"",
+        output: TextIO = None,
+        limits: Limits = None
+    ) -> RunResult:
+        if type(program).__name__ == "str":
+            program = self.compile(program)
+
+        if limits == None:
+            limits = self.limits
+
+        if type(input).__name__ == "str":
+            input = input.encode("utf-8")
+        if type(input).__name__ == "bytes":
+            input = io.BytesIO(input)
+
+        captured: io.StringIO = None
+        if output == None:
+            captured = io.StringIO()
+            output = captured
+
+        err: Error = None
+
+        with _ioLock:
+            stdout.setStream(output)
+            stdin.setStream(input)
+
+            t0: float = perf_counter()
+            try:
+                VirtualMachine(program.code).run(limits=limits)
+            except Error as e:
+                err = e
+            finally:
+                elapsed: float = perf_counter() - t0
+                stdout.setStream(None)
+                stdin.setStream(None)
+
+        return RunResult(
+            captured.getvalue() if captured != None else None,
+            err,
+            elapsed
+        )
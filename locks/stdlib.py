@@ -1,31 +1,76 @@
-from .types import Nil, String, Number, Array, Boolean
-from .error import TypeErr, ValueErr
-from typing import Union
+from .types import LObject, Nil, String, Number, Array, Boolean, LineIterator
+from .error import TypeErr, ValueErr, IOErr
+from .output import stdout
+from .input import stdin
+from typing import Union, List
+from bisect import bisect_left
+from functools import lru_cache
+from operator import add, mul
+import math
+import mmap
+import os
 
 
-def locks_print(argList: list) -> Nil:
-    output: str = str(argList[0])
+def _writeOutput(obj: LObject) -> None:
+    # strings are printed without quotes
+    if type(obj).__name__ == "String":
+        stdout.write(obj.value)
+    else:
+        obj.writeTo(stdout.write)
 
-    if type(argList[0]).__name__ == "String":
-        output = output[1:-1]
 
-    print(output, end='')
+def locks_print(argList: list) -> Nil:
+    _writeOutput(argList[0])
     return Nil()
 
 
 def locks_println(argList: list) -> Nil:
-    output: str = str(argList[0])
-
-    if type(argList[0]).__name__ == "String":
-        output = output[1:-1]
-
-    print(output)
+    _writeOutput(argList[0])
+    stdout.write('\n')
     return Nil()
 
 
 def locks_input(argList: list) -> String:
     inpstr = argList[0].value
-    return String(input(inpstr))
+
+    # make sure everything printed so far is visible before the prompt
+    stdout.write(inpstr)
+    stdout.flush()
+
+    line: str = stdin.readline()
+    if line == None:
+        return String("")
+    return String(line)
+
+
+# shows what was printed so far before waiting for input on a terminal.
+#  Piped output stays buffered, so loops that read and print lines don't
+#  write on every iteration
+def _flushForInput() -> None:
+    if stdout.isInteractive():
+        stdout.flush()
+
+
+def locks_readline(argList: list) -> Union[String, Nil]:
+    _flushForInput()
+
+    line: str = stdin.readline()
+    if line == None:
+        return Nil()
+    return String(line)
+
+
+def locks_readall(argList: list) -> String:
+    _flushForInput()
+    return String(stdin.readall())
+
+
+def locks_eof(argList: list) -> Boolean:
+    _flushForInput()
+
+    if stdin.eof():
+        return Boolean("true")
+    return Boolean("false")
 
 
 def locks_len(el: list) -> Number:
@@ -56,7 +101,9 @@ def locks_int(el: list) -> Number:
 
 
 def locks_str(el: list) -> String:
-    return String(str(el[0]))
+    parts: List[str] = []
+    el[0].writeTo(parts.append)
+    return String(''.join(parts))
 
 
 def locks_isinteger(el: list) -> Boolean:
@@ -80,6 +127,282 @@ def locks_isinteger(el: list) -> Boolean:
     return getBoolObj(s.isdigit())
 
 
+#
+# Sorting is only defined for arrays holding only Numbers or only Strings
+#
+def _checkSortable(fnName: str, arr: List) -> None:
+    typ: str = None
+    for e in arr:
+        t: str = type(e).__name__
+        if t not in ("Number", "String"):
+            raise TypeErr(f"Cannot {fnName} array containing '{t}'")
+        if typ == None:
+            typ = t
+        elif t != typ:
+            raise TypeErr(f"Cannot {fnName} array containing both '{typ}' and '{t}'")
+
+
+def locks_sort(el: list) -> Nil:
+    if type(el[0]).__name__ != "Array":
+        raise TypeErr(f"Invalid argument type for sort, '{type(el[0]).__name__}'")
+
+    arr: List = el[0]._arr
+    _checkSortable("sort", arr)
+
+    # list.sort is a stable timsort, compare the unwrapped python values
+    arr.sort(key=lambda e: e.value)
+    return Nil()
+
+
+#
+# Sequence view over the unwrapped values of an array, so that bisect can
+#  probe the array directly instead of copying it
+#
+class _ValueView:
+    def __init__(self, arr: List, typ: str) -> None:
+        self._arr = arr
+        self._typ = typ
+
+    def __len__(self) -> int:
+        return len(self._arr)
+
+    def __getitem__(self, i: int):
+        e = self._arr[i]
+        if type(e).__name__ != self._typ:
+            raise TypeErr(f"Cannot bsearch for '{self._typ}' in array containing '{type(e).__name__}'")
+        return e.value
+
+
+def locks_bsearch(el: list) -> Number:
+    if type(el[0]).__name__ != "Array":
+        raise TypeErr(f"Invalid argument type for bsearch, '{type(el[0]).__name__}'")
+
+    typ: str = type(el[1]).__name__
+    if typ not in ("Number", "String"):
+        raise TypeErr(f"Cannot bsearch for '{typ}'")
+
+    arr: List = el[0]._arr
+    idx: int = bisect_left(_ValueView(arr, typ), el[1].value)
+
+    if idx < len(arr) and arr[idx].value == el[1].value:
+        return Number(idx)
+    return Number(-1)
+
+
+#
+# Vector builtins
+#  These run whole-array numeric operations in C. Integer arrays stay on exact
+#  python ints. Arrays of floats use numpy when it is installed and the array
+#  is large enough for the conversion to pay off.
+#
+
+NUMPY_MIN_LEN = 256
+
+
+# numpy is optional, and only imported the first time a vector builtin needs it
+@lru_cache(maxsize=None)
+def _getNumpy():
+    try:
+        import numpy
+    except ModuleNotFoundError:
+        return None
+    return numpy
+
+
+def _getNumbers(fnName: str, a: LObject) -> List[Union[int, float]]:
+    if type(a).__name__ != "Array":
+        raise TypeErr(f"Invalid argument type for {fnName}, '{type(a).__name__}'")
+
+    vals: List[Union[int, float]] = []
+    for e in a._arr:
+        if type(e).__name__ != "Number":
+            raise TypeErr(f"Cannot {fnName} array containing '{type(e).__name__}'")
+        vals.append(e.value)
+    return vals
+
+
+def _getScalar(fnName: str, n: LObject) -> Union[int, float]:
+    if type(n).__name__ != "Number":
+        raise TypeErr(f"Invalid argument type for {fnName}, '{type(n).__name__}'")
+    return n.value
+
+
+def _checkLengths(fnName: str, l: list, r: list) -> None:
+    if len(l) != len(r):
+        raise ValueErr(f"Array lengths do not match for {fnName}, {len(l)} and {len(r)}")
+
+
+# returns a numpy array of l if the numpy fast path applies, None otherwise
+def _asFloatVector(*lists: list):
+    np = _getNumpy()
+    if np == None or len(lists[0]) < NUMPY_MIN_LEN:
+        return None
+
+    for l in lists:
+        if not all(type(v) is float for v in l):
+            return None
+
+    return [np.array(l, dtype=np.float64) for l in lists]
+
+
+def _makeArray(vals, typ: type = Number) -> Array:
+    arr: Array = Array()
+    arr._arr = list(map(typ, vals))
+    return arr
+
+
+def locks_sum(el: list) -> Number:
+    vals = _getNumbers("sum", el[0])
+
+    if all(type(v) is int for v in vals):
+        return Number(sum(vals))
+
+    vec = _asFloatVector(vals)
+    if vec != None:
+        return Number(float(vec[0].sum()))
+
+    return Number(math.fsum(vals))
+
+
+def locks_min(el: list) -> Number:
+    vals = _getNumbers("min", el[0])
+    if len(vals) == 0:
+        raise ValueErr("min of empty array")
+    return Number(min(vals))
+
+
+def locks_max(el: list) -> Number:
+    vals = _getNumbers("max", el[0])
+    if len(vals) == 0:
+        raise ValueErr("max of empty array")
+    return Number(max(vals))
+
+
+def locks_dot(el: list) -> Number:
+    l = _getNumbers("dot", el[0])
+    r = _getNumbers("dot", el[1])
+    _checkLengths("dot", l, r)
+
+    if all(type(v) is int for v in l) and all(type(v) is int for v in r):
+        return Number(sum(map(mul, l, r)))
+
+    vec = _asFloatVector(l, r)
+    if vec != None:
+        return Number(float(vec[0].dot(vec[1])))
+
+    return Number(math.fsum(map(mul, l, r)))
+
+
+def locks_add(el: list) -> Array:
+    l = _getNumbers("add", el[0])
+    r = _getNumbers("add", el[1])
+    _checkLengths("add", l, r)
+
+    vec = _asFloatVector(l, r)
+    if vec != None:
+        return _makeArray((vec[0] + vec[1]).tolist())
+
+    return _makeArray(map(add, l, r))
+
+
+def locks_mul(el: list) -> Array:
+    l = _getNumbers("mul", el[0])
+    r = _getNumbers("mul", el[1])
+    _checkLengths("mul", l, r)
+
+    vec = _asFloatVector(l, r)
+    if vec != None:
+        return _makeArray((vec[0] * vec[1]).tolist())
+
+    return _makeArray(map(mul, l, r))
+
+
+def locks_scale(el: list) -> Array:
+    vals = _getNumbers("scale", el[0])
+    k = _getScalar("scale", el[1])
+
+    vec = _asFloatVector(vals)
+    if vec != None and type(k) is float:
+        return _makeArray((vec[0] * k).tolist())
+
+    return _makeArray([v * k for v in vals])
+
+
+def locks_range(el: list) -> Array:
+    n = _getScalar("range", el[0])
+    if type(n) is not int:
+        raise TypeErr("Argument for 'range' must be an integer, not float")
+    if n < 0:
+        raise ValueErr(f"Argument for 'range' must not be negative, got {n}")
+
+    return _makeArray(range(n))
+
+
+#
+# File builtins
+#  Files of at least MMAP_MIN_SIZE bytes are memory mapped instead of read,
+#  so lines are sliced out of the page cache as they are needed.
+#
+
+MMAP_MIN_SIZE = 1 << 20
+
+
+def _mapFile(fnName: str, p: LObject):
+    if type(p).__name__ != "String":
+        raise TypeErr(f"Invalid argument type for {fnName}, '{type(p).__name__}'")
+
+    try:
+        with open(p.value, "rb") as f:
+            if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+                return f.read()
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError as e:
+        raise IOErr(f"Unable to read file '{p.value}', {e.strerror}")
+
+
+def locks_readfile(el: list) -> String:
+    data = _mapFile("readfile", el[0])
+    s: str = data[:].decode("utf-8", errors="replace")
+
+    if type(data).__name__ == "mmap":
+        data.close()
+    return String(s)
+
+
+def locks_lines(el: list) -> LineIterator:
+    data = _mapFile("lines", el[0])
+    return LineIterator(el[0].value, data)
+
+
+def _getLineIterator(fnName: str, it: LObject) -> LineIterator:
+    if type(it).__name__ != "LineIterator":
+        raise TypeErr(f"Invalid argument type for {fnName}, '{type(it).__name__}'")
+    return it
+
+
+def locks_nextline(el: list) -> Union[String, Nil]:
+    line: str = _getLineIterator("nextline", el[0]).next()
+    if line == None:
+        return Nil()
+    return String(line)
+
+
+def locks_hasline(el: list) -> Boolean:
+    if _getLineIterator("hasline", el[0]).hasNext():
+        return Boolean("true")
+    return Boolean("false")
+
+
+def locks_split(el: list) -> Array:
+    if type(el[0]).__name__ != "String" or type(el[1]).__name__ != "String":
+        raise TypeErr(f"Arguments for 'split' must be of type String")
+
+    if len(el[1].value) == 0:
+        raise ValueErr("Empty separator for split")
+
+    return _makeArray(el[0].value.split(el[1].value), String)
+
+
 builtinFunctionTable = {
     "print" : locks_print,
     "println" : locks_println,
@@ -87,7 +410,25 @@ builtinFunctionTable = {
     "len" : locks_len,
     "int" : locks_int,
     "str" : locks_str,
-    "isinteger" : locks_isinteger
+    "isinteger" : locks_isinteger,
+    "sort" : locks_sort,
+    "bsearch" : locks_bsearch,
+    "sum" : locks_sum,
+    "min" : locks_min,
+    "max" : locks_max,
+    "dot" : locks_dot,
+    "add" : locks_add,
+    "mul" : locks_mul,
+    "scale" : locks_scale,
+    "range" : locks_range,
+    "readline" : locks_readline,
+    "readall" : locks_readall,
+    "eof" : locks_eof,
+    "readfile" : locks_readfile,
+    "lines" : locks_lines,
+    "nextline" : locks_nextline,
+    "hasline" : locks_hasline,
+    "split" : locks_split
 }
 
 # <function name> : (<index>, <argc>)
@@ -98,7 +439,25 @@ builtinFunctionInfo = {
     "len" : (3, 1),
     "int" : (4, 1),
     "str" : (5, 1),
-    "isinteger" : (6, 1)
+    "isinteger" : (6, 1),
+    "sort" : (7, 1),
+    "bsearch" : (8, 2),
+    "sum" : (9, 1),
+    "min" : (10, 1),
+    "max" : (11, 1),
+    "dot" : (12, 2),
+    "add" : (13, 2),
+    "mul" : (14, 2),
+    "scale" : (15, 2),
+    "range" : (16, 1),
+    "readline" : (17, 0),
+    "readall" : (18, 0),
+    "eof" : (19, 0),
+    "readfile" : (20, 1),
+    "lines" : (21, 1),
+    "nextline" : (22, 1),
+    "hasline" : (23, 1),
+    "split" : (24, 2)
 }
 
 builtinFunctionIndex = {
@@ -108,5 +467,23 @@ builtinFunctionIndex = {
     3: "len",
     4: "int",
     5: "str",
-    6: "isinteger"
+    6: "isinteger",
+    7: "sort",
+    8: "bsearch",
+    9: "sum",
+    10: "min",
+    11: "max",
+    12: "dot",
+    13: "add",
+    14: "mul",
+    15: "scale",
+    16: "range",
+    17: "readline",
+    18: "readall",
+    19: "eof",
+    20: "readfile",
+    21: "lines",
+    22: "nextline",
+    23: "hasline",
+    24: "split"
 }
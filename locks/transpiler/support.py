@@ -0,0 +1,349 @@
+import sys
+from typing import List, Dict, Callable, Any
+
+from ..types import LObject, Number, Nil, Array, Boolean, String
+from ..stdlib import builtinFunctionTable
+from ..error import Error, TypeErr, ZeroDivErr, IndexErr
+from ..output import stdout
+
+
+#
+# Runtime support for Python code generated by the transpiler
+#  (locks/transpiler/transpiler.py). Locks values are plain Python values:
+#    Number -> int or float, String -> str, Boolean -> bool, Nil -> None,
+#    Array -> list
+#  Other LObjects, like the line iterators returned by 'lines', are passed
+#  around as they are. The helpers below implement the operations of the
+#  language on them, and raise the same errors as the VM.
+#
+
+# filename of the generated code in tracebacks, see run
+FILENAME: str = "<locks>"
+
+
+def typeName(v: Any) -> str:
+    t = type(v)
+    if t is int or t is float:
+        return "Number"
+    if t is str:
+        return "String"
+    if t is bool:
+        return "Boolean"
+    if v is None:
+        return "Nil"
+    if t is list:
+        return "Array"
+    return t.__name__
+
+
+def _isNumber(v: Any) -> bool:
+    return type(v) is int or type(v) is float
+
+
+def add(l: Any, r: Any) -> Any:
+    if type(l) is int and type(r) is int:
+        return l + r
+
+    # string concat for '+'
+    if type(l) is str:
+        if type(r) is not str:
+            raise TypeErr(f"Cannot add {typeName(r)} to String")
+        return l + r
+
+    if _isNumber(l):
+        if not _isNumber(r):
+            raise TypeErr(f"Cannot add {typeName(r)} to Number")
+        return l + r
+
+    raise TypeErr(f"Addition not defined for type '{typeName(l)}'")
+
+
+def sub(l: Any, r: Any) -> Any:
+    if not _isNumber(l) or not _isNumber(r):
+        raise TypeErr(f"Cannot subtract {typeName(r)} from {typeName(l)}")
+    return l - r
+
+
+def mul(l: Any, r: Any) -> Any:
+    if not _isNumber(l) or not _isNumber(r):
+        raise TypeErr(f"Cannot multiply {typeName(l)} by {typeName(r)}")
+    return l * r
+
+
+def div(l: Any, r: Any) -> Any:
+    if not _isNumber(l) or not _isNumber(r):
+        raise TypeErr(f"Cannot divide {typeName(l)} by {typeName(r)}")
+    if r == 0:
+        raise ZeroDivErr()
+    return l / r
+
+
+def mod(l: Any, r: Any) -> Any:
+    if not _isNumber(l) or not _isNumber(r):
+        raise TypeErr(f"Invalid operand type for modulo: {typeName(l)} and {typeName(r)}")
+    if r == 0:
+        raise ZeroDivErr()
+    return l % r
+
+
+def neg(v: Any) -> Any:
+    if not _isNumber(v):
+        raise TypeErr(f"Cannot negate {typeName(v)}")
+    return -v
+
+
+#
+# '==' and '!=' compare the values the VM keeps in its objects, so true
+#  equals "true" and nil equals "nil". Arrays have no such value, the VM
+#  fails on them in the same way.
+#
+def _eqValue(v: Any) -> Any:
+    if type(v) is bool:
+        return "true" if v else "false"
+    if v is None:
+        return "nil"
+    if _isNumber(v) or type(v) is str:
+        return v
+    raise AttributeError(f"'{typeName(v)}' object has no attribute 'value'")
+
+
+def eq(l: Any, r: Any) -> bool:
+    if type(l) is type(r) and type(l) is not list:
+        return l == r
+    return _eqValue(l) == _eqValue(r)
+
+
+def ne(l: Any, r: Any) -> bool:
+    return not eq(l, r)
+
+
+def _checkCompare(name: str, l: Any, r: Any) -> None:
+    if not _isNumber(l) or not _isNumber(r):
+        raise TypeErr(f"Invalid operand type for {name} operator: {typeName(l)} and {typeName(r)}")
+
+
+def lt(l: Any, r: Any) -> bool:
+    if type(l) is int and type(r) is int:
+        return l < r
+    _checkCompare("less than", l, r)
+    return l < r
+
+
+def le(l: Any, r: Any) -> bool:
+    if type(l) is int and type(r) is int:
+        return l <= r
+    _checkCompare("less than equals", l, r)
+    return l <= r
+
+
+def gt(l: Any, r: Any) -> bool:
+    if type(l) is int and type(r) is int:
+        return l > r
+    _checkCompare("greater than", l, r)
+    return l > r
+
+
+def ge(l: Any, r: Any) -> bool:
+    if type(l) is int and type(r) is int:
+        return l >= r
+    _checkCompare("greater than equals", l, r)
+    return l >= r
+
+
+def _checkIndex(arr: Any, idx: Any) -> None:
+    if not _isNumber(idx):
+        raise TypeErr(f"Array indices must be integers, not '{typeName(idx)}'")
+
+    if type(idx) is float:
+        raise TypeErr(f"Array indices must be integers, not float")
+
+    if type(arr) is not list:
+        raise TypeErr(f"Type '{typeName(arr)}' is not subscriptable")
+
+    if idx >= len(arr):
+        raise IndexErr()
+
+
+def getitem(arr: Any, idx: Any) -> Any:
+    _checkIndex(arr, idx)
+    return arr[idx]
+
+
+# the value is evaluated before the array and the index, like in the VM
+def setitem(v: Any, arr: Any, idx: Any) -> None:
+    _checkIndex(arr, idx)
+    arr[idx] = v
+
+
+#
+# Builtin functions
+#  print, println, len and str are implemented on Python values. The others
+#  are the builtins of locks/stdlib.py, called with their arguments converted
+#  to LObjects and their result converted back.
+#
+
+# same output as LObject.writeTo
+def _writeValue(v: Any, write: Callable[[str], None]) -> None:
+    t = type(v)
+    if t is str:
+        write(f'"{v}"')
+    elif t is bool:
+        write("true" if v else "false")
+    elif t is int or t is float:
+        write(f"{v}")
+    elif v is None:
+        write("nil")
+    elif t is list:
+        write('[')
+        sep: str = ''
+        for e in v:
+            write(sep)
+            _writeValue(e, write)
+            sep = ', '
+        write(']')
+    else:
+        v.writeTo(write)
+
+
+def native_print(v: Any) -> None:
+    # strings are printed without quotes
+    if type(v) is str:
+        stdout.write(v)
+    else:
+        _writeValue(v, stdout.write)
+
+
+def native_println(v: Any) -> None:
+    native_print(v)
+    stdout.write('\n')
+
+
+def native_len(v: Any) -> int:
+    if type(v) is str or type(v) is list:
+        return len(v)
+    raise TypeErr(f"Invalid argument type for len, '{typeName(v)}'")
+
+
+def native_str(v: Any) -> str:
+    parts: List[str] = []
+    _writeValue(v, parts.append)
+    return ''.join(parts)
+
+
+# 'boxed' maps id of each array to (<list>, <Array>), so arrays that appear
+#  more than once stay one array
+def box(v: Any, boxed: Dict[int, tuple]) -> LObject:
+    t = type(v)
+    if t is bool:
+        return Boolean("true" if v else "false")
+    if t is int or t is float:
+        return Number(v)
+    if t is str:
+        return String(v)
+    if v is None:
+        return Nil()
+    if t is list:
+        if id(v) not in boxed:
+            arr: Array = Array()
+            boxed[id(v)] = (v, arr)
+            arr._arr = [box(e, boxed) for e in v]
+        return boxed[id(v)][1]
+    return v
+
+
+# 'lists' maps id of each Array that was boxed from a list to that list
+def unbox(obj: LObject, lists: Dict[int, list]) -> Any:
+    t: str = type(obj).__name__
+    if t in ("Number", "String"):
+        return obj.value
+    if t == "Boolean":
+        return obj.value == "true"
+    if t == "Nil":
+        return None
+    if t == "Array":
+        if id(obj) not in lists:
+            lists[id(obj)] = []
+            lists[id(obj)].extend(unbox(e, lists) for e in obj._arr)
+        return lists[id(obj)]
+    return obj
+
+
+# builtins that change the arrays passed to them
+_MUTATING: List[str] = ["sort"]
+
+
+def _makeNative(name: str) -> Callable:
+    fn: Callable = builtinFunctionTable[name]
+    mutating: bool = name in _MUTATING
+
+    def native(*args: Any) -> Any:
+        boxed: Dict[int, tuple] = dict()
+        result: LObject = fn([box(a, boxed) for a in args])
+
+        lists: Dict[int, list] = {id(arr): l for l, arr in boxed.values()}
+        if mutating:
+            for l, arr in boxed.values():
+                l[:] = [unbox(e, lists) for e in arr._arr]
+        return unbox(result, lists)
+
+    return native
+
+
+#
+# Names the generated code can use, the helpers above as they are, and
+#  every builtin function as native_<name>
+#
+def getNamespace() -> Dict[str, Any]:
+    ns: Dict[str, Any] = {
+        "add": add, "sub": sub, "mul": mul, "div": div, "mod": mod, "neg": neg,
+        "eq": eq, "ne": ne, "lt": lt, "le": le, "gt": gt, "ge": ge,
+        "getitem": getitem, "setitem": setitem,
+    }
+
+    for name in builtinFunctionTable:
+        ns[f"native_{name}"] = _makeNative(name)
+
+    ns["native_print"] = native_print
+    ns["native_println"] = native_println
+    ns["native_len"] = native_len
+    ns["native_str"] = native_str
+
+    return ns
+
+
+# source line of the innermost frame of the generated code in a traceback
+def _getLine(tb, lines: List[int]) -> int:
+    line: int = None
+    while tb != None:
+        if tb.tb_frame.f_code.co_filename == FILENAME and tb.tb_lineno < len(lines):
+            line = lines[tb.tb_lineno]
+        tb = tb.tb_next
+    return line
+
+
+#
+# Runs generated code. 'lines' has the Locks source line of each line of
+#  the code. Locks calls are Python calls, so the recursion limit is raised
+#  while the program runs.
+#
+def run(code, lines: List[int]) -> None:
+    if type(code).__name__ == "str":
+        code = compile(code, FILENAME, "exec")
+
+    limit: int = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+
+    # flush buffered output even if the program raises an error
+    try:
+        exec(code, getNamespace())
+    except Error as e:
+        # errors raised by the helpers don't know their source line
+        if e.line == None:
+            e.line = _getLine(e.__traceback__, lines)
+        raise
+    except RecursionError as e:
+        # the VM has no call depth limit, Python has one
+        raise Error("Recursion Error", "maximum call depth exceeded", _getLine(e.__traceback__, lines), None)
+    finally:
+        sys.setrecursionlimit(limit)
+        stdout.flush()
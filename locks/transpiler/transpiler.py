@@ -0,0 +1,346 @@
+from typing import List, Dict, Set
+
+from ..nodevisitor import NodeVisitor
+from ..compiler.compiler import getNodeLine
+from ..stdlib import builtinFunctionInfo
+
+
+_helpers: Dict[str, str] = {
+    "AddNode": "add",
+    "SubNode": "sub",
+    "MulNode": "mul",
+    "DivNode": "div",
+    "ModNode": "mod",
+    "EqualNode": "eq",
+    "NotEqualNode": "ne",
+    "LessThanNode": "lt",
+    "LessThanEqualNode": "le",
+    "GreaterThanNode": "gt",
+    "GreaterThanEqualNode": "ge",
+}
+
+
+#
+# Python code of one function, and the names of the variables it uses
+#
+class _Function:
+    def __init__(self, header: str, line: int) -> None:
+        self.header: str = header
+        self.line: int = line
+
+        # (<indent>, <code>, <source line>)
+        self.body: List[tuple] = []
+
+        # variables that have to be set to None before the body runs
+        self.variables: Set[str] = set()
+
+        # globals the function assigns to
+        self.nonlocals: Set[str] = set()
+
+
+#
+# Translates the AST into Python source, run by locks/transpiler/support.py.
+#  Every Locks function becomes a Python function nested in _main, which
+#  holds the code of main. The globals are locals of _main, so functions
+#  use them as closure variables. Variables are resolved like the stack
+#  compiler (locks/compiler/compiler.py) does it, and get a prefix so they
+#  can't clash with Python names:
+#    g_<name>: global, l_<name>: local of a function, f_<name>: function
+#  Operations go through the helpers in support.py, which check the types
+#  of the operands.
+#
+class Transpiler(NodeVisitor):
+    def __init__(self) -> None:
+        self._main: _Function = _Function("def _main():", 0)
+        self._functions: List[_Function] = []
+        self._fn: _Function = self._main
+
+        self._globalVars: List[str] = []
+
+        # user functions shadow builtin functions with the same name
+        self._userFunctions: List[str] = []
+
+        self._indent: int = 1
+        self._line: int = 0
+
+        self._code: str = None
+        self._lines: List[int] = None
+
+
+    def getCode(self) -> str:
+        if self._code == None:
+            self._generate()
+        return self._code
+
+
+    # Locks source line of every line of the code, the first is line 1
+    def getLines(self) -> List[int]:
+        if self._lines == None:
+            self._generate()
+        return self._lines
+
+
+    def _generate(self) -> None:
+        out: List[str] = []
+        lines: List[int] = [0]
+
+        def add(indent: int, code: str, line: int) -> None:
+            out.append("    "*indent + code)
+            lines.append(line)
+
+        add(0, self._main.header, 0)
+        if len(self._main.variables) > 0:
+            add(1, " = ".join(sorted(self._main.variables)) + " = None", 0)
+
+        # functions come first, so they can be called before their
+        #  declaration, like in the VM
+        for f in self._functions:
+            add(1, f.header, f.line)
+            if len(f.nonlocals) > 0:
+                add(2, "nonlocal " + ", ".join(sorted(f.nonlocals)), f.line)
+            if len(f.variables) > 0:
+                add(2, " = ".join(sorted(f.variables)) + " = None", f.line)
+            for indent, code, line in f.body:
+                add(indent + 1, code, line)
+            add(2, "return None", f.line)
+
+        for indent, code, line in self._main.body:
+            add(indent, code, line)
+        add(1, "return None", 0)
+
+        add(0, "_main()", 0)
+
+        self._code = '\n'.join(out) + '\n'
+        self._lines = lines
+
+
+    def _emit(self, code: str) -> None:
+        self._fn.body.append((self._indent, code, self._line))
+
+
+    def _markLine(self, node) -> None:
+        line: int = getNodeLine(node)
+        if line > 0:
+            self._line = line
+
+
+    def _getVar(self, name: str, assign: bool = False) -> str:
+        if self._fn == self._main:
+            v: str = f"g_{name}"
+        elif name in self._globalVars:
+            v: str = f"g_{name}"
+            if assign:
+                self._fn.nonlocals.add(v)
+            return v
+        else:
+            v: str = f"l_{name}"
+
+        self._fn.variables.add(v)
+        return v
+
+
+    # statement bodies, which may be a single statement or a block
+    def _body(self, node) -> None:
+        self._indent += 1
+        start: int = len(self._fn.body)
+
+        if type(node).__name__ == "BlockNode":
+            for s in node.stmtList:
+                self._statement(s)
+        else:
+            self._statement(node)
+
+        if len(self._fn.body) == start:
+            self._emit("pass")
+        self._indent -= 1
+
+
+    # expressions used as statements, like function calls, are emitted as
+    #  they are
+    def _statement(self, node) -> None:
+        expr: str = self.visit(node)
+        if expr != None:
+            self._emit(expr)
+
+
+    def visit(self, node):
+        if type(node).__name__ != "FunDeclNode":
+            self._markLine(node)
+        return super().visit(node)
+
+
+    def visit_ProgramNode(self, node) -> None:
+        for d in node.declarationList:
+            self._statement(d)
+
+
+    # expressions return their Python code
+
+    def visit_NumberNode(self, node) -> str:
+        return repr(node.token.value)
+
+
+    def visit_StringNode(self, node) -> str:
+        return repr(node.token.value)
+
+
+    def visit_NilNode(self, node) -> str:
+        return "None"
+
+
+    def visit_TrueNode(self, node) -> str:
+        return "True"
+
+
+    def visit_FalseNode(self, node) -> str:
+        return "False"
+
+
+    def visit_ArrayNode(self, node) -> str:
+        return '[' + ", ".join(self.visit(e) for e in node.elements) + ']'
+
+
+    def visit_IdentifierNode(self, node) -> str:
+        return self._getVar(node.token.value)
+
+
+    def visit_ArrayAccessNode(self, node) -> str:
+        return f"getitem({self.visit(node.base)}, {self.visit(node.index)})"
+
+
+    def visit_NotNode(self, node) -> str:
+        # Python truthiness is the same as that of Locks for these values
+        return f"(not {self.visit(node.node)})"
+
+
+    def visit_NegationNode(self, node) -> str:
+        if type(node.node).__name__ == "NumberNode":
+            return f"({repr(-node.node.token.value)})"
+        return f"neg({self.visit(node.node)})"
+
+
+    def _binary(self, node) -> str:
+        return f"{_helpers[type(node).__name__]}({self.visit(node.left)}, {self.visit(node.right)})"
+
+
+    visit_AddNode = _binary
+    visit_SubNode = _binary
+    visit_MulNode = _binary
+    visit_DivNode = _binary
+    visit_ModNode = _binary
+    visit_EqualNode = _binary
+    visit_NotEqualNode = _binary
+    visit_LessThanNode = _binary
+    visit_LessThanEqualNode = _binary
+    visit_GreaterThanNode = _binary
+    visit_GreaterThanEqualNode = _binary
+
+
+    # both operands are evaluated, like in the VM
+    def visit_AndNode(self, node) -> str:
+        return f"(bool({self.visit(node.left)}) & bool({self.visit(node.right)}))"
+
+    def visit_OrNode(self, node) -> str:
+        return f"(bool({self.visit(node.left)}) | bool({self.visit(node.right)}))"
+
+
+    def visit_FunctionCallNode(self, node) -> str:
+        name: str = node.nameNode.token.value
+        args: str = ", ".join(self.visit(a) for a in node.argList)
+
+        if name in builtinFunctionInfo and name not in self._userFunctions:
+            return f"native_{name}({args})"
+        return f"f_{name}({args})"
+
+
+    # statements emit their Python code
+
+    def visit_VarDeclNode(self, node) -> None:
+        expr: str = "None"
+        if node.exprNode != None:
+            expr = self.visit(node.exprNode)
+
+        name: str = node.id.token.value
+        if self._fn == self._main:
+            self._globalVars.append(name)
+            v: str = f"g_{name}"
+        else:
+            # a declaration in a function is always local, even if a
+            #  global has the same name
+            v: str = f"l_{name}"
+
+        self._fn.variables.add(v)
+        self._emit(f"{v} = {expr}")
+
+
+    def visit_AssignNode(self, node) -> None:
+        expr: str = self.visit(node.exprNode)
+
+        if type(node.lvalue).__name__ == "IdentifierNode":
+            self._emit(f"{self._getVar(node.lvalue.token.value, True)} = {expr}")
+        elif type(node.lvalue).__name__ == "ArrayAccessNode":
+            self._emit(f"setitem({expr}, {self.visit(node.lvalue.base)}, {self.visit(node.lvalue.index)})")
+
+
+    def visit_BlockNode(self, node) -> None:
+        for s in node.stmtList:
+            self._statement(s)
+
+
+    def visit_ContinueNode(self, node) -> None:
+        self._emit("continue")
+
+
+    def visit_BreakNode(self, node) -> None:
+        self._emit("break")
+
+
+    def visit_IfNode(self, node) -> None:
+        keyword: str = "if"
+        for cs in [node.ifBlock] + node.elsifBlocks:
+            self._markLine(cs.condition)
+            self._emit(f"{keyword} {self.visit(cs.condition)}:")
+            self._body(cs.statement)
+            keyword = "elif"
+
+        if node.elseBlock:
+            self._emit("else:")
+            self._body(node.elseBlock)
+
+
+    def visit_WhileNode(self, node) -> None:
+        self._markLine(node.condition)
+        self._emit(f"while {self.visit(node.condition)}:")
+        self._body(node.statement)
+
+
+    def visit_ReturnNode(self, node) -> None:
+        expr: str = self.visit(node.expr)
+
+        # the VM ignores a return outside a function
+        if self._fn == self._main:
+            self._emit(expr)
+        else:
+            self._emit(f"return {expr}")
+
+
+    def visit_FunDeclNode(self, node) -> None:
+        name: str = node.id.token.value
+        self._userFunctions.append(name)
+
+        params: List[str] = [f"l_{p.value}" for p in node.paramList]
+        fn = _Function(f"def f_{name}({', '.join(params)}):", node.id.token.line)
+        self._functions.append(fn)
+
+        oldFn: _Function = self._fn
+        oldIndent: int = self._indent
+        self._fn = fn
+        self._indent = 1
+
+        self._statement(node.blockNode)
+
+        # arguments are already set
+        fn.variables.difference_update(params)
+
+        self._fn = oldFn
+        self._indent = oldIndent
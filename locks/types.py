@@ -1,9 +1,13 @@
-from typing import Union, List
+from typing import Union, List, Callable
 
 class LObject:
     def __repr__(self) -> str:
         return self.__str__()
 
+    # write the string representation piece by piece with 'write'
+    def writeTo(self, write: Callable[[str], None]) -> None:
+        write(self.__str__())
+
 class Number(LObject):
     def __init__(self, val: Union[int, float])-> None:
         self.value = val
@@ -52,12 +56,63 @@ class Array(LObject):
 
 
     def __str__(self) -> str:
-        output: str = '['
+        parts: List[str] = []
+        self.writeTo(parts.append)
+        return ''.join(parts)
+
+    # nested arrays write into the same output instead of building
+    #  intermediate strings
+    def writeTo(self, write: Callable[[str], None]) -> None:
+        write('[')
+        sep: str = ''
         for i in self._arr:
-            output += str(i) + ", "
-        output = output[:-2]
-        output += ']'
-        return output
+            write(sep)
+            i.writeTo(write)
+            sep = ', '
+        write(']')
+
+
+#
+# Lazily reads lines from a file. 'data' is a mmap of the file, or a bytes
+#  object for small and empty files; both support find and slicing, so each
+#  line is sliced out only when it is asked for.
+#
+class LineIterator(LObject):
+    def __init__(self, path: str, data)-> None:
+        self.path = path
+        self._data = data
+        self._pos: int = 0
+
+    def hasNext(self) -> bool:
+        return self._pos < len(self._data)
+
+    def next(self) -> Union[str, None]:
+        if not self.hasNext():
+            return None
+
+        end: int = self._data.find(b'\n', self._pos)
+        if end == -1:
+            end = len(self._data)
+
+        line: bytes = self._data[self._pos:end]
+        self._pos = end + 1
+
+        if line.endswith(b'\r'):
+            line = line[:-1]
+
+        if not self.hasNext():
+            self.close()
+
+        return line.decode("utf-8", errors="replace")
+
+    def close(self) -> None:
+        if hasattr(self._data, "close"):
+            self._data.close()
+        self._data = b''
+        self._pos = 0
+
+    def __str__(self) -> str:
+        return f"<lines {self.path}>"
 
 
 class Function(LObject):
@@ -8,8 +8,48 @@ class Tag:
 class func_info:
     def __init__(self):
         self.argc: int = 0
+        self.nlocals: int = 0
         self.code: List[int] = []
 
+        # encoded line table, see Assembler._makeLineTable
+        self.lnotab: List[int] = []
+        self._lines: List[int] = None
+
+    #
+    # Returns the source line of the instruction at 'pc', or None if unknown.
+    #  The line table is decoded into one entry per code byte the first time
+    #  it is needed, so this is only paid for when a line is looked up.
+    #
+    def getLine(self, pc: int) -> int:
+        if self._lines == None:
+            self._lines = self._decodeLineTable()
+
+        if pc < 0 or pc >= len(self._lines) or self._lines[pc] == 0:
+            return None
+        return self._lines[pc]
+
+    def _decodeLineTable(self) -> List[int]:
+        lines: List[int] = [0]*len(self.code)
+        pc: int = 0
+        line: int = 0
+
+        for i in range(0, len(self.lnotab), 2):
+            dpc: int = self.lnotab[i]
+            dline: int = self.lnotab[i+1]
+            if dline > 127:
+                dline -= 256
+
+            for p in range(pc, min(pc + dpc, len(lines))):
+                lines[p] = line
+
+            pc += dpc
+            line += dline
+
+        for p in range(pc, len(lines)):
+            lines[p] = line
+
+        return lines
+
     def __str__(self):
         code = ""
         for i in self.code:
@@ -38,12 +78,21 @@ class Code:
         self.const_pool: List[cp_info] = []
         self.func_pool: List[func_info] = []
 
+        # value LOAD_CONST pushes for each constant, built once when the
+        #  constant is added. Values are immutable, so they are shared by
+        #  every load
+        self.const_values: List[Any] = []
+
     def addToCP(self, c: cp_info) -> None:
         self.const_pool.append(c)
+        self.const_values.append(c.info)
 
     def getFromCP(self, idx: int) -> cp_info:
         return self.const_pool[idx]
 
+    def getConstValue(self, idx: int) -> Any:
+        return self.const_values[idx]
+
     def addToFP(self, c: func_info) -> None:
         self.func_pool.append(c)
 
@@ -6,6 +6,9 @@ class CodeBuilder:
         self._code = Code()
         self._code_array = codeArr
 
+        # index of the next byte to read
+        self._pos: int = 0
+
     
     def getCodeObj(self) -> Code:
         self._initCode()
@@ -14,7 +17,25 @@ class CodeBuilder:
         return self._code
 
     def _removeFromFront(self, n: int) -> None:
-        self._code_array = self._code_array[n:]
+        self._pos += n
+
+
+    def _readU16(self) -> int:
+        v = self._code_array
+        n: int = (v[self._pos] << 8) + v[self._pos + 1]
+        self._removeFromFront(2)
+        return n
+
+
+    def _readU32(self) -> int:
+        v = self._code_array
+        n: int =                        \
+            (v[self._pos] << 24) +      \
+            (v[self._pos + 1] << 16) +  \
+            (v[self._pos + 2] << 8) +   \
+            (v[self._pos + 3])
+        self._removeFromFront(4)
+        return n
 
     
     def _initCode(self) -> None:
@@ -22,10 +43,10 @@ class CodeBuilder:
             raise InvalidBytecodeError()
 
         magic: int =                        \
-            (self._code_array[0] << 24) +   \
-            (self._code_array[1] << 16) +   \
-            (self._code_array[2] << 8) +    \
-            (self._code_array[3])
+            (self._code_array[self._pos] << 24) +   \
+            (self._code_array[self._pos + 1] << 16) +   \
+            (self._code_array[self._pos + 2] << 8) +    \
+            (self._code_array[self._pos + 3])
 
         if magic != Code.magic_number:
             raise InvalidBytecodeError()
@@ -34,11 +55,10 @@ class CodeBuilder:
 
     
     def _makeConstPool(self) -> None:
-        cp_count: int = (self._code_array[0] << 8) + (self._code_array[1])
-        self._removeFromFront(2)
+        cp_count: int = self._readU32()
         
         for _ in range(cp_count):
-            t: Tag = self._code_array[0]
+            t: Tag = self._code_array[self._pos]
             self._removeFromFront(1)
 
             if t == Tag.CONSTANT_Integer:
@@ -50,14 +70,14 @@ class CodeBuilder:
 
     def _makeInteger(self) -> None:
         i: int =                            \
-            (self._code_array[0] << 56) +   \
-            (self._code_array[1] << 48) +   \
-            (self._code_array[2] << 40) +   \
-            (self._code_array[3] << 32) +   \
-            (self._code_array[4] << 24) +   \
-            (self._code_array[5] << 16) +   \
-            (self._code_array[6] << 8) +    \
-            (self._code_array[7])
+            (self._code_array[self._pos] << 56) +   \
+            (self._code_array[self._pos + 1] << 48) +   \
+            (self._code_array[self._pos + 2] << 40) +   \
+            (self._code_array[self._pos + 3] << 32) +   \
+            (self._code_array[self._pos + 4] << 24) +   \
+            (self._code_array[self._pos + 5] << 16) +   \
+            (self._code_array[self._pos + 6] << 8) +    \
+            (self._code_array[self._pos + 7])
 
         s_test: int = (i & 0xf000000000000000) >> 60
 
@@ -71,7 +91,7 @@ class CodeBuilder:
 
     
     def _makeDouble(self) -> None:
-        v = self._code_array
+        v = self._code_array[self._pos:self._pos + 8]
 
         sign: int = (v[0] & 0b10000000) >> 7
         exp: int = (((v[0] << 8) + (v[1])) & 0b0111111111110000) >> 4
@@ -94,32 +114,31 @@ class CodeBuilder:
     def _makeString(self) -> None:
         s: str = ""
 
-        while self._code_array[0] != 0x00:
-            s += chr(self._code_array[0])
+        while self._code_array[self._pos] != 0x00:
+            s += chr(self._code_array[self._pos])
             self._removeFromFront(1)
 
         self._removeFromFront(1)
         self._code.addToCP(cp_info(Tag.CONSTANT_String, s))
 
     def _makeFuncPool(self) -> None:
-        fp_count: int = (self._code_array[0] << 8) + (self._code_array[1])
-        self._removeFromFront(2)
+        fp_count: int = self._readU16()
         for _ in range(fp_count):
             self._code.addToFP(self._makeFunc())
 
     def _makeFunc(self) -> func_info:
         f = func_info()
 
-        argc: int = (self._code_array[0] << 8) + (self._code_array[1])
-        self._removeFromFront(2)
-        f.argc = argc
+        f.argc = self._readU16()
+        f.nlocals = self._readU32()
 
-        code_count: int = (self._code_array[0] << 8) + (self._code_array[1])
-        self._removeFromFront(2)
-        
-        for _ in range(code_count):
-            f.code.append(self._code_array[0])
-            self._removeFromFront(1)
+        code_count: int = self._readU32()
+        f.code = self._code_array[self._pos:self._pos + code_count]
+        self._removeFromFront(code_count)
+
+        lnotab_count: int = self._readU32()
+        f.lnotab = self._code_array[self._pos:self._pos + lnotab_count]
+        self._removeFromFront(lnotab_count)
 
         return f
         
@@ -0,0 +1,639 @@
+import math
+from typing import List, Dict, Tuple, Callable, Any
+
+from .code.code import Code
+from ..instruction import opcode, opcodeDict
+from .values import box, unbox, isTruthy, equals, comparedValue
+from ..types import Number, Nil, Array, Boolean, String
+from ..stdlib import builtinFunctionIndex, builtinFunctionTable, builtinFunctionInfo
+
+
+# number of times the backward jump to a loop header runs before the loop is
+#  traced
+HOT_LOOP: int = 50
+
+# number of times a trace leaves through a side exit before a side trace is
+#  recorded from that exit
+HOT_EXIT: int = 50
+
+# longest trace recorded, in instructions
+MAX_TRACE_LENGTH: int = 1000
+
+# most side traces attached to the trace of one loop
+MAX_SIDE_TRACES: int = 16
+
+# filename of the generated code in tracebacks
+FILENAME: str = "<trace>"
+
+
+# recording stops before these, see VirtualMachine._recordTrace
+UNTRACEABLE: List[int] = [
+    opcode.END.value,
+    opcode.CALL_FUNCTION.value,
+    opcode.RETURN_VALUE.value,
+    opcode.EXTENDED_ARG.value,
+]
+
+
+# generic form of each specialized instruction, traces only use generic ones
+_generic: Dict[int, int] = {
+    opcode.BINARY_ADD_NUM.value: opcode.BINARY_ADD.value,
+    opcode.BINARY_ADD_STR.value: opcode.BINARY_ADD.value,
+    opcode.BINARY_SUBTRACT_NUM.value: opcode.BINARY_SUBTRACT.value,
+    opcode.BINARY_MULTIPLY_NUM.value: opcode.BINARY_MULTIPLY.value,
+    opcode.CMPLT_NUM.value: opcode.CMPLT.value,
+    opcode.CMPGT_NUM.value: opcode.CMPGT.value,
+    opcode.CMPLE_NUM.value: opcode.CMPLE.value,
+    opcode.CMPGE_NUM.value: opcode.CMPGE.value,
+    opcode.BINARY_SUBSCR_ARRAY.value: opcode.BINARY_SUBSCR.value,
+}
+
+
+def getGenericOpcode(i: int) -> int:
+    return _generic.get(i, i)
+
+
+# number of operands an instruction takes from the operand stack, for the
+#  ones whose operand types are recorded
+stackOperands: Dict[int, int] = {
+    opcode.BINARY_ADD.value: 2,
+    opcode.BINARY_SUBTRACT.value: 2,
+    opcode.BINARY_MULTIPLY.value: 2,
+    opcode.BINARY_DIVIDE.value: 2,
+    opcode.BINARY_MODULO.value: 2,
+    opcode.CMPEQ.value: 2,
+    opcode.CMPNE.value: 2,
+    opcode.CMPLT.value: 2,
+    opcode.CMPGT.value: 2,
+    opcode.CMPLE.value: 2,
+    opcode.CMPGE.value: 2,
+    opcode.UNARY_NEGATIVE.value: 1,
+    opcode.BINARY_SUBSCR.value: 2,
+    opcode.STORE_SUBSCR.value: 3,
+    opcode.FOR_RANGE.value: 2,
+    opcode.SWITCH.value: 1,
+}
+
+
+_arithmetic: Dict[int, str] = {
+    opcode.BINARY_ADD.value: '+',
+    opcode.BINARY_SUBTRACT.value: '-',
+    opcode.BINARY_MULTIPLY.value: '*',
+    opcode.BINARY_DIVIDE.value: '/',
+    opcode.BINARY_MODULO.value: '%',
+}
+
+_comparison: Dict[int, str] = {
+    opcode.CMPEQ.value: '==',
+    opcode.CMPNE.value: '!=',
+    opcode.CMPLT.value: '<',
+    opcode.CMPGT.value: '>',
+    opcode.CMPLE.value: '<=',
+    opcode.CMPGE.value: '>=',
+}
+
+
+#
+# One recorded path through a loop. Every entry is
+#    (<offset>, <opcode>, <operand>, <operand type names>, <next offset>)
+#  where the opcode is generic and the next offset is where the interpreter
+#  went after the instruction. 'children' maps the index of an entry to the
+#  side trace recorded from the exit at that entry.
+#
+class Trace:
+    def __init__(self, entries: List[tuple]) -> None:
+        self.entries: List[tuple] = entries
+        self.children: Dict[int, Trace] = dict()
+
+
+#
+# The traces of one loop: the root trace, recorded from the loop header, and
+#  the side traces hanging from it, compiled together into one Python
+#  function. The function runs the loop until one of its exits is taken, and
+#  returns the index of that exit in 'exits'. A tree compiled with 'counted'
+#  set takes the number of instructions it may run as a last argument, stores
+#  the number it ran in vm._traceCount, and returns -1 at the loop header
+#  once it has used them up, so that execution limits can be checked.
+#
+class TraceTree:
+    def __init__(self, header: int, root: Trace) -> None:
+        self.header: int = header
+        self.root: Trace = root
+
+        self.fn: Callable = None
+        self.source: str = None
+        self.counted: bool = False
+
+        # (<trace>, <entry index>, <offset to resume the interpreter at>)
+        self.exits: List[Tuple[Trace, int, int]] = []
+
+        # (<id of trace>, <entry index>) : <times taken>
+        self._exitCounts: Dict[Tuple[int, int], int] = dict()
+        self._sideTraces: int = 0
+
+
+    # counts an exit, returns True when a side trace should be recorded there
+    def takeExit(self, k: int) -> bool:
+        trace, index, ip = self.exits[k]
+        key: Tuple[int, int] = (id(trace), index)
+        n: int = self._exitCounts.get(key, 0) + 1
+        self._exitCounts[key] = n
+        return n == HOT_EXIT and self._sideTraces < MAX_SIDE_TRACES
+
+
+    def addSideTrace(self, k: int, side: Trace) -> None:
+        trace, index, ip = self.exits[k]
+        trace.children[index] = side
+        self._sideTraces += 1
+
+
+    # 'isMain' tells if the loop is in main, where locals are the globals
+    def compile(self, isMain: bool, codeObj: Code, counted: bool = False) -> None:
+        c = _TraceCompiler(self, isMain, codeObj, counted)
+        self.source = c.getSource()
+        self.exits = c.exits
+        self.counted = counted
+
+        ns: Dict[str, Any] = c.namespace
+        exec(compile(self.source, FILENAME, "exec"), ns)
+        self.fn = ns["trace"]
+
+
+# types of values the compiler specializes for, by name, see
+#  locks/vm/values.py
+_NUMBERS: List[str] = ["int", "float"]
+_PLAIN: List[str] = ["int", "float", "str", "bool", "NoneType"]
+
+
+#
+# Value on the operand stack while a trace is compiled. 'expr' is a Python
+#  expression for it, 'type' the name of its type if the trace knows it, and
+#  'const' its Python value if it is a constant.
+#
+class _Value:
+    def __init__(self, expr: str, typ: str = None, const: Any = None) -> None:
+        self.expr: str = expr
+        self.type: str = typ
+        self.const: Any = const
+
+
+#
+# What the compiler knows at a point of a trace: the values it keeps on the
+#  operand stack instead of pushing them, which sit on top of the real
+#  operand stack, and the value of each variable it has loaded or stored
+#
+class _State:
+    def __init__(self) -> None:
+        self.stack: List[_Value] = []
+        self.variables: Dict[int, _Value] = dict()
+
+
+#
+# Generates the Python source of a trace tree. Each trace is a straight line
+#  of code; guards check that a value has the type seen while recording and
+#  that a branch goes the way it went then. A failed guard leaves through an
+#  exit, which pushes the values the trace kept to itself onto the operand
+#  stack and returns, or runs the side trace recorded from that exit.
+#  Instructions without a special case run through their VM handler.
+#
+class _TraceCompiler:
+    def __init__(self, tree: TraceTree, isMain: bool, codeObj: Code, counted: bool) -> None:
+        self._tree: TraceTree = tree
+        self._isMain: bool = isMain
+        self._codeObj: Code = codeObj
+        self._counted: bool = counted
+
+        self._lines: List[str] = []
+        self._indent: int = 0
+        self._tmps: int = 0
+
+        self.exits: List[Tuple[Trace, int, int]] = []
+
+        # offset of a SWITCH : its target, inside the exit of that SWITCH
+        self._switchTargets: Dict[int, _Value] = dict()
+
+        # offset of the pairs of a SWITCH : number of pairs. Its jump table
+        #  is sw<offset>, and the target of other values sd<offset>
+        self._switches: Dict[int, int] = dict()
+
+        # id of a trace : instructions run since the loop header when it
+        #  starts, which are those of its parents up to its exit
+        self._starts: Dict[int, int] = dict()
+
+        self.namespace: Dict[str, Any] = {
+            "Number": Number, "String": String, "Boolean": Boolean,
+            "Nil": Nil, "Array": Array,
+            "box": box, "unbox": unbox, "truthy": isTruthy, "equals": equals,
+            "comparedValue": comparedValue,
+        }
+
+
+    def getSource(self) -> str:
+        if self._counted:
+            self._emit("def trace(vm, frame, loc, glob, budget):")
+        else:
+            self._emit("def trace(vm, frame, loc, glob):")
+        self._indent += 1
+        self._emit("push = frame.pushOpStack")
+        self._emit("pop = frame.popOpStack")
+
+        # instructions run by the iterations done so far
+        if self._counted:
+            self._emit("n = 0")
+        self._emit("while True:")
+        self._indent += 1
+
+        # jump tables are looked up once, before the loop
+        start: int = len(self._lines) - 1
+        self._trace(self._tree.root)
+        self._lines[start:start] = [f"    sw{pos}, sd{pos} = vm._getSwitch({pos}, {n})" for pos, n in self._switches.items()]
+        return '\n'.join(self._lines) + '\n'
+
+
+    def _emit(self, line: str) -> None:
+        self._lines.append("    "*self._indent + line)
+
+
+    def _assign(self, expr: str, typ: str = None) -> _Value:
+        self._tmps += 1
+        t: str = f"t{self._tmps}"
+        self._emit(f"{t} = {expr}")
+        return _Value(t, typ)
+
+
+    # the top n values, bottom first. Values still on the real operand stack
+    #  are popped into the trace's stack first
+    def _operands(self, state: _State, n: int) -> List[_Value]:
+        while len(state.stack) < n:
+            state.stack.insert(0, self._assign("pop()"))
+        return state.stack[len(state.stack) - n:]
+
+
+    def _pop(self, state: _State) -> _Value:
+        self._operands(state, 1)
+        return state.stack.pop()
+
+
+    # expression for the LObject of a value, for builtins and arrays
+    def _box(self, v: _Value) -> str:
+        if v.type in _NUMBERS:
+            return f"Number({v.expr})"
+        if v.type == "str":
+            return f"String({v.expr})"
+        if v.type == "bool":
+            return f"Boolean('true' if {v.expr} else 'false')"
+        if v.type == "NoneType":
+            return "Nil()"
+        if v.type == "Array":
+            return v.expr
+        return f"box({v.expr})"
+
+
+    def _truth(self, v: _Value) -> str:
+        if v.type == "bool":
+            return v.expr
+        if v.type in _PLAIN:
+            return f"bool({v.expr})"
+        return f"truthy({v.expr})"
+
+
+    # pushes the values kept by the trace, on the main path
+    def _flush(self, state: _State) -> None:
+        for v in state.stack:
+            self._emit(f"push({v.expr})")
+        state.stack = []
+
+
+    def _variable(self, op: int, arg: int) -> Tuple[int, str]:
+        # the locals of main are the globals
+        if op in (opcode.LOAD_GLOBAL.value, opcode.STORE_GLOBAL.value, opcode.INC_GLOBAL.value) or self._isMain:
+            return (arg << 1, f"glob[{arg}]")
+        return ((arg << 1) + 1, f"loc[{arg}]")
+
+
+    #
+    # Leaves the trace when 'cond' holds. The interpreter resumes at 'ip'
+    #  with the values in 'stack' pushed, or the side trace recorded from
+    #  this exit runs instead, keeping those values to itself.
+    #
+    def _exit(self, cond: str, trace: Trace, index: int, ip: int, stack: List[_Value]) -> None:
+        self._emit(f"if {cond}:")
+        self._indent += 1
+
+        # the instruction at the exit has run unless the interpreter
+        #  resumes at it
+        done: int = self._starts[id(trace)] + index + int(ip != trace.entries[index][0])
+
+        if index in trace.children:
+            # copies, the types the side trace learns don't hold after the exit
+            self._trace(trace.children[index], [_Value(v.expr, v.type, v.const) for v in stack], done)
+        else:
+            for v in stack:
+                self._emit(f"push({v.expr})")
+            if self._counted:
+                self._emit(f"vm._traceCount = n + {done}")
+            self.exits.append((trace, index, ip))
+            self._emit(f"return {len(self.exits) - 1}")
+
+        self._indent -= 1
+
+
+    def _guard(self, conds: List[str], state: _State, trace: Trace, index: int, ip: int) -> None:
+        if len(conds) > 0:
+            self._exit(" or ".join(conds), trace, index, ip, state.stack)
+
+
+    # adds the guard that v has type 'typ' to conds, unless that is known
+    def _typeGuard(self, v: _Value, typ: str, conds: List[str]) -> None:
+        if v.type == typ:
+            return
+        if typ == "NoneType":
+            conds.append(f"{v.expr} is not None")
+        else:
+            conds.append(f"type({v.expr}) is not {typ}")
+
+
+    # the values had the types in 'types' when the trace was recorded, and
+    #  have them after their guards
+    def _refine(self, values: List[_Value], types: Tuple[str, ...]) -> None:
+        for v, typ in zip(values, types):
+            v.type = typ
+
+
+    # 'start' is the number of instructions run since the loop header
+    def _trace(self, trace: Trace, stack: List[_Value] = None, start: int = 0) -> None:
+        self._starts[id(trace)] = start
+        state = _State()
+        if stack != None:
+            state.stack = stack
+        for index, entry in enumerate(trace.entries):
+            self._instruction(state, trace, index, entry)
+
+
+    def _instruction(self, state: _State, trace: Trace, index: int, entry: tuple) -> None:
+        ip, op, arg, types, nextIp = entry
+        self._emit(f"# {ip} {opcodeDict[op]}")
+
+        if op == opcode.GOTO.value:
+            # the backward jump to the header ends the trace
+            if arg == self._tree.header:
+                self._flush(state)
+                if self._counted:
+                    self._emit(f"n += {self._starts[id(trace)] + index + 1}")
+                    self._emit("if n >= budget:")
+                    self._emit("    vm._traceCount = n")
+                    self._emit("    return -1")
+                self._emit("continue")
+            return
+
+        if op in (opcode.POP_JMP_IF_TRUE.value, opcode.POP_JMP_IF_FALSE.value):
+            v: _Value = self._pop(state)
+            if v.const != None:
+                return
+
+            truth: str = self._truth(v)
+            taken: bool = nextIp == arg
+            jumps: str = truth if op == opcode.POP_JMP_IF_TRUE.value else f"not ({truth})"
+
+            # the exit goes where the recorded run didn't
+            if taken:
+                self._exit(f"not ({jumps})", trace, index, ip + 3, state.stack)
+            else:
+                self._exit(jumps, trace, index, arg, state.stack)
+            return
+
+        if op == opcode.FOR_RANGE.value:
+            l, r = self._operands(state, 2)
+            conds: List[str] = []
+            self._typeGuard(l, types[0], conds)
+            self._typeGuard(r, types[1], conds)
+            self._guard(conds, state, trace, index, ip)
+            self._refine([l, r], types)
+            del state.stack[-2:]
+
+            # the loop ends when the jump is taken
+            if nextIp == arg:
+                self._exit(f"{l.expr} < {r.expr}", trace, index, ip + 3, state.stack)
+            else:
+                self._exit(f"not ({l.expr} < {r.expr})", trace, index, arg, state.stack)
+            return
+
+        # a value with another branch goes back to the SWITCH. The side trace
+        #  recorded from there starts at the SWITCH, and reuses the target
+        #  looked up here
+        if op == opcode.SWITCH.value:
+            v: _Value = self._pop(state)
+            target: _Value = self._switchTargets.get(ip) if index == 0 else None
+            if target == None:
+                self._switches[ip + 3] = arg
+
+                # the values of numbers and strings are their keys
+                if types[0] in ("int", "float", "str"):
+                    conds: List[str] = []
+                    self._typeGuard(v, types[0], conds)
+                    if len(conds) > 0:
+                        self._exit(" or ".join(conds), trace, index, ip, state.stack + [v])
+                    v.type = types[0]
+                    key: str = v.expr
+                else:
+                    key: str = f"comparedValue({v.expr})"
+                target = self._assign(f"sw{ip + 3}.get({key}, sd{ip + 3})")
+
+            outer: _Value = self._switchTargets.get(ip)
+            self._switchTargets[ip] = target
+            self._exit(f"{target.expr} != {nextIp}", trace, index, ip, state.stack + [v])
+            self._switchTargets[ip] = outer
+            return
+
+        if op in (opcode.INC_LOCAL.value, opcode.INC_GLOBAL.value):
+            key, slot = self._variable(op, arg)
+            if types[0] not in _NUMBERS:
+                state.variables.pop(key, None)
+                self._generic(state, ip, op)
+                return
+
+            if key not in state.variables:
+                state.variables[key] = self._assign(slot)
+            v: _Value = state.variables[key]
+
+            conds: List[str] = []
+            self._typeGuard(v, types[0], conds)
+            self._guard(conds, state, trace, index, ip)
+            self._refine([v], types)
+
+            state.variables[key] = self._assign(f"{v.expr} + 1", types[0])
+            self._emit(f"{slot} = {state.variables[key].expr}")
+            return
+
+        if op == opcode.BIPUSH.value:
+            state.stack.append(_Value(str(arg), "int", arg))
+            return
+
+        if op == opcode.LOAD_CONST.value:
+            state.stack.append(self._constant(arg))
+            return
+
+        if op == opcode.LOAD_TRUE.value:
+            state.stack.append(_Value("True", "bool", True))
+            return
+
+        if op == opcode.LOAD_FALSE.value:
+            state.stack.append(_Value("False", "bool", False))
+            return
+
+        if op == opcode.LOAD_NIL.value:
+            state.stack.append(_Value("None", "NoneType"))
+            return
+
+        if op in (opcode.LOAD_LOCAL.value, opcode.LOAD_GLOBAL.value):
+            key, slot = self._variable(op, arg)
+            if key not in state.variables:
+                state.variables[key] = self._assign(slot)
+            state.stack.append(state.variables[key])
+            return
+
+        if op in (opcode.STORE_LOCAL.value, opcode.STORE_GLOBAL.value):
+            key, slot = self._variable(op, arg)
+            v: _Value = self._pop(state)
+            self._emit(f"{slot} = {v.expr}")
+            state.variables[key] = v
+            return
+
+        if op in _arithmetic and types[0] in _NUMBERS and types[1] in _NUMBERS:
+            l, r = self._operands(state, 2)
+            conds: List[str] = []
+            self._typeGuard(l, types[0], conds)
+            self._typeGuard(r, types[1], conds)
+            if op in (opcode.BINARY_DIVIDE.value, opcode.BINARY_MODULO.value) and not r.const:
+                conds.append(f"{r.expr} == 0")
+            self._guard(conds, state, trace, index, ip)
+            self._refine([l, r], types)
+
+            typ: str = "int" if types == ("int", "int") and op != opcode.BINARY_DIVIDE.value else "float"
+            state.stack[-2:] = [self._assign(f"{l.expr} {_arithmetic[op]} {r.expr}", typ)]
+            return
+
+        if op == opcode.BINARY_ADD.value and types == ("str", "str"):
+            l, r = self._operands(state, 2)
+            conds: List[str] = []
+            self._typeGuard(l, "str", conds)
+            self._typeGuard(r, "str", conds)
+            self._guard(conds, state, trace, index, ip)
+            self._refine([l, r], types)
+
+            state.stack[-2:] = [self._assign(f"{l.expr} + {r.expr}", "str")]
+            return
+
+        if op in _comparison and types[0] in _NUMBERS and types[1] in _NUMBERS:
+            l, r = self._operands(state, 2)
+            conds: List[str] = []
+            self._typeGuard(l, types[0], conds)
+            self._typeGuard(r, types[1], conds)
+            self._guard(conds, state, trace, index, ip)
+            self._refine([l, r], types)
+
+            state.stack[-2:] = [self._assign(f"{l.expr} {_comparison[op]} {r.expr}", "bool")]
+            return
+
+        if op in (opcode.CMPEQ.value, opcode.CMPNE.value):
+            l, r = self._operands(state, 2)
+
+            # values of the same plain type compare like Python values
+            if types[0] == types[1] and types[0] in _PLAIN:
+                conds: List[str] = []
+                self._typeGuard(l, types[0], conds)
+                self._typeGuard(r, types[1], conds)
+                self._guard(conds, state, trace, index, ip)
+                self._refine([l, r], types)
+                expr: str = f"{l.expr} {_comparison[op]} {r.expr}"
+            elif op == opcode.CMPEQ.value:
+                expr: str = f"equals({l.expr}, {r.expr})"
+            else:
+                expr: str = f"not equals({l.expr}, {r.expr})"
+
+            state.stack[-2:] = [self._assign(expr, "bool")]
+            return
+
+        if op == opcode.UNARY_NEGATIVE.value and types[0] in _NUMBERS:
+            v: _Value = self._operands(state, 1)[0]
+            conds: List[str] = []
+            self._typeGuard(v, types[0], conds)
+            self._guard(conds, state, trace, index, ip)
+            self._refine([v], types)
+
+            state.stack[-1] = self._assign(f"-{v.expr}", types[0])
+            return
+
+        if op == opcode.UNARY_NOT.value:
+            v: _Value = self._pop(state)
+            state.stack.append(self._assign(f"not ({self._truth(v)})", "bool"))
+            return
+
+        if op in (opcode.BINARY_AND.value, opcode.BINARY_OR.value):
+            l, r = self._operands(state, 2)
+            conn: str = "and" if op == opcode.BINARY_AND.value else "or"
+            state.stack[-2:] = [self._assign(f"({self._truth(l)}) {conn} ({self._truth(r)})", "bool")]
+            return
+
+        if op == opcode.BINARY_SUBSCR.value and types == ("Array", "int"):
+            arr, idx = self._operands(state, 2)
+            self._tmps += 1
+            el: str = f"t{self._tmps}"
+
+            conds: List[str] = []
+            self._typeGuard(arr, "Array", conds)
+            self._typeGuard(idx, "int", conds)
+            conds.append(f"({el} := {arr.expr}.getEL({idx.expr})) is None")
+            self._guard(conds, state, trace, index, ip)
+            self._refine([arr, idx], types)
+
+            state.stack[-2:] = [self._assign(f"unbox({el})")]
+            return
+
+        if op == opcode.STORE_SUBSCR.value and types[1:] == ("Array", "int"):
+            v, arr, idx = self._operands(state, 3)
+            conds: List[str] = []
+            self._typeGuard(arr, "Array", conds)
+            self._typeGuard(idx, "int", conds)
+            conds.append(f"{arr.expr}.getEL({idx.expr}) is None")
+            self._guard(conds, state, trace, index, ip)
+            self._refine([arr, idx], types[1:])
+
+            self._emit(f"{arr.expr}.setEL({self._box(v)}, {idx.expr})")
+            state.stack[-3:] = [arr]
+            return
+
+        if op == opcode.CALL_NATIVE.value:
+            name: str = builtinFunctionIndex[arg]
+            argc: int = builtinFunctionInfo[name][1]
+            args: List[_Value] = self._operands(state, argc) if argc > 0 else []
+            boxes: List[str] = [self._box(v) for v in args]
+
+            self.namespace[f"native_{name}"] = builtinFunctionTable[name]
+            if argc > 0:
+                del state.stack[-argc:]
+
+            # errors raised by the builtin report the line of the call
+            self._emit(f"vm._ip = {ip}")
+            state.stack.append(self._assign(f"unbox(native_{name}([{', '.join(boxes)}]))"))
+            return
+
+        self._generic(state, ip, op)
+
+
+    # runs the instruction through its VM handler, on the real operand stack
+    def _generic(self, state: _State, ip: int, op: int) -> None:
+        self._flush(state)
+        self._emit(f"vm._ip = {ip}")
+        self._emit(f"vm.execute_{opcodeDict[op]}({op})")
+
+
+    def _constant(self, idx: int) -> _Value:
+        v: Any = self._codeObj.getConstValue(idx)
+
+        if type(v) is float and not math.isfinite(v):
+            name: str = f"k{idx}"
+            self.namespace[name] = v
+            return _Value(name, "float", v)
+
+        return _Value(f"({v!r})", type(v).__name__, v)
@@ -0,0 +1,20 @@
+#
+# Execution limits for VirtualMachine.run, for running untrusted programs.
+#  Any limit left as None is not enforced.
+#   maxInstructions: number of instructions the program may execute
+#   timeout: wall clock time in seconds the program may run for
+#   maxCallDepth: number of nested function calls
+#  The clock is only read every 'checkInterval' instructions.
+#
+class Limits:
+    def __init__(
+        self,
+        maxInstructions: int = None,
+        timeout: float = None,
+        maxCallDepth: int = None,
+        checkInterval: int = 1024
+    ) -> None:
+        self.maxInstructions: int = maxInstructions
+        self.timeout: float = timeout
+        self.maxCallDepth: int = maxCallDepth
+        self.checkInterval: int = checkInterval
@@ -0,0 +1,133 @@
+from time import perf_counter
+from typing import List, Dict
+
+from ..instruction import opcodeDict
+
+
+#
+# Collects per-opcode and per-function statistics for VirtualMachine.run.
+#  The VM only calls into the profiler from its instrumented dispatch loop,
+#  which is selected when a profiler is passed to run(), so the normal loop
+#  is not slowed down.
+#  Function times are sums of the time spent executing their instructions.
+#  Exclusive time counts only the function's own instructions, inclusive time
+#  adds the inclusive time of every function it calls.
+#
+class Profiler:
+    def __init__(self, fnNames: List[str] = None) -> None:
+        # function names indexed by their position in the function pool,
+        #  as resolved by the Assembler
+        self._fnNames: List[str] = fnNames if fnNames != None else ["main"]
+
+        # <opcode> : [<count>, <time>]
+        self._opStats: Dict[int, List] = dict()
+
+        # <function name> : [<calls>, <inclusive time>, <exclusive time>]
+        self._fnStats: Dict[str, List] = dict()
+
+        # [<function name>, <own time>, <time of callees>] per active call
+        self._fnStack: List[List] = []
+        self._activeCalls: Dict[str, int] = dict()
+
+        self._startTime: float = 0
+        self.totalTime: float = 0
+
+
+    def _getFnName(self, idx: int) -> str:
+        if idx < len(self._fnNames):
+            return self._fnNames[idx]
+        return f"<function {idx}>"
+
+
+    def start(self) -> None:
+        self._startTime = perf_counter()
+        self.enterFunction(0)
+
+
+    def stop(self) -> None:
+        while len(self._fnStack) > 0:
+            self._popFunction()
+        self.totalTime = perf_counter() - self._startTime
+
+
+    def addOp(self, op: int, t: float) -> None:
+        s: List = self._opStats.get(op)
+        if s == None:
+            s = [0, 0.0]
+            self._opStats[op] = s
+
+        s[0] += 1
+        s[1] += t
+        self._fnStack[-1][1] += t
+
+
+    def enterFunction(self, idx: int) -> None:
+        name: str = self._getFnName(idx)
+
+        s: List = self._fnStats.get(name)
+        if s == None:
+            s = [0, 0.0, 0.0]
+            self._fnStats[name] = s
+        s[0] += 1
+
+        self._fnStack.append([name, 0.0, 0.0])
+        self._activeCalls[name] = self._activeCalls.get(name, 0) + 1
+
+
+    def exitFunction(self) -> None:
+        # the VM ignores a return outside a function, main stays on the stack
+        if len(self._fnStack) > 1:
+            self._popFunction()
+
+
+    def _popFunction(self) -> None:
+        name, own, callees = self._fnStack.pop()
+        inclusive: float = own + callees
+
+        self._activeCalls[name] -= 1
+        s: List = self._fnStats[name]
+        s[2] += own
+
+        # only the outermost call of a recursive function counts towards its
+        #  inclusive time, the inner calls are already part of it
+        if self._activeCalls[name] == 0:
+            s[1] += inclusive
+
+        if len(self._fnStack) > 0:
+            self._fnStack[-1][2] += inclusive
+
+
+    def getStats(self) -> dict:
+        return {
+            "total_time": self.totalTime,
+            "opcodes": {
+                opcodeDict[op]: {"count": s[0], "time": s[1]}
+                for op, s in self._opStats.items()
+            },
+            "functions": {
+                name: {"calls": s[0], "inclusive_time": s[1], "exclusive_time": s[2]}
+                for name, s in self._fnStats.items()
+            }
+        }
+
+
+    def writeJSON(self, path: str) -> None:
+        # the VM imports this module, json is only needed here
+        import json
+
+        with open(path, "w") as f:
+            json.dump(self.getStats(), f, indent=4)
+
+
+    def getReport(self) -> str:
+        output: str = f"Total time: {self.totalTime:.6f} seconds\n\n"
+
+        output += f"{'Opcode':<20}{'Count':>12}{'Time (s)':>14}{'Per op (us)':>14}\n"
+        for op, s in sorted(self._opStats.items(), key=lambda e: e[1][1], reverse=True):
+            output += f"{opcodeDict[op]:<20}{s[0]:>12}{s[1]:>14.6f}{s[1]/s[0]*1e6:>14.3f}\n"
+
+        output += f"\n{'Function':<20}{'Calls':>12}{'Incl (s)':>14}{'Excl (s)':>14}\n"
+        for name, s in sorted(self._fnStats.items(), key=lambda e: e[1][2], reverse=True):
+            output += f"{name:<20}{s[0]:>12}{s[1]:>14.6f}{s[2]:>14.6f}\n"
+
+        return output
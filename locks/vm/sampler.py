@@ -0,0 +1,87 @@
+import threading
+from typing import List, Dict
+
+from .vm import VirtualMachine
+
+
+#
+# Statistical profiler for the VM.
+#  A background thread wakes up every 'interval' seconds and records the call
+#  stack of the VM, with the source line each function is at. Unlike the
+#  Profiler in profiler.py, the dispatch loop is not instrumented, so the
+#  overhead is only that of taking the samples.
+#  Samples are written in the collapsed stack format read by flamegraph tools:
+#  one line per distinct stack, frames separated by ';', followed by the
+#  number of samples, e.g. 'main:10;fib:7;fib:7 42'
+#
+class SamplingProfiler:
+    def __init__(self, vm: VirtualMachine, fnNames: List[str] = None, interval: float = 0.005) -> None:
+        self._vm: VirtualMachine = vm
+        self._fnNames: List[str] = fnNames if fnNames != None else ["main"]
+        self._interval: float = interval
+
+        # <collapsed stack> : <number of samples>
+        self._stacks: Dict[str, int] = dict()
+        self.sampleCount: int = 0
+
+        self._thread: threading.Thread = None
+        self._stopEvent: threading.Event = threading.Event()
+
+
+    def _getFnName(self, idx: int) -> str:
+        if idx < len(self._fnNames):
+            return self._fnNames[idx]
+        return f"<function {idx}>"
+
+
+    def start(self) -> None:
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._sampleLoop, daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stopEvent.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
+
+
+    def _sampleLoop(self) -> None:
+        while not self._stopEvent.wait(self._interval):
+            self.sample()
+
+
+    def sample(self) -> None:
+        # the VM keeps running while the stack is read, an inconsistent
+        #  sample taken in the middle of a call or return is dropped
+        try:
+            trace = self._vm.getStackTrace()
+        except Exception:
+            return
+
+        if len(trace) == 0:
+            return
+
+        frames: List[str] = []
+        for idx, line in trace:
+            if line == None:
+                frames.append(self._getFnName(idx))
+            else:
+                frames.append(f"{self._getFnName(idx)}:{line}")
+
+        stack: str = ';'.join(frames)
+        self._stacks[stack] = self._stacks.get(stack, 0) + 1
+        self.sampleCount += 1
+
+
+    def getCollapsed(self) -> str:
+        output: str = ""
+        for stack, count in sorted(self._stacks.items()):
+            output += f"{stack} {count}\n"
+        return output
+
+
+    def writeCollapsed(self, path: str) -> None:
+        with open(path, "w") as f:
+            f.write(self.getCollapsed())
@@ -1,42 +1,53 @@
-from typing import List
+from typing import List, Any
 from .stack import Stack
-from ...types import LObject, Nil
 
 class Frame:
-    def __init__(self, n: str = None):
+    # 'nlocals' is the number of local variables of the function, as counted
+    #  by the Assembler
+    def __init__(self, n: str = None, nlocals: int = 0):
         self.name = n
         self._operand_stack = Stack()
-        self._local_vars: List[LObject] = [Nil()]*256
+        # values are unboxed, see locks/vm/values.py, so None is nil
+        self._local_vars: List[Any] = [None]*nlocals
         self._code: List[int] = []
         self._ret_address: int = 0
 
     
-    def pushOpStack(self, e: LObject) -> None:
+    def pushOpStack(self, e: Any) -> None:
         self._operand_stack.push(e)
 
-    def popOpStack(self) -> LObject:
+    def popOpStack(self) -> Any:
         return self._operand_stack.pop()
 
+    def peekOpStack(self, depth: int = 0) -> Any:
+        return self._operand_stack.peek(depth)
+
     def setReturnAddress(self, a: int):
         self._ret_address = a
 
     def getReturnAddress(self):
         return self._ret_address 
 
-    def getLocalVarAtIndex(self, i: int) -> LObject:
+    def getLocalVarAtIndex(self, i: int) -> Any:
         return self._local_vars[i]
 
-    def setLocalVarAtIndex(self, i: int, e: LObject):
+    def setLocalVarAtIndex(self, i: int, e: Any):
         self._local_vars[i] = e
 
+    def getLocalVars(self) -> List[Any]:
+        return self._local_vars
+
     def setCode(self, c: List[int]) -> None:
         self._code = c
+
+    def getCode(self) -> List[int]:
+        return self._code
     
     def getInsAtIndex(self, i: int) -> int:
         return self._code[i]
 
-    def reset(self):
-        self.__init__()
+    def reset(self, nlocals: int = 0):
+        self.__init__(None, nlocals)
 
     # f = frame to copy
     def copy(self, f):
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List
 
 class Stack:
     def __init__(self):
@@ -10,7 +10,15 @@ class Stack:
     def pop(self) -> Any:
         return self._list.pop()
 
-    def peek(self) -> Any:
-        if len(self._list) == 0:
+    def size(self) -> int:
+        return len(self._list)
+
+    # 'depth' is the number of items above the one returned
+    def peek(self, depth: int = 0) -> Any:
+        if len(self._list) <= depth:
             return None
-        return self._list[-1]
\ No newline at end of file
+        return self._list[-1 - depth]
+
+    # copy of the items, bottom of the stack first
+    def getList(self) -> List[Any]:
+        return list(self._list)
@@ -0,0 +1,85 @@
+from typing import Any
+
+from ..types import LObject, Number, Nil, Array, Boolean, String
+
+
+#
+# Values on the operand stack and in the variables of the VM are plain
+#  Python values for the types that have one:
+#    Number -> int or float, String -> str, Boolean -> bool, Nil -> None
+#  Arrays and other objects stay LObjects. Builtin functions and the
+#  elements of arrays work on LObjects, so a value is boxed when it is passed
+#  to a builtin or stored in an array, and unboxed when it comes back.
+#
+
+def box(v: Any) -> LObject:
+    t = type(v)
+    if t is int or t is float:
+        return Number(v)
+    if t is str:
+        return String(v)
+    if t is bool:
+        return Boolean("true" if v else "false")
+    if v is None:
+        return Nil()
+    return v
+
+
+def unbox(obj: LObject) -> Any:
+    t = type(obj)
+    if t is Number or t is String:
+        return obj.value
+    if t is Boolean:
+        return obj.value == "true"
+    if t is Nil:
+        return None
+    return obj
+
+
+def isNumber(v: Any) -> bool:
+    return type(v) is int or type(v) is float
+
+
+# name of the type of a value in the language, for error messages
+def typeName(v: Any) -> str:
+    t = type(v)
+    if t is int or t is float:
+        return "Number"
+    if t is str:
+        return "String"
+    if t is bool:
+        return "Boolean"
+    if v is None:
+        return "Nil"
+    return t.__name__
+
+
+def isTruthy(v: Any) -> bool:
+    # Python truthiness is the same for the plain values, and other objects
+    #  are always truthy
+    if type(v) is Array:
+        return v.getLen() != 0
+    return bool(v)
+
+
+#
+# '==' and '!=' compare the values the LObjects hold, so true equals "true"
+#  and nil equals "nil". Arrays hold no such value, and fail the same way
+#  they did when they were compared as LObjects. Also the keys of the jump
+#  tables of SWITCH
+#
+def comparedValue(v: Any) -> Any:
+    t = type(v)
+    if t is bool:
+        return "true" if v else "false"
+    if v is None:
+        return "nil"
+    if t is int or t is float or t is str:
+        return v
+    return v.value
+
+
+def equals(l: Any, r: Any) -> bool:
+    if type(l) is type(r) and (type(l) is int or type(l) is str):
+        return l == r
+    return comparedValue(l) == comparedValue(r)
@@ -1,19 +1,41 @@
-from typing import List
+from typing import List, Dict, Tuple, Union, Any
+from time import perf_counter
 
 from .code.codeBuilder import CodeBuilder
-from .code.code import Code, func_info, cp_info, Tag
-from ..instruction import opcode, opcodeDict
+from .code.code import Code, func_info
+from ..instruction import opcode, opcodeDict, opcodeSizeDict
 from .stack.frame import Frame
 from .stack.stack import Stack
+from .profiler import Profiler
+from .limits import Limits
+from .jit import TraceTree, Trace, HOT_LOOP, MAX_TRACE_LENGTH, UNTRACEABLE, stackOperands, getGenericOpcode
+from .values import box, unbox, isNumber, typeName, isTruthy, equals, comparedValue
 
-from ..types import LObject, Number, Nil, Array, Boolean, String
+from ..types import LObject, Array
 from ..stdlib import builtinFunctionIndex, builtinFunctionTable, builtinFunctionInfo
-from ..error import TypeErr, ZeroDivErr, IndexErr, SyntaxErr
+from ..error import Error, TypeErr, ZeroDivErr, IndexErr, SyntaxErr, LimitExceeded
+from ..output import OutputBuffer, stdout
+
+
+# number of times a quickened instruction can be deoptimized before it stays
+#  generic, see VirtualMachine._quicken
+MAX_DEOPTS: int = 4
 
 
 class VirtualMachine:
-    def __init__(self, code: List[int]) -> None:
-        self._code_obj: Code = CodeBuilder(code).getCodeObj()
+    # 'code' is either bytecode, or a Code object that was already built from
+    #  bytecode. A Code object is never modified while running, so it can be
+    #  shared by any number of VMs. 'quickening' enables rewriting
+    #  instructions into specialized forms, see _quicken, and 'jit' compiling
+    #  hot loops to Python, see _backEdge
+    def __init__(self, code: Union[List[int], Code], quickening: bool = True, jit: bool = True) -> None:
+        if type(code).__name__ == "Code":
+            self._code_obj: Code = code
+        else:
+            self._code_obj: Code = CodeBuilder(code).getCodeObj()
+
+        # values of the constants, LOAD_CONST pushes these
+        self._const_values: List[Any] = self._code_obj.const_values
 
         self._cur_frame: Frame = Frame()
         self._main_frame: Frame = Frame("main")
@@ -24,6 +46,42 @@ class VirtualMachine:
 
         self._LOG: bool = False
 
+        # <id of function code> : <function index>, see _getFnIndex
+        self._fn_index: Dict[int, int] = None
+
+        # code of each function that this VM runs. Quickening rewrites it,
+        #  so it is a copy of the code in the Code object
+        self._quickening: bool = quickening
+        self._fn_code: List[List[int]] = None
+
+        # (<id of function code>, <offset>) : <times deoptimized>
+        self._deopts: Dict[Tuple[int, int], int] = dict()
+
+        # traces are not run by the profiled loop, which has to see every
+        #  instruction
+        self._jit: bool = jit
+        self._jitting: bool = False
+
+        # state of _runLimited that traces share, see _runCountedTrace
+        self._limits: Limits = None
+        self._limitStart: float = 0
+        self._count: int = 0
+        self._nextCheck: int = 0
+        self._traceCount: int = 0
+
+        # (<id of function code>, <offset of loop header>) : <times jumped to>
+        self._loop_counts: Dict[Tuple[int, int], int] = dict()
+
+        # (<id of function code>, <offset of loop header>) : <compiled loop>
+        self._traces: Dict[Tuple[int, int], TraceTree] = dict()
+
+        # (<id of function code>, <offset of jump table>) :
+        #  (<key> : <jump target>, <target if no key matches>)
+        self._switches: Dict[Tuple[int, int], Tuple[Dict[Any, int], int]] = dict()
+
+        # output buffer of print and println, defined in locks/output.py
+        self._stdout: OutputBuffer = stdout
+
 
     def _advance(self, advance_by=1) -> int:
         self._ip += advance_by
@@ -45,55 +103,223 @@ class VirtualMachine:
 
 
     def _init_vm(self) -> None:
+        self._fn_code = [
+            list(f.code) if self._quickening else f.code
+            for f in self._code_obj.func_pool
+        ]
+        self._fn_index = None
+        self._deopts = dict()
+        self._loop_counts = dict()
+        self._traces = dict()
+        self._switches = dict()
+
         main: func_info = self._code_obj.getFromFP(0)
-        self._main_frame.setCode(main.code)
-        self._cur_frame = self._main_frame
+        self._main_frame.reset(main.nlocals)
+        self._main_frame.name = "main"
+        self._main_frame.setCode(self._fn_code[0])
+
+        # the current frame shares the locals of the main frame while main is
+        #  running. The main frame object itself is never reset by calls, so
+        #  it always holds the globals
+        self._cur_frame.copy(self._main_frame)
         self._advance()
 
 
-    def run(self):
+    def run(self, profiler: Profiler = None, limits: Limits = None):
         self._init_vm()
+        self._jitting = self._jit and profiler == None
+        self._limits = limits
+
+        # flush buffered output even if the program raises an error
+        try:
+            if profiler != None:
+                self._runProfiled(profiler, limits)
+                return
+
+            if limits != None:
+                self._runLimited(limits)
+                return
+
+            while self._cur_ins != opcode.END.value:
+                i = self._cur_ins
+                self.execute(i)
+                if i not in [
+                    opcode.GOTO.value,
+                    opcode.POP_JMP_IF_TRUE.value,
+                    opcode.POP_JMP_IF_FALSE.value,
+                    opcode.FOR_RANGE.value,
+                    opcode.SWITCH.value,
+                ]:
+                    self._advance()
+        except Error as e:
+            # errors raised by instructions don't know their source line
+            if e.line == None:
+                e.line = self.getCurrentLine()
+            raise
+        finally:
+            self._stdout.flush()
+
+
+    #
+    # Source line of the instruction being executed, looked up in the line
+    #  table of the current function. Only used when reporting errors and by
+    #  profilers, so the dispatch loop doesn't keep track of lines.
+    #
+    def getCurrentLine(self) -> int:
+        idx: int = self._getFnIndex(self._cur_frame.getCode())
+        if idx == None:
+            return None
+        return self._code_obj.getFromFP(idx).getLine(self._ip)
+
+
+    #
+    # Returns (<function index>, <source line>) for every active call,
+    #  outermost first. Used by the sampling profiler, which calls it from
+    #  another thread, so it only reads the state of the VM.
+    #
+    def getStackTrace(self) -> List[Tuple[int, int]]:
+        trace: List[Tuple[int, int]] = []
+        frames: List[Frame] = self._call_stack.getList() + [self._cur_frame]
+        ips: List[int] = [f.getReturnAddress() for f in frames[:-1]] + [self._ip]
+
+        for f, ip in zip(frames, ips):
+            idx: int = self._getFnIndex(f.getCode())
+            if idx == None:
+                continue
+            trace.append((idx, self._code_obj.getFromFP(idx).getLine(ip)))
+
+        return trace
+
+
+    # index of a function in the function pool, from its code
+    def _getFnIndex(self, code: List[int]) -> int:
+        if self._fn_index == None:
+            self._fn_index = {
+                id(c): i for i, c in enumerate(self._fn_code)
+            }
+        return self._fn_index.get(id(code))
+
+
+    #
+    # Same as the dispatch loop in run, but enforces execution limits
+    #  (locks/vm/limits.py). Instructions are counted with a single add, the
+    #  clock and the instruction budget are checked every
+    #  limits.checkInterval instructions, and the call depth on every call.
+    #  Traces count the instructions they run and check the limits between
+    #  iterations, see _runCountedTrace.
+    #
+    def _runLimited(self, limits: Limits) -> None:
+        start: float = perf_counter()
+        count: int = 0
+        nextCheck: int = self._getNextLimitCheck(limits, count)
+        self._limitStart = start
 
         while self._cur_ins != opcode.END.value:
             i = self._cur_ins
+
+            count += 1
+            if count >= nextCheck:
+                self._checkLimits(limits, count, start)
+                nextCheck = self._getNextLimitCheck(limits, count)
+
+            if i == opcode.CALL_FUNCTION.value or (
+                i == opcode.EXTENDED_ARG.value and self._getPrefixedOpcode() == opcode.CALL_FUNCTION.value
+            ):
+                self._checkCallDepth(limits, count, start)
+
+            # a backward jump can run a trace
+            if i == opcode.GOTO.value:
+                self._count, self._nextCheck = count, nextCheck
+                self.execute(i)
+                count, nextCheck = self._count, self._nextCheck
+                continue
+
             self.execute(i)
             if i not in [
                 opcode.GOTO.value,
                 opcode.POP_JMP_IF_TRUE.value,
                 opcode.POP_JMP_IF_FALSE.value,
+                opcode.FOR_RANGE.value,
+                opcode.SWITCH.value,
             ]:
                 self._advance()
 
 
-    def _getObjType(self, el: LObject) -> str:
-        return type(el).__name__
+    def _getNextLimitCheck(self, limits: Limits, count: int) -> int:
+        n: int = count + limits.checkInterval
+        if limits.maxInstructions != None:
+            n = min(n, limits.maxInstructions + 1)
+        return n
+
 
+    # 'count' includes the instruction that is about to be executed
+    def _checkLimits(self, limits: Limits, count: int, start: float) -> None:
+        elapsed: float = perf_counter() - start
 
-    def _isTruthy(self, obj: LObject) -> bool:
-        if self._getObjType(obj) == "Number":
-            if obj.value == 0:
-                return False
-            return True
+        if limits.maxInstructions != None and count > limits.maxInstructions:
+            raise LimitExceeded(
+                f"Instruction limit of {limits.maxInstructions} exceeded",
+                count - 1, elapsed, self._call_stack.size()
+            )
 
-        elif self._getObjType(obj) == "String":
-            if len(obj.value) == 0:
-                return False
-            return True
+        if limits.timeout != None and elapsed > limits.timeout:
+            raise LimitExceeded(
+                f"Time limit of {limits.timeout} seconds exceeded",
+                count - 1, elapsed, self._call_stack.size()
+            )
 
-        elif self._getObjType(obj) == "Nil":
-            return False
 
-        elif self._getObjType(obj) == "Boolean":
-            if obj.value == "false":
-                return False
-            return True
+    def _checkCallDepth(self, limits: Limits, count: int, start: float) -> None:
+        if limits.maxCallDepth != None and self._call_stack.size() >= limits.maxCallDepth:
+            raise LimitExceeded(
+                f"Call depth limit of {limits.maxCallDepth} exceeded",
+                count - 1, perf_counter() - start, self._call_stack.size()
+            )
 
-        elif self._getObjType(obj) == "Array":
-            if obj.getLen() == 0:
-                return False
-            return True
 
-        return True
+    #
+    # Same as the dispatch loop in run, but times every instruction and
+    #  reports calls and returns to the profiler (locks/vm/profiler.py).
+    #  Limits are checked on every instruction.
+    #
+    def _runProfiled(self, profiler: Profiler, limits: Limits = None) -> None:
+        profiler.start()
+        start: float = perf_counter()
+        count: int = 0
+
+        try:
+            while self._cur_ins != opcode.END.value:
+                i = self._cur_ins
+
+                if limits != None:
+                    count += 1
+                    self._checkLimits(limits, count, start)
+                    if i == opcode.CALL_FUNCTION.value or (
+                        i == opcode.EXTENDED_ARG.value and self._getPrefixedOpcode() == opcode.CALL_FUNCTION.value
+                    ):
+                        self._checkCallDepth(limits, count, start)
+
+                # calls and returns are noticed by the change in call depth
+                depth: int = self._call_stack.size()
+
+                t0: float = perf_counter()
+                self.execute(i)
+                if i not in [
+                    opcode.GOTO.value,
+                    opcode.POP_JMP_IF_TRUE.value,
+                    opcode.POP_JMP_IF_FALSE.value,
+                    opcode.FOR_RANGE.value,
+                    opcode.SWITCH.value,
+                ]:
+                    self._advance()
+                profiler.addOp(i, perf_counter() - t0)
+
+                if self._call_stack.size() > depth:
+                    profiler.enterFunction(self._getFnIndex(self._cur_frame.getCode()))
+                elif self._call_stack.size() < depth:
+                    profiler.exitFunction()
+        finally:
+            profiler.stop()
 
 
     def execute(self, i: int) -> None:
@@ -105,158 +331,321 @@ class VirtualMachine:
         raise Exception(f"execute_{opcodeDict[i]} method not implemented.")
 
 
+    #
+    # Quickening
+    #  A generic instruction whose operands have types that one of its
+    #  specialized forms (BINARY_ADD_NUM, CMPLT_NUM, ...) handles rewrites
+    #  itself into that form in the running code, so later executions skip
+    #  the type dispatch. A specialized form checks the types of its operands
+    #  with a cheap guard. If they don't match, it deoptimizes: puts the
+    #  operands back, rewrites the instruction back into its generic form
+    #  and runs that. An instruction deoptimized MAX_DEOPTS times stays
+    #  generic. Only instructions without operand bytes are specialized, so
+    #  offsets in the code never change.
+    #
+    def _quicken(self, op: int) -> None:
+        if not self._quickening:
+            return
+
+        code: List[int] = self._cur_frame.getCode()
+        if self._deopts.get((id(code), self._ip), 0) < MAX_DEOPTS:
+            code[self._ip] = op
+
+
+    def _deoptimize(self, generic: int, *operands: Any) -> None:
+        code: List[int] = self._cur_frame.getCode()
+        key: Tuple[int, int] = (id(code), self._ip)
+        self._deopts[key] = self._deopts.get(key, 0) + 1
+        code[self._ip] = generic
+
+        for o in operands:
+            self._cur_frame.pushOpStack(o)
+        self.execute(generic)
+
+
+    #
+    # Tracing JIT
+    #  Every backward GOTO closes a loop, and counts the times its target,
+    #  the loop header, is jumped to. When a loop gets hot, the interpreter
+    #  records the instructions of the next iteration with the types of
+    #  their operands (a trace), and locks/vm/jit.py compiles the trace to a
+    #  Python function specialized for those types. The backward jump then
+    #  runs the function instead, until one of its guards fails. The
+    #  interpreter resumes where the guard failed, so a trace never changes
+    #  what a program does. An exit that is taken often gets a trace of its
+    #  own (a side trace), compiled into the same function. Traces stop at
+    #  function calls and returns, loops that contain them are not compiled.
+    #
+    def _backEdge(self, header: int) -> None:
+        code: List[int] = self._cur_frame.getCode()
+        key: Tuple[int, int] = (id(code), header)
+
+        tree: TraceTree = self._traces.get(key)
+        if tree != None:
+            self._runTrace(tree)
+            return
+
+        n: int = self._loop_counts.get(key, 0) + 1
+        self._loop_counts[key] = n
+        self._goto(header)
+
+        # a loop that can't be traced is never tried again
+        if n == HOT_LOOP:
+            entries: List[tuple] = self._recordTrace(header)
+            if entries != None:
+                tree = TraceTree(header, Trace(entries))
+                self._compileTrace(tree)
+                self._traces[key] = tree
+
+
+    def _compileTrace(self, tree: TraceTree) -> None:
+        isMain: bool = self._cur_frame.getCode() is self._fn_code[0]
+        tree.compile(isMain, self._code_obj, self._limits != None)
+
+
+    def _runTrace(self, tree: TraceTree) -> None:
+        if tree.counted:
+            k: int = self._runCountedTrace(tree)
+        else:
+            k: int = tree.fn(
+                self,
+                self._cur_frame,
+                self._cur_frame.getLocalVars(),
+                self._main_frame.getLocalVars()
+            )
+
+        trace, index, ip = tree.exits[k]
+        self._goto(ip)
+
+        if tree.takeExit(k):
+            entries: List[tuple] = self._recordTrace(tree.header)
+            if entries != None:
+                tree.addSideTrace(k, Trace(entries))
+                self._compileTrace(tree)
+
+
+    #
+    # Runs a trace compiled with 'counted' set (locks/vm/jit.py) under the
+    #  limits of _runLimited. The trace may run the instructions left until
+    #  the next limit check, so it can go past the instruction limit by less
+    #  than one iteration of the loop. When it returns at the loop header,
+    #  the limits are checked and it runs again.
+    #
+    def _runCountedTrace(self, tree: TraceTree) -> int:
+        while True:
+            k: int = tree.fn(
+                self,
+                self._cur_frame,
+                self._cur_frame.getLocalVars(),
+                self._main_frame.getLocalVars(),
+                self._nextCheck - self._count - 1
+            )
+            self._count += self._traceCount
+            if k != -1:
+                return k
+
+            # 'count' includes the first instruction of the next iteration
+            self._checkLimits(self._limits, self._count + 1, self._limitStart)
+            self._nextCheck = self._getNextLimitCheck(self._limits, self._count)
+
+
+    #
+    # Runs instructions from the current one until the backward jump to
+    #  'header', and returns them as trace entries (see locks/vm/jit.py).
+    #  Returns None, with the instruction that can't be traced not run yet,
+    #  if another loop is closed, an instruction in UNTRACEABLE comes up or
+    #  the trace gets longer than MAX_TRACE_LENGTH. The instructions run are
+    #  counted for _runLimited.
+    #
+    def _recordTrace(self, header: int) -> List[tuple]:
+        code: List[int] = self._cur_frame.getCode()
+        entries: List[tuple] = []
+
+        while len(entries) < MAX_TRACE_LENGTH:
+            ip: int = self._ip
+            i: int = self._cur_ins
+            if i in UNTRACEABLE:
+                return None
+
+            arg: int = 0
+            for b in code[ip + 1 : ip + opcodeSizeDict[opcodeDict[i]]]:
+                arg = (arg << 8) + b
+
+            if i == opcode.GOTO.value:
+                if arg < ip and arg != header:
+                    return None
+                self._goto(arg)
+                entries.append((ip, i, arg, (), arg))
+                self._count += 1
+                if arg == header:
+                    return entries
+                continue
+
+            i = getGenericOpcode(i)
+            types: Tuple[str, ...] = tuple(
+                type(self._cur_frame.peekOpStack(d)).__name__
+                for d in reversed(range(stackOperands.get(i, 0)))
+            )
+
+            # the operand of an increment is its variable
+            if i == opcode.INC_LOCAL.value:
+                types = (type(self._cur_frame.getLocalVarAtIndex(arg)).__name__,)
+            elif i == opcode.INC_GLOBAL.value:
+                types = (type(self._main_frame.getLocalVarAtIndex(arg)).__name__,)
+
+            self.execute(i)
+            if i not in [
+                opcode.POP_JMP_IF_TRUE.value,
+                opcode.POP_JMP_IF_FALSE.value,
+                opcode.FOR_RANGE.value,
+                opcode.SWITCH.value,
+            ]:
+                self._advance()
+            entries.append((ip, i, arg, types, self._ip))
+            self._count += 1
+
+        return None
+
+
+    #
+    # Values are unboxed, see locks/vm/values.py. Type checks compare types
+    #  directly, since the operand types of arithmetic and comparisons are
+    #  checked on every execution.
+    #
     def execute_LOAD_NIL(self, i: int) -> None:
-        self._cur_frame.pushOpStack(Nil())
+        self._cur_frame.pushOpStack(None)
 
 
     def execute_LOAD_TRUE(self, i: int) -> None:
-        self._cur_frame.pushOpStack(Boolean("true"))
+        self._cur_frame.pushOpStack(True)
 
 
     def execute_LOAD_FALSE(self, i: int) -> None:
-        self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(False)
 
 
     def execute_LOAD_CONST(self, i: int) -> None:
-        idx: int = (self._advance() << 8) + self._advance()
-        constObj: cp_info = self._code_obj.getFromCP(idx)
+        self.wide_LOAD_CONST(i, (self._advance() << 8) + self._advance())
+
 
-        if constObj.tag == Tag.CONSTANT_String:
-            self._cur_frame.pushOpStack(String(constObj.info))
-            
-        elif constObj.tag == Tag.CONSTANT_Integer:
-            self._cur_frame.pushOpStack(Number(constObj.info))
-            
-        elif constObj.tag == Tag.CONSTANT_Double:
-            self._cur_frame.pushOpStack(Number(constObj.info))
+    def wide_LOAD_CONST(self, i: int, idx: int) -> None:
+        self._cur_frame.pushOpStack(self._const_values[idx])
 
 
     def execute_BINARY_ADD(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
         # string concat for '+'
-        if self._getObjType(l) == "String":
-            if self._getObjType(r) != "String":
-                raise TypeErr(f"Cannot add {self._getObjType(r)} to String")
-            self._cur_frame.pushOpStack(String(l.value + r.value))
+        if type(l) is str:
+            if type(r) is not str:
+                raise TypeErr(f"Cannot add {typeName(r)} to String")
+            self._cur_frame.pushOpStack(l + r)
+            self._quicken(opcode.BINARY_ADD_STR.value)
 
         # check type for numbers
-        elif self._getObjType(l) == "Number":
-            if self._getObjType(r) != "Number":
-                raise TypeErr(f"Cannot add {self._getObjType(r)} to Number")
-            self._cur_frame.pushOpStack(Number(l.value + r.value))
+        elif isNumber(l):
+            if not isNumber(r):
+                raise TypeErr(f"Cannot add {typeName(r)} to Number")
+            self._cur_frame.pushOpStack(l + r)
+            self._quicken(opcode.BINARY_ADD_NUM.value)
         
         # addition is not defined for any other type
         else:
-            raise TypeErr(f"Addition not defined for type '{self._getObjType(l)}'")
+            raise TypeErr(f"Addition not defined for type '{typeName(l)}'")
 
 
-        if self._LOG: print(f"add {l.value}, {r.value}")
+        if self._LOG: print(f"add {l}, {r}")
 
     
     def execute_BINARY_SUBTRACT(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Cannot subtract {self._getObjType(r)} from {self._getObjType(l)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Cannot subtract {typeName(r)} from {typeName(l)}")
 
-        self._cur_frame.pushOpStack(Number(l.value - r.value))
+        self._cur_frame.pushOpStack(l - r)
+        self._quicken(opcode.BINARY_SUBTRACT_NUM.value)
 
-        if self._LOG: print(f"sub {l.value}, {r.value}")
+        if self._LOG: print(f"sub {l}, {r}")
 
 
     def execute_BINARY_MULTIPLY(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Cannot multiply {self._getObjType(l)} by {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Cannot multiply {typeName(l)} by {typeName(r)}")
 
-        self._cur_frame.pushOpStack(Number(l.value * r.value))
+        self._cur_frame.pushOpStack(l * r)
+        self._quicken(opcode.BINARY_MULTIPLY_NUM.value)
 
-        if self._LOG: print(f"mul {l.value}, {r.value}")
+        if self._LOG: print(f"mul {l}, {r}")
 
 
     def execute_BINARY_DIVIDE(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Cannot divide {self._getObjType(l)} by {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Cannot divide {typeName(l)} by {typeName(r)}")
 
         # division by zero
-        if r.value == 0:
+        if r == 0:
             raise ZeroDivErr()
 
-        self._cur_frame.pushOpStack(Number(l.value / r.value))
+        self._cur_frame.pushOpStack(l / r)
 
-        if self._LOG: print(f"div {l.value}, {r.value}")
+        if self._LOG: print(f"div {l}, {r}")
 
 
     def execute_BINARY_MODULO(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Invalid operand type for modulo: {self._getObjType(l)} and {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Invalid operand type for modulo: {typeName(l)} and {typeName(r)}")
 
         # division by zero
-        if r.value == 0:
+        if r == 0:
             raise ZeroDivErr()
 
-        self._cur_frame.pushOpStack(Number(l.value % r.value))
+        self._cur_frame.pushOpStack(l % r)
 
-        if self._LOG: print(f"mod {l.value}, {r.value}")
+        if self._LOG: print(f"mod {l}, {r}")
 
 
     def execute_BINARY_AND(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._LOG: print(f"and {l.value}, {r.value}")
-        
-        if not self._isTruthy(l):
-            self._cur_frame.pushOpStack(Boolean("false"))
-            return
-        
-        if not self._isTruthy(r):
-            self._cur_frame.pushOpStack(Boolean("false"))
-            return
-            
-        self._cur_frame.pushOpStack(Boolean("true"))
+        if self._LOG: print(f"and {l}, {r}")
+
+        self._cur_frame.pushOpStack(isTruthy(l) and isTruthy(r))
 
 
     def execute_BINARY_OR(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._isTruthy(l):
-            self._cur_frame.pushOpStack(Boolean("true"))
-        elif self._isTruthy(r):
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(isTruthy(l) or isTruthy(r))
 
-        if self._LOG: print(f"or {l.value}, {r.value}")
+        if self._LOG: print(f"or {l}, {r}")
 
 
     def execute_UNARY_NOT(self, i: int) -> None:
-        op: LObject = self._cur_frame.popOpStack()
-        if self._isTruthy(op):
-            self._cur_frame.pushOpStack(Boolean("false"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("true"))
+        op: Any = self._cur_frame.popOpStack()
+        self._cur_frame.pushOpStack(not isTruthy(op))
 
 
     def execute_UNARY_NEGATIVE(self, i: int) -> None:
-        op: LObject = self._cur_frame.popOpStack()
+        op: Any = self._cur_frame.popOpStack()
         
-        if not self._getObjType(op) == "Number":
-            raise TypeErr(f"Cannot negate {self._getObjType(op)}")
+        if not isNumber(op):
+            raise TypeErr(f"Cannot negate {typeName(op)}")
 
-        self._cur_frame.pushOpStack(Number(-(op.value)))
+        self._cur_frame.pushOpStack(-op)
 
 
     def execute_STORE_LOCAL(self, i: int) -> None:
@@ -266,6 +655,10 @@ class VirtualMachine:
         )
 
 
+    def wide_STORE_LOCAL(self, i: int, idx: int) -> None:
+        self._cur_frame.setLocalVarAtIndex(idx, self._cur_frame.popOpStack())
+
+
     def execute_STORE_GLOBAL(self, i: int) -> None:
         self._main_frame.setLocalVarAtIndex(
             self._advance(),
@@ -273,125 +666,265 @@ class VirtualMachine:
         )
 
 
+    def wide_STORE_GLOBAL(self, i: int, idx: int) -> None:
+        self._main_frame.setLocalVarAtIndex(idx, self._cur_frame.popOpStack())
+
+
     def execute_BIPUSH(self, i: int) -> None:
-        self._cur_frame.pushOpStack(Number(self._advance()))
+        self._cur_frame.pushOpStack(self._advance())
+
+
+    def wide_BIPUSH(self, i: int, n: int) -> None:
+        self._cur_frame.pushOpStack(n)
 
 
     def execute_LOAD_LOCAL(self, i: int) -> None:
         self._cur_frame.pushOpStack(self._cur_frame.getLocalVarAtIndex(self._advance()))
 
 
+    def wide_LOAD_LOCAL(self, i: int, idx: int) -> None:
+        self._cur_frame.pushOpStack(self._cur_frame.getLocalVarAtIndex(idx))
+
+
     def execute_LOAD_GLOBAL(self, i: int) -> None:
         self._cur_frame.pushOpStack(self._main_frame.getLocalVarAtIndex(self._advance()))
 
 
+    def wide_LOAD_GLOBAL(self, i: int, idx: int) -> None:
+        self._cur_frame.pushOpStack(self._main_frame.getLocalVarAtIndex(idx))
+
+
     def execute_CMPEQ(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if l.value == r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(equals(l, r))
 
-        if self._LOG: print(f"cmpeq {l.value}, {r.value}")
+        if self._LOG: print(f"cmpeq {l}, {r}")
 
 
     def execute_CMPNE(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if l.value != r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(not equals(l, r))
 
-        if self._LOG: print(f"cmpne {l.value}, {r.value}")
+        if self._LOG: print(f"cmpne {l}, {r}")
 
 
     def execute_CMPGT(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Invalid operand type for greater than operator: {self._getObjType(l)} and {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Invalid operand type for greater than operator: {typeName(l)} and {typeName(r)}")
+        self._quicken(opcode.CMPGT_NUM.value)
 
-        if l.value > r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(l > r)
 
-        if self._LOG: print(f"cmpgt {l.value}, {r.value}")
+        if self._LOG: print(f"cmpgt {l}, {r}")
 
 
     def execute_CMPLT(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Invalid operand type for less than operator: {self._getObjType(l)} and {self._getObjType(r)}")
-        
-        if l.value < r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Invalid operand type for less than operator: {typeName(l)} and {typeName(r)}")
+        self._quicken(opcode.CMPLT_NUM.value)
+
+        self._cur_frame.pushOpStack(l < r)
 
-        if self._LOG: print(f"cmplt {l.value}, {r.value}")
+        if self._LOG: print(f"cmplt {l}, {r}")
 
 
     def execute_CMPGE(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Invalid operand type for greater than equals operator: {self._getObjType(l)} and {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Invalid operand type for greater than equals operator: {typeName(l)} and {typeName(r)}")
+        self._quicken(opcode.CMPGE_NUM.value)
 
-        if l.value >= r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(l >= r)
 
-        if self._LOG: print(f"cmpge {l.value}, {r.value}")
+        if self._LOG: print(f"cmpge {l}, {r}")
 
 
     def execute_CMPLE(self, i: int) -> None:
-        r: LObject = self._cur_frame.popOpStack()
-        l: LObject = self._cur_frame.popOpStack()
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
 
-        if self._getObjType(l) != "Number" or self._getObjType(r) != "Number":
-            raise TypeErr(f"Invalid operand type for less than equals operator: {self._getObjType(l)} and {self._getObjType(r)}")
+        if not isNumber(l) or not isNumber(r):
+            raise TypeErr(f"Invalid operand type for less than equals operator: {typeName(l)} and {typeName(r)}")
+        self._quicken(opcode.CMPLE_NUM.value)
 
-        if l.value <= r.value:
-            self._cur_frame.pushOpStack(Boolean("true"))
-        else:
-            self._cur_frame.pushOpStack(Boolean("false"))
+        self._cur_frame.pushOpStack(l <= r)
 
-        if self._LOG: print(f"cmple {l.value}, {r.value}")
+        if self._LOG: print(f"cmple {l}, {r}")
 
 
     def execute_GOTO(self, i: int) -> None:
         loc: int = (self._advance() << 8) + self._advance()
-        self._goto(loc)
+        if self._jitting and loc < self._ip:
+            self._backEdge(loc)
+        else:
+            self._goto(loc)
+
+
+    # the dispatch loop advances after EXTENDED_ARG, so wide jumps stop one
+    #  byte before their target. Loops this far into a function are not
+    #  traced
+    def wide_GOTO(self, i: int, loc: int) -> None:
+        self._ip = loc - 1
 
 
     def execute_POP_JMP_IF_TRUE(self, i: int) -> None:
         idx: int = (self._advance() << 8) + self._advance()
-        if self._isTruthy(self._cur_frame.popOpStack()):
+        if isTruthy(self._cur_frame.popOpStack()):
             self._goto(idx)
         else:
             self._advance() # consume second arg
 
 
+    def wide_POP_JMP_IF_TRUE(self, i: int, idx: int) -> None:
+        if isTruthy(self._cur_frame.popOpStack()):
+            self._ip = idx - 1
+
+
     def execute_POP_JMP_IF_FALSE(self, i: int) -> None:
         idx: int = (self._advance() << 8) + self._advance()
-        if not self._isTruthy(self._cur_frame.popOpStack()):
+        if not isTruthy(self._cur_frame.popOpStack()):
             self._goto(idx)
         else:
             self._advance() # consume second arg
 
 
+    def wide_POP_JMP_IF_FALSE(self, i: int, idx: int) -> None:
+        if not isTruthy(self._cur_frame.popOpStack()):
+            self._ip = idx - 1
+
+
+    #
+    # Jumps to the target of the CASE that holds the popped value, see
+    #  Compiler._switch. The CASE and GOTO pairs that follow are decoded
+    #  into a dict the first time the SWITCH runs, so later runs take a
+    #  single lookup.
+    #
+    def execute_SWITCH(self, i: int) -> None:
+        n: int = (self._advance() << 8) + self._advance()
+        self._goto(self._getSwitchTarget(self._ip + 1, n, self._cur_frame.popOpStack()))
+
+
+    def wide_SWITCH(self, i: int, n: int) -> None:
+        self._ip = self._getSwitchTarget(self._ip + 1, n, self._cur_frame.popOpStack()) - 1
+
+
+    # 'start' is the offset of the first CASE
+    def _getSwitchTarget(self, start: int, n: int, v: Any) -> int:
+        table, default = self._getSwitch(start, n)
+        return table.get(comparedValue(v), default)
+
+
+    # jump table of the SWITCH in the current code whose pairs start at
+    #  'start', and the offset after them
+    def _getSwitch(self, start: int, n: int) -> Tuple[Dict[Any, int], int]:
+        code: List[int] = self._cur_frame.getCode()
+        key: Tuple[int, int] = (id(code), start)
+
+        switch: Tuple[Dict[Any, int], int] = self._switches.get(key)
+        if switch == None:
+            switch = self._makeSwitch(code, start, n)
+            self._switches[key] = switch
+        return switch
+
+
+    def _makeSwitch(self, code: List[int], start: int, n: int) -> Tuple[Dict[Any, int], int]:
+        table: Dict[Any, int] = dict()
+        pos: int = start
+
+        for _ in range(n):
+            idx, pos = self._readOperand(code, pos)
+            target, pos = self._readOperand(code, pos)
+
+            # the first of equal keys wins, like in an elsif chain
+            table.setdefault(comparedValue(self._const_values[idx]), target)
+
+        return (table, pos)
+
+
+    # operand of the instruction at 'pos' with its EXTENDED_ARG prefixes, and
+    #  the offset of the next instruction
+    def _readOperand(self, code: List[int], pos: int) -> Tuple[int, int]:
+        arg: int = 0
+        while code[pos] == opcode.EXTENDED_ARG.value:
+            arg = (arg << 8) + code[pos + 1]
+            pos += 2
+
+        size: int = opcodeSizeDict[opcodeDict[code[pos]]]
+        for b in code[pos + 1 : pos + size]:
+            arg = (arg << 8) + b
+        return (arg, pos + size)
+
+
+    # CMPLT and POP_JMP_IF_FALSE in one instruction, for counted loops
+    def execute_FOR_RANGE(self, i: int) -> None:
+        idx: int = (self._advance() << 8) + self._advance()
+        if self._lessThan():
+            self._advance() # consume second arg
+        else:
+            self._goto(idx)
+
+
+    def wide_FOR_RANGE(self, i: int, idx: int) -> None:
+        if not self._lessThan():
+            self._ip = idx - 1
+
+
+    def _lessThan(self) -> bool:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            return l < r
+        raise TypeErr(f"Invalid operand type for less than operator: {typeName(l)} and {typeName(r)}")
+
+
+    # adds 1 to a variable, with the errors BINARY_ADD raises
+    def _increment(self, v: Any) -> Any:
+        t = type(v)
+        if t is int or t is float:
+            return v + 1
+        if t is str:
+            raise TypeErr("Cannot add Number to String")
+        raise TypeErr(f"Addition not defined for type '{typeName(v)}'")
+
+
+    def execute_INC_LOCAL(self, i: int) -> None:
+        self.wide_INC_LOCAL(i, self._advance())
+
+
+    def wide_INC_LOCAL(self, i: int, idx: int) -> None:
+        frame: Frame = self._cur_frame
+        frame.setLocalVarAtIndex(idx, self._increment(frame.getLocalVarAtIndex(idx)))
+
+
+    def execute_INC_GLOBAL(self, i: int) -> None:
+        self.wide_INC_GLOBAL(i, self._advance())
+
+
+    def wide_INC_GLOBAL(self, i: int, idx: int) -> None:
+        frame: Frame = self._main_frame
+        frame.setLocalVarAtIndex(idx, self._increment(frame.getLocalVarAtIndex(idx)))
+
+
     def execute_CALL_FUNCTION(self, i: int) -> None:
-        idx: int = self._advance()
+        self.wide_CALL_FUNCTION(i, self._advance())
+
+
+    def wide_CALL_FUNCTION(self, i: int, idx: int) -> None:
         fnInfo: func_info = self._code_obj.getFromFP(idx)
 
         f = Frame()
@@ -399,11 +932,8 @@ class VirtualMachine:
         f.setReturnAddress(self._ip)
         
         self._ip = -1
-        self._cur_frame.reset()
-        self._cur_frame.setCode(fnInfo.code)
-
-        if f.name == "main":
-            self._main_frame._local_vars = f._local_vars
+        self._cur_frame.reset(fnInfo.nlocals)
+        self._cur_frame.setCode(self._fn_code[idx])
 
         for i in range(fnInfo.argc):
             self._cur_frame.pushOpStack(f.popOpStack())
@@ -412,18 +942,21 @@ class VirtualMachine:
 
 
     def execute_CALL_NATIVE(self, i: int) -> None:
-        idx: int = self._advance()
+        self.wide_CALL_NATIVE(i, self._advance())
+
+
+    def wide_CALL_NATIVE(self, i: int, idx: int) -> None:
         fnName = builtinFunctionIndex[idx]
         args: List[LObject] = []
         argc: int = builtinFunctionInfo[fnName][1]
         for _ in range(argc):
-            args = [self._cur_frame.popOpStack()] + args
+            args = [box(self._cur_frame.popOpStack())] + args
 
-        self._cur_frame.pushOpStack(builtinFunctionTable[fnName](args))
+        self._cur_frame.pushOpStack(unbox(builtinFunctionTable[fnName](args)))
 
 
     def execute_RETURN_VALUE(self, i: int) -> None:        
-        retVal: LObject = self._cur_frame.popOpStack()
+        retVal: Any = self._cur_frame.popOpStack()
 
         try:
             ret_f: Frame = self._popFrame()
@@ -434,13 +967,45 @@ class VirtualMachine:
             pass
 
 
+    #
+    # Prefix of an instruction whose operand doesn't fit in its operand bytes,
+    #  see Assembler._makeFunction. Reads all prefixes and the operand of the
+    #  instruction, and runs the wide_ handler of the instruction with the
+    #  full operand. Small operands never go through here, so the execute_
+    #  handlers don't pay for large ones.
+    #
+    def execute_EXTENDED_ARG(self, i: int) -> None:
+        ext: int = self._advance()
+        op: int = self._advance()
+        while op == opcode.EXTENDED_ARG.value:
+            ext = (ext << 8) + self._advance()
+            op = self._advance()
+
+        arg: int = ext
+        for _ in range(opcodeSizeDict[opcodeDict[op]] - 1):
+            arg = (arg << 8) + self._advance()
+
+        getattr(self, f"wide_{opcodeDict[op]}")(op, arg)
+
+
+    # opcode of the instruction that the EXTENDED_ARG at the ip prefixes
+    def _getPrefixedOpcode(self) -> int:
+        ip: int = self._ip
+        while self._cur_frame.getInsAtIndex(ip) == opcode.EXTENDED_ARG.value:
+            ip += 2
+        return self._cur_frame.getInsAtIndex(ip)
+
+
     def execute_BUILD_LIST(self, i: int) -> None:
-        len: int = (self._advance() << 8) + self._advance()
+        self.wide_BUILD_LIST(i, (self._advance() << 8) + self._advance())
+
+
+    def wide_BUILD_LIST(self, i: int, len: int) -> None:
         arrObj: Array = Array()
 
         arrElList: list = []
         for _ in range(len):
-            arrElList = [self._cur_frame.popOpStack()] + arrElList
+            arrElList = [box(self._cur_frame.popOpStack())] + arrElList
 
         for e in arrElList:
             arrObj.addEl(e)
@@ -449,43 +1014,155 @@ class VirtualMachine:
         
 
     def execute_BINARY_SUBSCR(self, i: int) -> None:
-        idx: Number = self._cur_frame.popOpStack()
+        idx: Any = self._cur_frame.popOpStack()
 
-        if type(idx).__name__ != "Number":
-            raise TypeErr(f"Array indices must be integers, not '{type(idx).__name__}'")
+        if not isNumber(idx):
+            raise TypeErr(f"Array indices must be integers, not '{typeName(idx)}'")
 
-        if type(idx.value).__name__ == "float":
+        if type(idx) is float:
             raise TypeErr(f"Array indices must be integers, not float")
         
         arr: Array = self._cur_frame.popOpStack()
 
-        if self._getObjType(arr) != "Array":
-            raise TypeErr(f"Type '{type(arr).__name__}' is not subscriptable")
+        if type(arr) is not Array:
+            raise TypeErr(f"Type '{typeName(arr)}' is not subscriptable")
         
-        if arr.getEL(idx.value) == None:
+        if arr.getEL(idx) == None:
             raise IndexErr()
 
-        self._cur_frame.pushOpStack(arr.getEL(idx.value))
+        self._cur_frame.pushOpStack(unbox(arr.getEL(idx)))
+        self._quicken(opcode.BINARY_SUBSCR_ARRAY.value)
+
+
+    #
+    # Specialized instructions, see _quicken. The guards only check types.
+    #
+    def execute_BINARY_ADD_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l + r)
+        else:
+            self._deoptimize(opcode.BINARY_ADD.value, l, r)
+
+
+    def execute_BINARY_ADD_STR(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+
+        if type(l) is str and type(r) is str:
+            self._cur_frame.pushOpStack(l + r)
+        else:
+            self._deoptimize(opcode.BINARY_ADD.value, l, r)
+
+
+    def execute_BINARY_SUBTRACT_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l - r)
+        else:
+            self._deoptimize(opcode.BINARY_SUBTRACT.value, l, r)
+
+
+    def execute_BINARY_MULTIPLY_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l * r)
+        else:
+            self._deoptimize(opcode.BINARY_MULTIPLY.value, l, r)
+
+
+    def execute_CMPLT_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l < r)
+        else:
+            self._deoptimize(opcode.CMPLT.value, l, r)
+
+
+    def execute_CMPGT_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l > r)
+        else:
+            self._deoptimize(opcode.CMPGT.value, l, r)
+
+
+    def execute_CMPLE_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l <= r)
+        else:
+            self._deoptimize(opcode.CMPLE.value, l, r)
+
+
+    def execute_CMPGE_NUM(self, i: int) -> None:
+        r: Any = self._cur_frame.popOpStack()
+        l: Any = self._cur_frame.popOpStack()
+        tl = type(l)
+        tr = type(r)
+
+        if (tl is int or tl is float) and (tr is int or tr is float):
+            self._cur_frame.pushOpStack(l >= r)
+        else:
+            self._deoptimize(opcode.CMPGE.value, l, r)
+
+
+    def execute_BINARY_SUBSCR_ARRAY(self, i: int) -> None:
+        idx: Any = self._cur_frame.popOpStack()
+        arr: Any = self._cur_frame.popOpStack()
+
+        # out of range indices go through the generic handler, which raises
+        #  the error
+        if type(arr) is Array and type(idx) is int:
+            el: LObject = arr.getEL(idx)
+            if el != None:
+                self._cur_frame.pushOpStack(unbox(el))
+                return
+
+        self._deoptimize(opcode.BINARY_SUBSCR.value, arr, idx)
 
 
     def execute_STORE_SUBSCR(self, i: int) -> None:
-        idx: Number = self._cur_frame.popOpStack()
+        idx: Any = self._cur_frame.popOpStack()
         
-        if type(idx).__name__ != "Number":
-            raise TypeErr(f"Array indices must be integers, not '{type(idx).__name__}'")
+        if not isNumber(idx):
+            raise TypeErr(f"Array indices must be integers, not '{typeName(idx)}'")
 
-        if type(idx.value).__name__ == "float":
+        if type(idx) is float:
             raise TypeErr(f"Array indices must be integers, not float")
 
         arr: Array = self._cur_frame.popOpStack()
-        if self._getObjType(arr) != "Array":
-            raise TypeErr(f"Type '{type(arr).__name__}' is not subscriptable")
+        if type(arr) is not Array:
+            raise TypeErr(f"Type '{typeName(arr)}' is not subscriptable")
 
-        val: LObject = self._cur_frame.popOpStack()
+        val: Any = self._cur_frame.popOpStack()
 
-        if arr.getEL(idx.value) == None:
+        if arr.getEL(idx) == None:
             raise IndexErr()
 
-        arr.setEL(val, idx.value)
+        arr.setEL(box(val), idx)
         self._cur_frame.pushOpStack(arr)
-